@@ -0,0 +1,34 @@
+from django.db import connection
+from django.http import HttpRequest, HttpResponse
+from prometheus_client import Histogram
+
+REQUEST_DB_QUERIES = Histogram(
+    "budgetmate_http_request_db_queries",
+    "Database queries run per request, by view",
+    ["view"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+
+
+class QueryCountMiddleware:
+    """
+    Observe the number of database queries of each request in REQUEST_DB_QUERIES.
+    """
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        resolver_match = getattr(request, "resolver_match", None)
+        view_name = resolver_match.view_name if resolver_match else "<unnamed view>"
+        REQUEST_DB_QUERIES.labels(view_name).observe(queries)
+        return response
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,12 +45,14 @@ DJANGO_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
 ]
 
 THIRD_PARTY_APPS = [
     "rest_framework",
     "rest_framework.authtoken",
     "django_filters",
+    "django_prometheus",
 ]
 
 CUSTOM_APPS = [
@@ -60,6 +63,7 @@ CUSTOM_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + CUSTOM_APPS
 
 MIDDLEWARE = [
+    "django_prometheus.middleware.PrometheusBeforeMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -68,6 +72,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "BudgetMate.middleware.QueryCountMiddleware",
+    "django_prometheus.middleware.PrometheusAfterMiddleware",
 ]
 
 ROOT_URLCONF = "BudgetMate.urls"
@@ -181,16 +187,47 @@ REST_FRAMEWORK = {
     "TIME_INPUT_FORMATS": ["iso-8601"],
 }
 
+# Statement imports
+# Uploaded files are spooled here until the import worker (manage.py run_import_worker) parses them
+IMPORT_SPOOL_DIR = Path(os.getenv("IMPORT_SPOOL_DIR", BASE_DIR / "import-spool"))
+IMPORT_WORKER_POLL_INTERVAL = float(os.getenv("IMPORT_WORKER_POLL_INTERVAL", 2))
+# A worker running a job refreshes its heartbeat at this interval (seconds); a running job without heartbeat
+# for IMPORT_JOB_STALE_AFTER seconds belongs to a stopped worker and is put back in the queue
+IMPORT_JOB_HEARTBEAT_INTERVAL = float(os.getenv("IMPORT_JOB_HEARTBEAT_INTERVAL", 30))
+IMPORT_JOB_STALE_AFTER = float(os.getenv("IMPORT_JOB_STALE_AFTER", 5 * IMPORT_JOB_HEARTBEAT_INTERVAL))
+# Labels categorized by the naive Bayes categorizer with this confidence are not prompted for (1 to disable)
+CATEGORIZER_CONFIDENCE_THRESHOLD = float(os.getenv("CATEGORIZER_CONFIDENCE_THRESHOLD", 0.9))
+# New users get the categories and subcategories of data_ingestion/fixtures
+BOOTSTRAP_DEFAULT_CATEGORIES = os.getenv("BOOTSTRAP_DEFAULT_CATEGORIES", "true").lower() == "true"
+
+# Prometheus metrics: /metrics requires "Authorization: Bearer <METRICS_TOKEN>" (and is disabled without it,
+# unless DEBUG)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 # Proxy setup
 USE_X_FORWARDED_HOST = True
 USE_X_FORWARDED_PORT = True
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
+# The default cache is shared by the web workers and the import worker (job progress, versioned reports and
+# rule indexes). "local" is a small in-process cache in front of it for the versioned keys.
+# The file based cache increments the cache versions with a read then a write, not atomically across processes:
+# two concurrent bumps can give the same version. This is fine as the versions are bumped after the commit of
+# the changes (see data_ingestion.cache.bump_user_version); use a backend with an atomic incr otherwise.
+CACHE_DIR = Path(os.getenv("CACHE_DIR", Path(tempfile.gettempdir()) / "budgetmate-cache"))
+
 CACHES = {
     "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": CACHE_DIR,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "local": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "unique-snowflake",
-    }
+        "TIMEOUT": 60 * 5,
+        "OPTIONS": {"MAX_ENTRIES": 500},
+    },
 }
 
 LOGGING = {
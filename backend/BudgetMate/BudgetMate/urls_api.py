@@ -1,11 +1,27 @@
 from django.urls import path
 from rest_framework import routers
 
-from data_ingestion.views import UploadFileView
+from data_ingestion.views import (
+    AccountStatementViewSet,
+    CategoryViewSet,
+    HouseholdViewSet,
+    ImportJobViewSet,
+    SpendingTimeSeriesView,
+    StatementExportView,
+    StatementLineViewSet,
+    UploadFileView,
+)
 
 router = routers.DefaultRouter()
+router.register("import-jobs", ImportJobViewSet, basename="import-job")
+router.register("statement-lines", StatementLineViewSet, basename="statement-line")
+router.register("account-statements", AccountStatementViewSet, basename="account-statement")
+router.register("categories", CategoryViewSet, basename="category")
+router.register("households", HouseholdViewSet, basename="household")
 
 urlpatterns = [
     # Data Ingestion
     path("upload/", UploadFileView.as_view(), name="upload"),
+    path("spending/", SpendingTimeSeriesView.as_view(), name="spending"),
+    path("exports/<str:kind>.<str:export_format>", StatementExportView.as_view(), name="export"),
 ]
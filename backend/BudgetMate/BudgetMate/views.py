@@ -0,0 +1,30 @@
+import os
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+
+from data_ingestion.metrics import IMPORT_JOBS_PENDING
+
+
+def metrics(request: HttpRequest) -> HttpResponse:
+    """
+    Prometheus metrics of the web app and of the import worker, django-prometheus' ExportToDjangoView with
+    a bearer token. Without METRICS_TOKEN, the metrics are only served in DEBUG.
+
+    Each gunicorn worker and the import worker have their own metrics: with PROMETHEUS_MULTIPROC_DIR set (see
+    supervisord.conf), they are written there and aggregated here, whichever worker serves the scrape.
+    """
+    token = settings.METRICS_TOKEN
+    if not token and not settings.DEBUG:
+        return HttpResponseForbidden()
+    if token and not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(IMPORT_JOBS_PENDING)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -2,12 +2,14 @@
 from typing import TYPE_CHECKING, Dict, Type
 
 # Django
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 # Application
 from accounts.models import Profile
+from data_ingestion.bootstrap import create_default_categories
 
 if TYPE_CHECKING:
     # Application
@@ -20,3 +22,10 @@ else:
 def create_profile(sender: Type[User], instance: User, created: bool, **kwargs: Dict) -> None:
     if created:
         Profile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def bootstrap_categories(sender: Type[User], instance: User, created: bool, **kwargs: Dict) -> None:
+    # Not for users loaded from fixtures, which come with their own categories
+    if created and not kwargs.get("raw") and settings.BOOTSTRAP_DEFAULT_CATEGORIES:
+        create_default_categories(instance)
@@ -1,9 +1,16 @@
+# Built-in
+from unittest import mock
+
 # Django
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 # Application
 from accounts.models import Profile
+from data_ingestion.bootstrap import get_default_categories
+from data_ingestion.models import Category, SubCategory
 
 User = get_user_model()
 
@@ -13,3 +20,32 @@ class TestUserProfile(TestCase):
         user = User.objects.create_user(username="usertest1", password="5tr0ngP@ssw0rd!!")
         self.assertEqual(Profile.objects.count(), 1)
         self.assertEqual(user.profile, Profile.objects.get())
+
+
+class TestDefaultCategories(TestCase):
+    def test_signal_creates_default_categories_in_two_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            user = User.objects.create_user(username="usertest1", password="5tr0ngP@ssw0rd!!")
+        inserts = [
+            query["sql"] for query in queries if query["sql"].startswith("INSERT") and "category" in query["sql"]
+        ]
+        self.assertEqual(len(inserts), 2)
+
+        tree = {
+            category.name: tuple(sub_category.name for sub_category in category.subcategory_set.order_by("id"))
+            for category in Category.objects.filter(user=user).prefetch_related("subcategory_set")
+        }
+        self.assertEqual(tree, {default.name: default.sub_categories for default in get_default_categories()})
+        self.assertEqual(tree["Santé"][0], "Pharmacie")
+        self.assertFalse(SubCategory.objects.filter(user=user).exclude(category__user=user).exists())
+
+    def test_fixtures_are_parsed_once_per_process(self):
+        get_default_categories()
+        with mock.patch("data_ingestion.bootstrap.yaml.safe_load") as safe_load:
+            User.objects.create_user(username="usertest1", password="5tr0ngP@ssw0rd!!")
+        safe_load.assert_not_called()
+
+    @override_settings(BOOTSTRAP_DEFAULT_CATEGORIES=False)
+    def test_bootstrap_can_be_disabled(self):
+        User.objects.create_user(username="usertest1", password="5tr0ngP@ssw0rd!!")
+        self.assertFalse(Category.objects.exists())
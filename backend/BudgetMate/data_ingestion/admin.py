@@ -1,16 +1,49 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
 from .models import (
     AccountStatement,
     BankAccount,
     BankBrand,
     Category,
+    Household,
+    HouseholdMember,
+    ImportedFile,
+    ImportJob,
     LabelCategoryMapping,
     ShareRule,
     StatementLine,
     SubCategory,
 )
 
+# Below this many rows, a real COUNT(*) is cheap enough
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for the changelists of the large tables.
+
+    The count of the unfiltered changelist comes from the PostgreSQL statistics (pg_class.reltuples)
+    instead of a COUNT(*) over the whole table, once the table is big enough. Filtered counts stay exact.
+    """
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if not queryset.query.where and connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= ESTIMATED_COUNT_THRESHOLD:
+                return int(row[0])
+        return super().count
+
 
 @admin.register(BankBrand)
 class BankBrandAdmin(admin.ModelAdmin):
@@ -21,6 +54,7 @@ class BankBrandAdmin(admin.ModelAdmin):
 class BankAccountAdmin(admin.ModelAdmin):
     model = BankAccount
     list_display = ("account_number", "bank", "user", "description")
+    list_select_related = ("bank", "user")
 
 
 @admin.register(AccountStatement)
@@ -34,6 +68,10 @@ class AccountStatementAdmin(admin.ModelAdmin):
         "bank_name_acc",
         "user_account",
     )
+    list_select_related = ("bank_account__bank", "bank_account__user")
+    list_filter = ("statement_type",)
+    date_hierarchy = "start_date"
+    raw_id_fields = ("bank_account",)
 
     def bank_account_number(self, obj):
         return obj.bank_account.account_number
@@ -57,38 +95,89 @@ class StatementLineAdmin(admin.ModelAdmin):
         "category",
         "sub_category",
     )
-
-    def user(self, obj):
-        return obj.account_statement.bank_account.user
-
-    search_fields = ["account_statement__bank_account__user__username"]
+    # account_statement is displayed with its bank and user (AccountStatement.__str__)
+    list_select_related = (
+        "account_statement__bank_account__bank",
+        "account_statement__bank_account__user",
+        "user",
+        "category",
+        "sub_category",
+    )
+    list_filter = ("operation_type", "is_shared")
+    date_hierarchy = "operation_date"
+    raw_id_fields = ("account_statement", "category", "sub_category")
+    # Served by the username unique index, statementline_user_date_idx and statementline_label_prefix_idx
+    search_fields = ["user__username__exact", "libeller__istartswith"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    pass
+    list_display = ("name", "user")
+    list_select_related = ("user",)
+    # Served by category_name_prefix_idx and the username unique index
+    search_fields = ["name__istartswith", "user__username__exact"]
 
 
 @admin.register(SubCategory)
 class SubCategoryAdmin(admin.ModelAdmin):
-    pass
+    list_display = ("name", "category", "user")
+    list_select_related = ("category", "user")
+    # Served by subcategory_name_prefix_idx, category_name_prefix_idx and the username unique index
+    search_fields = ["name__istartswith", "category__name__istartswith", "user__username__exact"]
+    raw_id_fields = ("category",)
 
 
 @admin.register(LabelCategoryMapping)
 class LabelCategoryMappingAdmin(admin.ModelAdmin):
-    list_display = ("user", "label", "category", "sub_category")
+    list_display = ("user", "label", "normalized_label", "category", "sub_category")
+    list_select_related = ("user", "category", "sub_category")
+    raw_id_fields = ("category", "sub_category")
+    # Served by the username unique index and labelmapping_label_prefix_idx
+    search_fields = ["user__username__exact", "label__istartswith"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def user(self, obj: LabelCategoryMapping):
         return obj.user.username
 
-    search_fields = ["user__username", "label"]
-
 
 @admin.register(ShareRule)
 class ShareRuleAdmin(admin.ModelAdmin):
     list_display = ("user", "label", "sub_category", "always_shared")
+    list_select_related = ("user", "sub_category")
+    raw_id_fields = ("sub_category",)
+    # Served by the username unique index, sharerule_label_prefix_idx and subcategory_name_prefix_idx
+    search_fields = ["user__username__exact", "label__istartswith", "sub_category__name__istartswith"]
 
     def user(self, obj: ShareRule):
         return obj.user.username
 
-    search_fields = ["user__username", "label", "sub_category__name"]
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ("original_filename", "user", "status", "rows_parsed", "rows_inserted", "created_at")
+    list_select_related = ("user",)
+    list_filter = ("status",)
+    raw_id_fields = ("bank_account", "account_statement")
+
+
+@admin.register(ImportedFile)
+class ImportedFileAdmin(admin.ModelAdmin):
+    list_display = ("original_filename", "user", "account_statement", "size", "imported_at")
+    list_select_related = ("user", "account_statement__bank_account__bank", "account_statement__bank_account__user")
+    raw_id_fields = ("account_statement",)
+    search_fields = ["user__username__exact", "original_filename__istartswith", "=sha256"]
+
+
+class HouseholdMemberInline(admin.TabularInline):
+    model = HouseholdMember
+    raw_id_fields = ("user",)
+    extra = 1
+
+
+@admin.register(Household)
+class HouseholdAdmin(admin.ModelAdmin):
+    list_display = ("name",)
+    inlines = (HouseholdMemberInline,)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DataIngestionConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "data_ingestion"
+
+    def ready(self) -> None:
+        import data_ingestion.signals  # noqa: F401
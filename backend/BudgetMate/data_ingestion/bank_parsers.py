@@ -0,0 +1,148 @@
+"""
+Bank specific CSV parsers.
+
+Each parser turns the rows of a bank export into ParsedLine records, lazily and without any
+database access: categorization and persistence happen in a separate stage
+(see data_ingestion.parsers). This module must not import Django models.
+"""
+
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, NamedTuple, Optional, Type
+
+from data_ingestion.classifiers import Direction, banque_postale_skip_reason, classify_banque_postale_label
+from data_ingestion.codecs import parse_amount, parse_date
+from data_ingestion.constants import OPERATION_TYPE_MAP
+from data_ingestion.readers import open_csv
+
+SKIP_INVALID_ROW = "invalid_row"
+
+
+class ParsedLine(NamedTuple):
+    operation_date: date
+    operation_type: str
+    label: str
+    amount: Optional[Decimal]
+    comment: Optional[str] = None
+    category_name: Optional[str] = None  # Category proposed by the bank export, if any
+    sub_category_name: Optional[str] = None
+
+
+class BankParser:
+    """
+    Base class of the bank parsers.
+
+    Subclasses set bank_name (the BankBrand name they handle) and implement parse_rows.
+    Skipped rows are counted by reason in self.skipped, labels matching no known pattern in
+    self.unmatched.
+    """
+
+    bank_name: str = ""
+    delimiter = ";"
+    header_rows = 1
+
+    def __init__(self) -> None:
+        self.skipped: Counter = Counter()
+        self.unmatched = 0
+
+    def parse_rows(self, rows: Iterable[list[str]]) -> Iterator[ParsedLine]:
+        raise NotImplementedError
+
+    def parse(self, rows: Iterable[list[str]]) -> Iterator[ParsedLine]:
+        rows = iter(rows)
+        for _ in range(self.header_rows):
+            next(rows, None)
+        yield from self.parse_rows(rows)
+
+    def parse_file(self, source: str | Path | BinaryIO) -> Iterator[ParsedLine]:
+        """
+        Parse a file given by path or as a binary file object (see data_ingestion.readers.open_csv).
+        self.delimiter is the delimiter used when none is found in the file.
+        """
+        with open_csv(source, self.delimiter) as rows:
+            yield from self.parse(rows)
+
+
+class ParsedFile(NamedTuple):
+    lines: list[ParsedLine]
+    skipped: Counter
+    unmatched: int
+
+
+BANK_PARSERS: dict[str, Type[BankParser]] = {}
+
+
+def register_bank_parser(parser_class: Type[BankParser]) -> Type[BankParser]:
+    BANK_PARSERS[parser_class.bank_name] = parser_class
+    return parser_class
+
+
+def get_bank_parser(bank_name: str) -> BankParser:
+    try:
+        return BANK_PARSERS[bank_name]()
+    except KeyError:
+        raise ValueError(f"No parser registered for bank '{bank_name}'.") from None
+
+
+def parse_file(bank_name: str, path: str | Path) -> ParsedFile:
+    """
+    Parse a whole file in memory. Picklable entry point for the process pool of multi-file imports.
+    """
+    parser = get_bank_parser(bank_name)
+    lines = list(parser.parse_file(path))
+    return ParsedFile(lines, parser.skipped, parser.unmatched)
+
+
+@register_bank_parser
+class BanquePostaleParser(BankParser):
+    bank_name = "Banque postale"
+
+    def parse_rows(self, rows: Iterable[list[str]]) -> Iterator[ParsedLine]:
+        for row in rows:
+            if not row or len(row) < 3:
+                self.skipped[SKIP_INVALID_ROW] += 1
+                continue
+            try:
+                operation_date = parse_date(row[0])
+                amount = parse_amount(row[2])
+            except ValueError:
+                # Account information lines at the top of the export, malformed amounts
+                self.skipped[SKIP_INVALID_ROW] += 1
+                continue
+
+            classified = classify_banque_postale_label(row[1])
+            skip_reason = banque_postale_skip_reason(classified)
+            if skip_reason:
+                self.skipped[skip_reason] += 1
+                continue
+            if classified.direction is Direction.UNKNOWN:
+                self.unmatched += 1
+                print(f"Warning: Unmatched transaction pattern: {row[1]}")
+
+            yield ParsedLine(
+                operation_date=classified.effective_date or operation_date,
+                operation_type=classified.operation_type,
+                label=classified.clean_label,
+                amount=amount,
+            )
+
+
+@register_bank_parser
+class CaisseEpargneParser(BankParser):
+    bank_name = "Caisse d'épargne"
+
+    def parse_rows(self, rows: Iterable[list[str]]) -> Iterator[ParsedLine]:
+        for row in rows:
+            amount = parse_amount(row[8]) if row[8] else parse_amount(row[9])
+
+            yield ParsedLine(
+                operation_date=parse_date(row[10]),
+                operation_type=OPERATION_TYPE_MAP.get(row[5], "OT"),
+                label=row[1],
+                amount=amount,
+                comment=row[2],
+                category_name=row[6],
+                sub_category_name=row[7],
+            )
@@ -0,0 +1,44 @@
+"""
+Throughput of the bank parsers on in-memory rows, without Django nor database.
+
+python -m data_ingestion.benchmarks.bank_parsers [--rows N]
+"""
+
+import argparse
+import time
+from collections import deque
+
+from data_ingestion.bank_parsers import BANK_PARSERS, get_bank_parser
+
+SAMPLE_ROWS = {
+    "Banque postale": [
+        ["12/03/2025", "ACHAT CB CARREFOUR MARKET 11.03.25 CARTE NUMERO 123", "-42,10"],
+        ["13/03/2025", "PRELEVEMENT DE EDF CLIENTS PARTICULIERS REF : 0123456789", "-61,00"],
+        ["14/03/2025", "VIREMENT DE MME DUPONT REFERENCE : LOYER MARS", "450,00"],
+        ["15/03/2025", "COTISATION MENSUELLE CARTE VISA", "-2,50"],
+    ],
+    "Caisse d'épargne": [
+        ["", "CARREFOUR", "", "", "", "Carte bancaire", "Alimentation", "Supermarche", "-42,10", "", "12/03/2025"],
+        ["", "EDF", "Facture", "", "", "Prelevement", "Logement", "Energie", "-61,00", "", "13/03/2025"],
+    ],
+}
+
+
+def rows_per_second(bank_name: str, row_count: int) -> float:
+    sample = SAMPLE_ROWS[bank_name]
+    rows = [["header"]] + [sample[i % len(sample)] for i in range(row_count)]
+    start = time.perf_counter()
+    deque(get_bank_parser(bank_name).parse(rows), maxlen=0)
+    return row_count / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000, help="Number of rows per parser")
+    args = parser.parse_args()
+    for bank_name in BANK_PARSERS:
+        print(f"{bank_name:<20} {rows_per_second(bank_name, args.rows):>12,.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
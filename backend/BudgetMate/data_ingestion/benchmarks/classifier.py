@@ -0,0 +1,99 @@
+"""
+Microbenchmark of the Banque Postale label classifier.
+
+Compares classify_banque_postale_label with the historical implementation, which ran
+re.search with the seven patterns of data_ingestion.constants for every label.
+Does not need Django: python -m data_ingestion.benchmarks.classifier [--labels N]
+"""
+
+import argparse
+import re
+import time
+from datetime import datetime
+from typing import Callable
+
+from data_ingestion.classifiers import classify_banque_postale_label
+from data_ingestion.constants import (
+    OPERATION_TYPE_MAP,
+    REGEX_BANK_FEE,
+    REGEX_CREDIT_CARD_REFUND,
+    REGEX_DIRECT_DEBIT,
+    REGEX_INSTANT_TRANSFER,
+    REGEX_OUTGOING_TRANSFER,
+    REGEX_PURCHASE,
+    REGEX_TRANSFER,
+)
+
+SAMPLE_LABELS = (
+    "ACHAT CB CARREFOUR MARKET 12.03.25 CARTE NUMERO 123",
+    "PRELEVEMENT DE EDF CLIENTS PARTICULIERS REF : 0123456789",
+    "VIREMENT DE MME DUPONT REFERENCE : LOYER MARS",
+    "VIREMENT INSTANTANE DE M MARTIN",
+    "VIREMENT POUR M DURAND",
+    "CREDIT CARTE BANCAIRE AMAZON 03.03.25",
+    "COTISATION MENSUELLE CARTE VISA",
+    "RETRAIT DAB 10.03.25 PARIS",
+)
+
+
+def legacy_classify(label: str) -> tuple:
+    purchase_match = re.search(REGEX_PURCHASE, label)
+    direct_debit_match = re.search(REGEX_DIRECT_DEBIT, label)
+    transfer_match = re.search(REGEX_TRANSFER, label)
+    instant_transfer_match = re.search(REGEX_INSTANT_TRANSFER, label)
+    outgoing_transfer_match = re.search(REGEX_OUTGOING_TRANSFER, label)
+    credit_card_refund_match = re.search(REGEX_CREDIT_CARD_REFUND, label)
+    bank_fee_match = re.search(REGEX_BANK_FEE, label)
+
+    operation_date = None
+    if purchase_match:
+        operation_date = datetime.strptime(purchase_match.group(3), "%d.%m.%y").date()
+    transaction_match = (
+        purchase_match
+        or direct_debit_match
+        or transfer_match
+        or instant_transfer_match
+        or outgoing_transfer_match
+        or credit_card_refund_match
+        or bank_fee_match
+    )
+    expense_match = purchase_match or direct_debit_match or bank_fee_match
+    income_match = transfer_match or instant_transfer_match or credit_card_refund_match
+    if expense_match:
+        match = bank_fee_match if bank_fee_match else expense_match
+        clean_label = " ".join(match.group(1 if bank_fee_match else 2).split())
+    elif income_match:
+        if credit_card_refund_match:
+            clean_label = " ".join(credit_card_refund_match.group(2).split())
+            operation_date = datetime.strptime(credit_card_refund_match.group(3), "%d.%m.%y").date()
+        else:
+            clean_label = " ".join(income_match.group(1 if instant_transfer_match else 2).split())
+    elif outgoing_transfer_match:
+        clean_label = " ".join(outgoing_transfer_match.group(2).split())
+    else:
+        clean_label = label.strip('"')
+    operation_type_raw = " ".join(transaction_match.group(1).split()) if transaction_match else "OT"
+    return OPERATION_TYPE_MAP.get(operation_type_raw, "OT"), clean_label, operation_date
+
+
+def labels_per_second(classify: Callable, labels: list[str]) -> float:
+    start = time.perf_counter()
+    for label in labels:
+        classify(label)
+    return len(labels) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--labels", type=int, default=200_000, help="Number of labels to classify")
+    args = parser.parse_args()
+
+    labels = [SAMPLE_LABELS[i % len(SAMPLE_LABELS)] for i in range(args.labels)]
+    legacy = labels_per_second(legacy_classify, labels)
+    compiled = labels_per_second(classify_banque_postale_label, labels)
+    print(f"legacy (7 x re.search): {legacy:>12,.0f} labels/sec")
+    print(f"compiled classifier:    {compiled:>12,.0f} labels/sec ({compiled / legacy:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Microbenchmark of the date and amount codecs of the bank parsers.
+
+Compares data_ingestion.codecs with the historical per-row strptime and Decimal parsing, on a month of
+dates and French amounts. Does not need Django: python -m data_ingestion.benchmarks.codecs [--values N]
+"""
+
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Callable
+
+from data_ingestion.codecs import format_amount_cents, parse_amount, parse_date
+
+
+def legacy_parse_date(value: str) -> date:
+    return datetime.strptime(value, "%d/%m/%Y").date()
+
+
+def legacy_parse_amount(value: str) -> Decimal:
+    return Decimal(float(value.replace(",", ".")))
+
+
+def values_per_second(parse: Callable, values: list[str]) -> float:
+    start = time.perf_counter()
+    for value in values:
+        parse(value)
+    return len(values) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--values", type=int, default=200_000, help="Number of values to parse")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    dates = [f"{date(2025, 3, 1) + timedelta(days=rng.randrange(31)):%d/%m/%Y}" for _ in range(args.values)]
+    amounts = [format_amount_cents(rng.randint(-25000, 25000)) for _ in range(args.values)]
+    parse_date.cache_clear()
+    for name, legacy, codec, values in (
+        ("dates", legacy_parse_date, parse_date, dates),
+        ("amounts", legacy_parse_amount, parse_amount, amounts),
+    ):
+        legacy_speed = values_per_second(legacy, values)
+        codec_speed = values_per_second(codec, values)
+        print(f"{name + ' (legacy):':<18} {legacy_speed:>12,.0f} values/sec")
+        print(f"{name + ' (codecs):':<18} {codec_speed:>12,.0f} values/sec ({codec_speed / legacy_speed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
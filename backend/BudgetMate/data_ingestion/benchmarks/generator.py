@@ -0,0 +1,144 @@
+"""
+Synthetic Banque Postale and Caisse d'épargne CSV exports, for the ingestion benchmarks.
+
+Labels are drawn from KNOWN_LABELS with probability known_ratio (the benchmark maps them to a
+category beforehand) and are otherwise unique merchants, so that they go through category resolution.
+Does not need Django:
+python -m data_ingestion.benchmarks.generator "Banque postale" statement.csv [--rows N] [--known-ratio R]
+"""
+
+import argparse
+import csv
+import random
+import zlib
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterator
+
+from data_ingestion.codecs import format_amount_cents
+
+MERCHANTS = (
+    "CARREFOUR MARKET",
+    "MONOPRIX",
+    "LIDL",
+    "BOULANGERIE PAUL",
+    "PHARMACIE DU CENTRE",
+    "SNCF",
+    "TOTAL ENERGIES",
+    "FNAC",
+    "DECATHLON",
+    "AMAZON",
+    "IKEA",
+    "CINEMA PATHE",
+)
+CITIES = ("PARIS", "LYON", "LILLE", "NANTES", "RENNES")
+KNOWN_LABELS = tuple(f"{merchant} {city}" for merchant in MERCHANTS for city in CITIES)
+
+# Caisse d'épargne exports propose a category for every line
+CATEGORIES = (
+    ("Alimentation", "Supermarche"),
+    ("Transport", "Train"),
+    ("Loisirs", "Cinema"),
+    ("Sante", "Pharmacie"),
+    ("Maison", "Ameublement"),
+)
+
+BANQUE_POSTALE_HEADER = ["Date", "Libellé", "Montant(EUROS)"]
+CAISSE_EPARGNE_HEADER = [
+    "Date de comptabilisation",
+    "Libelle simplifie",
+    "Libelle operation",
+    "Reference",
+    "Informations complementaires",
+    "Type operation",
+    "Categorie",
+    "Sous categorie",
+    "Debit",
+    "Credit",
+    "Date operation",
+]
+START_DATE = date(2025, 1, 1)
+
+
+def _unknown_merchant(i: int) -> str:
+    # Letters only: a number would be stripped from the normalized label (see data_ingestion.labels)
+    word = ""
+    while True:
+        i, letter = divmod(i, 26)
+        word += chr(ord("A") + letter)
+        if not i:
+            return f"MAGASIN {word}"
+
+
+def _labels(count: int, known_ratio: float, rng: random.Random) -> Iterator[str]:
+    for i in range(count):
+        if rng.random() < known_ratio:
+            yield rng.choice(KNOWN_LABELS)
+        else:
+            yield f"{_unknown_merchant(i)} {rng.choice(CITIES)}"
+
+
+def _amount(rng: random.Random) -> str:
+    return format_amount_cents(rng.randint(100, 25000))
+
+
+def banque_postale_rows(count: int, known_ratio: float = 0.8, seed: int = 0) -> Iterator[list[str]]:
+    """
+    Card purchases, with a direct debit and an incoming transfer every 50 lines and a salary
+    transfer (skipped by the parser) every 500 lines.
+    """
+    rng = random.Random(seed)
+    yield BANQUE_POSTALE_HEADER
+    for i, label in enumerate(_labels(count, known_ratio, rng)):
+        day = START_DATE + timedelta(days=i % 365)
+        if i % 500 == 499:
+            yield [f"{day:%d/%m/%Y}", "VIREMENT DE ACME SALAIRE REFERENCE : PAIE", "2500,00"]
+        elif i % 50 == 24:
+            yield [f"{day:%d/%m/%Y}", f"PRELEVEMENT DE {label} REF : {i:010d}", f"-{_amount(rng)}"]
+        elif i % 50 == 49:
+            yield [f"{day:%d/%m/%Y}", f"VIREMENT DE {label} REFERENCE : {i}", _amount(rng)]
+        else:
+            card_day = day - timedelta(days=1)
+            yield [f"{day:%d/%m/%Y}", f"ACHAT CB {label} {card_day:%d.%m.%y} CARTE NUMERO 123", f"-{_amount(rng)}"]
+
+
+def caisse_epargne_rows(count: int, known_ratio: float = 0.8, seed: int = 0) -> Iterator[list[str]]:
+    rng = random.Random(seed)
+    yield CAISSE_EPARGNE_HEADER
+    for i, label in enumerate(_labels(count, known_ratio, rng)):
+        day = f"{START_DATE + timedelta(days=i % 365):%d/%m/%Y}"
+        category, sub_category = CATEGORIES[zlib.crc32(label.encode()) % len(CATEGORIES)]
+        if i % 50 == 49:
+            yield [day, label, "Remboursement", "", "", "Virement recu", category, sub_category, "", _amount(rng), day]
+        else:
+            yield [day, label, "", "", "", "Carte bancaire", category, sub_category, f"-{_amount(rng)}", "", day]
+
+
+GENERATORS = {
+    "Banque postale": banque_postale_rows,
+    "Caisse d'épargne": caisse_epargne_rows,
+}
+
+
+def write_statement_csv(path: str | Path, bank_name: str, count: int, known_ratio: float = 0.8, seed: int = 0) -> Path:
+    """
+    Write a synthetic export of count lines for the bank, in the format its parser reads.
+    """
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f, delimiter=";").writerows(GENERATORS[bank_name](count, known_ratio, seed))
+    return Path(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("bank", choices=sorted(GENERATORS), help="Bank export format")
+    parser.add_argument("output", help="CSV file to write")
+    parser.add_argument("--rows", type=int, default=1000, help="Number of lines")
+    parser.add_argument("--known-ratio", type=float, default=0.8, help="Share of lines with a known label")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_statement_csv(args.output, args.bank, args.rows, args.known_ratio, args.seed)
+
+
+if __name__ == "__main__":
+    main()
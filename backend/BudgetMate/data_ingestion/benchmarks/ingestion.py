@@ -0,0 +1,190 @@
+"""
+End-to-end ingestion benchmarks on synthetic exports (see data_ingestion.benchmarks.generator).
+
+Needs Django and a database: run with manage.py benchmark_ingestion. Every case imports into a
+throwaway user inside a transaction that is rolled back, so the database is left unchanged.
+"""
+
+import os
+import platform
+import resource
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+from datetime import date
+from pathlib import Path
+from typing import Callable, Iterator, NamedTuple, Optional
+
+import django
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import User
+from data_ingestion.bank_parsers import get_bank_parser
+from data_ingestion.benchmarks.generator import KNOWN_LABELS, write_statement_csv
+from data_ingestion.models import BankAccount, BankBrand, Category, LabelCategoryMapping, StatementType, SubCategory
+from data_ingestion.parsers import StatementFile, import_statement_file, import_statement_files
+
+DATE_FROM = date(2025, 1, 1)
+DATE_TO = date(2025, 12, 31)
+
+
+class BenchmarkResult(NamedTuple):
+    case: str
+    rows: int
+    seconds: float
+    rows_per_second: float
+    queries: int
+    queries_per_row: float
+    peak_rss_mb: float  # High-water mark of the process (and of its pool workers) so far
+
+
+@contextmanager
+def _count_queries() -> Iterator[list[int]]:
+    count = [0]
+
+    def count_query(execute, sql, params, many, context):
+        count[0] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_query):
+        yield count
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    return round(peak / 1024, 1)
+
+
+def _bank_account(bank_name: str) -> BankAccount:
+    """
+    Throwaway user and bank account, with a category mapping for every known label.
+    """
+    user = User.objects.create_user(username=f"benchmark-{time.time_ns()}")
+    bank, _ = BankBrand.objects.get_or_create(name=bank_name)
+    category = Category.objects.create(name="Benchmark", user=user)
+    sub_category = SubCategory.objects.create(name="Known", category=category, user=user)
+    LabelCategoryMapping.objects.bulk_create(
+        LabelCategoryMapping(user=user, label=label, category=category, sub_category=sub_category)
+        for label in KNOWN_LABELS
+    )
+    return BankAccount.objects.create(account_number="benchmark", bank=bank, user=user)
+
+
+def parse_case(bank_name: str, paths: list[Path]) -> None:
+    for path in paths:
+        for _ in get_bank_parser(bank_name).parse_file(path):
+            pass
+
+
+def row_by_row_case(bank_account: BankAccount, paths: list[Path]) -> None:
+    # Path of parse_csv_and_create_statements, without the category prompt
+    import_statement_file(
+        paths[0], DATE_FROM, DATE_TO, StatementType.BANK_STATEMENT, bank_account.id, bank_account.user_id
+    )
+
+
+def batched_case(bank_account: BankAccount, paths: list[Path]) -> None:
+    # Path of the upload endpoint (import worker)
+    import_statement_file(
+        paths[0], DATE_FROM, DATE_TO, StatementType.BANK_STATEMENT, bank_account.id, bank_account.user_id, batched=True
+    )
+
+
+def multi_file_case(bank_account: BankAccount, paths: list[Path]) -> None:
+    statement_files = [
+        StatementFile(path, statement_type, bank_account.id, DATE_FROM, DATE_TO)
+        for path, statement_type in zip(paths, StatementType.values)
+    ]
+    import_statement_files(statement_files, bank_account.user_id)
+
+
+CASES: dict[str, Callable] = {
+    "parse": parse_case,
+    "row_by_row": row_by_row_case,
+    "batched": batched_case,
+    "multi_file": multi_file_case,
+}
+MULTI_FILE_COUNT = len(StatementType.values)
+
+
+def run_case(case: str, bank_name: str, rows: int, tmp_dir: Path, known_ratio: float, seed: int) -> BenchmarkResult:
+    file_count = MULTI_FILE_COUNT if case == "multi_file" else 1
+    paths = [
+        write_statement_csv(tmp_dir / f"{case}_{rows}_{i}.csv", bank_name, rows // file_count, known_ratio, seed + i)
+        for i in range(file_count)
+    ]
+    with transaction.atomic():
+        args = (bank_name, paths) if case == "parse" else (_bank_account(bank_name), paths)
+        with _count_queries() as queries:
+            start = time.perf_counter()
+            CASES[case](*args)
+            seconds = time.perf_counter() - start
+        transaction.set_rollback(True)
+    for path in paths:
+        path.unlink()
+    return BenchmarkResult(
+        case=case,
+        rows=rows,
+        seconds=round(seconds, 3),
+        rows_per_second=round(rows / seconds, 1),
+        queries=queries[0],
+        queries_per_row=round(queries[0] / rows, 4),
+        peak_rss_mb=_peak_rss_mb(),
+    )
+
+
+def run_benchmarks(
+    bank_name: str, row_counts: list[int], cases: list[str], known_ratio: float = 0.8, seed: int = 0, quiet: bool = True
+) -> dict:
+    """
+    Run each case at each row count (smallest first) and return the report stored as JSON.
+    With quiet, the output of the import (created categories, unmatched labels...) is discarded.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir, open(os.devnull, "w") as devnull:
+        for rows in sorted(row_counts):
+            for case in cases:
+                if quiet:
+                    with redirect_stdout(devnull):
+                        result = run_case(case, bank_name, rows, Path(tmp_dir), known_ratio, seed)
+                else:
+                    result = run_case(case, bank_name, rows, Path(tmp_dir), known_ratio, seed)
+                results.append(result._asdict())
+    return {
+        "created_at": timezone.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "cpu_count": os.cpu_count(),
+        },
+        "bank": bank_name,
+        "known_ratio": known_ratio,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def find_regressions(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Cases of the report slower (rows/sec) or running more queries per row than in the baseline,
+    beyond tolerance (0.2 = 20 %).
+    """
+    baseline_results = {(result["case"], result["rows"]): result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        previous: Optional[dict] = baseline_results.get((result["case"], result["rows"]))
+        if previous is None:
+            continue
+        name = f"{result['case']} ({result['rows']} rows)"
+        if result["rows_per_second"] < previous["rows_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: {result['rows_per_second']:,.0f} rows/sec, was {previous['rows_per_second']:,.0f}"
+            )
+        if result["queries_per_row"] > previous["queries_per_row"] * (1 + tolerance):
+            regressions.append(f"{name}: {result['queries_per_row']} queries/row, was {previous['queries_per_row']}")
+    return regressions
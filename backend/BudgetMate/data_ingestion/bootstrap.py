@@ -0,0 +1,56 @@
+"""
+Default categories and subcategories of new users, from data_ingestion/fixtures.
+"""
+
+import json
+from collections import defaultdict
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import NamedTuple
+
+import yaml
+from django.db import transaction
+
+from accounts.models import User
+from data_ingestion.cache import bump_user_version
+from data_ingestion.models import Category, SubCategory
+from data_ingestion.resolvers import CATEGORIES_CACHE_SCOPE
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+class DefaultCategory(NamedTuple):
+    name: str
+    sub_categories: tuple[str, ...]
+
+
+@lru_cache(maxsize=None)
+def get_default_categories() -> tuple[DefaultCategory, ...]:
+    """
+    Default category tree, parsed once per process from categories.json and sub_categories.yaml.
+    """
+    categories = json.loads((FIXTURES_DIR / "categories.json").read_text(encoding="utf-8"))
+    sub_categories = yaml.safe_load((FIXTURES_DIR / "sub_categories.yaml").read_text(encoding="utf-8"))
+    names_by_category: dict[int, list[str]] = defaultdict(list)
+    for sub_category in sub_categories:
+        names_by_category[sub_category["fields"]["category"]].append(sub_category["fields"]["name"])
+    return tuple(
+        DefaultCategory(category["fields"]["name"], tuple(names_by_category[category["pk"]])) for category in categories
+    )
+
+
+def create_default_categories(user: User) -> list[Category]:
+    """
+    Create the default category tree of a user, with one bulk_create for the categories and one
+    for the subcategories.
+    """
+    defaults = get_default_categories()
+    categories = Category.objects.bulk_create(Category(name=default.name, user=user) for default in defaults)
+    SubCategory.objects.bulk_create(
+        SubCategory(name=name, category=category, user=user)
+        for category, default in zip(categories, defaults)
+        for name in default.sub_categories
+    )
+    # bulk_create does not send post_save
+    transaction.on_commit(partial(bump_user_version, CATEGORIES_CACHE_SCOPE, user.id))
+    return categories
@@ -0,0 +1,68 @@
+import time
+from typing import Callable, TypeVar
+
+from django.core.cache import cache, caches
+
+# In-process cache in front of the shared "default" cache, for versioned keys only
+LOCAL_CACHE_ALIAS = "local"
+
+T = TypeVar("T")
+
+
+def _version_key(scope: str, user_id: int) -> str:
+    return f"{scope}:version:{user_id}"
+
+
+def get_user_version(scope: str, user_id: int) -> int:
+    """
+    Current version of a user's cached data for a scope (e.g. "share_rules").
+
+    Cached values are stored under keys containing this version, so bumping it invalidates them
+    without having to know their keys. The initial version is time based: if the version key is
+    evicted, it restarts above every version used before.
+    Versions are always read from the shared cache, so that a bump is seen by every worker.
+    """
+    key = _version_key(scope, user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(scope: str, user_id: int) -> None:
+    """
+    Invalidate a user's cached data for a scope.
+
+    Changes made in a transaction must bump through transaction.on_commit: bumped before the commit,
+    a concurrent read could cache the data it still sees under the new version.
+    Two concurrent bumps may give the same version (cache.incr is not atomic on the file based cache): both
+    read the version after their commit, so whatever is cached under it was computed after both changes.
+    """
+    key = _version_key(scope, user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def user_cache_key(scope: str, user_id: int) -> str:
+    return f"{scope}:{user_id}:{get_user_version(scope, user_id)}"
+
+
+def get_or_set_versioned(key: str, compute: Callable[[], T], timeout: int) -> T:
+    """
+    Value cached under a versioned key (see user_cache_key), computed once for all the workers.
+
+    The value is looked up in the in-process cache, then in the shared cache. A versioned key always
+    maps to the same value (a change of the data changes the key), so the in-process copy is never stale.
+    """
+    local_cache = caches[LOCAL_CACHE_ALIAS]
+    value = local_cache.get(key)
+    if value is None:
+        value = cache.get(key)
+        if value is None:
+            value = compute()
+            cache.set(key, value, timeout)
+        local_cache.set(key, value)
+    return value
@@ -0,0 +1,116 @@
+"""
+Naive Bayes categorizer of transaction labels, trained on the user's categorized statement lines.
+
+The training data is the LabelTokenCount table: the number of lines of each subcategory holding each
+label token. It is updated incrementally, so the categorizer is rebuilt from it (cached) instead of
+being trained again from the lines.
+"""
+
+from dataclasses import dataclass
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from data_ingestion.cache import get_or_set_versioned, user_cache_key
+from data_ingestion.labels import label_tokens
+from data_ingestion.models import CATEGORIZER_CACHE_SCOPE, DOCUMENT_TOKEN, LabelTokenCount
+
+CATEGORIZER_CACHE_TIMEOUT = 60 * 60 * 24
+# Below, the categorizer makes no prediction: a handful of lines does not tell categories apart
+MIN_TRAINING_LINES = 20
+SMOOTHING = 1.0  # Laplace smoothing of the token counts
+
+
+class Prediction(NamedTuple):
+    category_id: int
+    sub_category_id: int
+    confidence: float  # Posterior probability of the subcategory
+
+
+@dataclass
+class NaiveBayesCategorizer:
+    """
+    Multinomial naive Bayes over the label tokens, one class per subcategory.
+    """
+
+    category_ids: np.ndarray  # (classes,)
+    sub_category_ids: np.ndarray  # (classes,)
+    vocabulary: dict[str, int]  # Token: column of log_likelihoods
+    log_priors: np.ndarray  # (classes,)
+    log_likelihoods: np.ndarray  # (classes, tokens)
+
+    @classmethod
+    def build(cls, user_id: int) -> Optional["NaiveBayesCategorizer"]:
+        """
+        Categorizer of a user, or None while there are less than two subcategories or less than
+        MIN_TRAINING_LINES to learn from.
+        """
+        rows = LabelTokenCount.objects.filter(user_id=user_id).values_list(
+            "sub_category_id", "sub_category__category_id", "token", "count"
+        )
+        classes: dict[int, int] = {}
+        category_ids: list[int] = []
+        vocabulary: dict[str, int] = {}
+        entries: list[tuple[int, int, int]] = []
+        line_counts: dict[int, int] = {}
+        for sub_category_id, category_id, token, count in rows.iterator():
+            row = classes.setdefault(sub_category_id, len(classes))
+            if row == len(category_ids):
+                category_ids.append(category_id)
+            if token == DOCUMENT_TOKEN:
+                line_counts[row] = count
+            else:
+                entries.append((row, vocabulary.setdefault(token, len(vocabulary)), count))
+        if len(classes) < 2 or sum(line_counts.values()) < MIN_TRAINING_LINES or not vocabulary:
+            return None
+
+        counts = np.zeros((len(classes), len(vocabulary)))
+        rows_index, columns, values = zip(*entries)
+        counts[list(rows_index), list(columns)] = values
+        documents = np.array([line_counts.get(row, 0) for row in range(len(classes))], dtype=float)
+        smoothed = counts + SMOOTHING
+        return cls(
+            category_ids=np.array(category_ids),
+            sub_category_ids=np.array(list(classes)),
+            vocabulary=vocabulary,
+            log_priors=np.log((documents + SMOOTHING) / (documents.sum() + SMOOTHING * len(classes))),
+            log_likelihoods=np.log(smoothed / smoothed.sum(axis=1, keepdims=True)),
+        )
+
+    def predict(self, labels: list[str]) -> list[Optional[Prediction]]:
+        """
+        Most likely subcategory of each label, scored in one pass over the batch.
+        None for the labels without any known token.
+        """
+        predictions: list[Optional[Prediction]] = [None] * len(labels)
+        scored, offsets, columns = [], [], []
+        for i, label in enumerate(labels):
+            label_columns = [self.vocabulary[token] for token in set(label_tokens(label)) if token in self.vocabulary]
+            if label_columns:
+                scored.append(i)
+                offsets.append(len(columns))
+                columns.extend(label_columns)
+        if not scored:
+            return predictions
+
+        # (classes, labels): sum of the log-likelihoods of each label's tokens
+        scores = np.add.reduceat(self.log_likelihoods[:, columns], offsets, axis=1) + self.log_priors[:, None]
+        probabilities = np.exp(scores - scores.max(axis=0))
+        probabilities /= probabilities.sum(axis=0)
+        best = probabilities.argmax(axis=0)
+        confidences = probabilities[best, np.arange(len(scored))]
+        for i, row, confidence in zip(scored, best.tolist(), confidences.tolist()):
+            predictions[i] = Prediction(int(self.category_ids[row]), int(self.sub_category_ids[row]), confidence)
+        return predictions
+
+
+def get_categorizer(user_id: int) -> Optional[NaiveBayesCategorizer]:
+    """
+    Cached categorizer of a user, rebuilt when their LabelTokenCount table changes.
+    """
+    key = user_cache_key(CATEGORIZER_CACHE_SCOPE, user_id)
+    # get_or_set_versioned does not cache None: cache a falsy placeholder instead
+    categorizer = get_or_set_versioned(
+        key, lambda: NaiveBayesCategorizer.build(user_id) or False, CATEGORIZER_CACHE_TIMEOUT
+    )
+    return categorizer or None
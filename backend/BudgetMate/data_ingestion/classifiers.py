@@ -0,0 +1,115 @@
+import re
+from datetime import date
+from enum import Enum
+from typing import NamedTuple, Optional
+
+from data_ingestion.codecs import SHORT_DATE_FORMAT, parse_date
+from data_ingestion.constants import (
+    REGEX_BANK_FEE,
+    REGEX_CREDIT_CARD_REFUND,
+    REGEX_DIRECT_DEBIT,
+    REGEX_INSTANT_TRANSFER,
+    REGEX_OUTGOING_TRANSFER,
+    REGEX_PURCHASE,
+    REGEX_TRANSFER,
+)
+
+SKIP_SALARY = "salary"
+SKIP_SAVINGS = "savings"
+
+
+class Direction(str, Enum):
+    """
+    Direction of the money flow for a classified transaction label.
+    """
+
+    EXPENSE = "expense"
+    INCOME = "income"
+    OUTGOING = "outgoing"
+    UNKNOWN = "unknown"
+
+
+class ClassifiedLabel(NamedTuple):
+    operation_type: str
+    clean_label: str
+    effective_date: Optional[date]  # Card operation date, when the label carries one
+    direction: Direction
+
+
+class LabelRule(NamedTuple):
+    pattern: re.Pattern
+    operation_type: str
+    direction: Direction
+    label_group: int
+    date_group: Optional[int]
+
+
+PURCHASE_RULE = LabelRule(re.compile(REGEX_PURCHASE), "CB", Direction.EXPENSE, 2, 3)
+DIRECT_DEBIT_RULE = LabelRule(re.compile(REGEX_DIRECT_DEBIT), "DD", Direction.EXPENSE, 2, None)
+TRANSFER_RULE = LabelRule(re.compile(REGEX_TRANSFER), "TR", Direction.INCOME, 2, None)
+INSTANT_TRANSFER_RULE = LabelRule(re.compile(REGEX_INSTANT_TRANSFER), "TR", Direction.INCOME, 1, None)
+OUTGOING_TRANSFER_RULE = LabelRule(re.compile(REGEX_OUTGOING_TRANSFER), "TR", Direction.OUTGOING, 2, None)
+CREDIT_CARD_REFUND_RULE = LabelRule(re.compile(REGEX_CREDIT_CARD_REFUND), "RE", Direction.INCOME, 2, 3)
+BANK_FEE_RULE = LabelRule(re.compile(REGEX_BANK_FEE), "BF", Direction.EXPENSE, 1, None)
+
+# Priority order used when a label does not start with a known prefix.
+LABEL_RULES = (
+    PURCHASE_RULE,
+    DIRECT_DEBIT_RULE,
+    TRANSFER_RULE,
+    INSTANT_TRANSFER_RULE,
+    OUTGOING_TRANSFER_RULE,
+    CREDIT_CARD_REFUND_RULE,
+    BANK_FEE_RULE,
+)
+
+# Candidate rules by first word of the label: ACHAT CB, PRELEVEMENT DE, VIREMENT ..., CREDIT CARTE, COTISATION.
+RULES_BY_PREFIX = {
+    "ACHAT": (PURCHASE_RULE,),
+    "PRELEVEMENT": (DIRECT_DEBIT_RULE,),
+    "VIREMENT": (TRANSFER_RULE, INSTANT_TRANSFER_RULE, OUTGOING_TRANSFER_RULE),
+    "CREDIT": (CREDIT_CARD_REFUND_RULE,),
+    "COTISATION": (BANK_FEE_RULE,),
+}
+
+
+def _build_result(rule: LabelRule, match: re.Match) -> ClassifiedLabel:
+    clean_label = " ".join(match.group(rule.label_group).split())
+    effective_date = None
+    if rule.date_group is not None:
+        effective_date = parse_date(match.group(rule.date_group), SHORT_DATE_FORMAT)
+    return ClassifiedLabel(rule.operation_type, clean_label, effective_date, rule.direction)
+
+
+def classify_banque_postale_label(label: str) -> ClassifiedLabel:
+    """
+    Classify a Banque Postale label with a single scan.
+
+    The first word of the label selects the candidate precompiled pattern(s), which are
+    anchored at the start of the label. Labels without a known prefix fall back to a search
+    with every pattern, in the historical priority order.
+    """
+    stripped = label.lstrip()
+    first_word = stripped.split(None, 1)[0] if stripped else ""
+    for rule in RULES_BY_PREFIX.get(first_word, ()):
+        match = rule.pattern.match(stripped)
+        if match:
+            return _build_result(rule, match)
+
+    for rule in LABEL_RULES:
+        match = rule.pattern.search(label)
+        if match:
+            return _build_result(rule, match)
+    return ClassifiedLabel("OT", label.strip('"'), None, Direction.UNKNOWN)
+
+
+def banque_postale_skip_reason(classified: ClassifiedLabel) -> Optional[str]:
+    """
+    Return why a classified line must not be imported (salary or savings transfer), or None.
+    """
+    if classified.direction is Direction.INCOME and classified.operation_type != "RE":
+        if "SALAIRE" in classified.clean_label:
+            return SKIP_SALARY
+    elif classified.direction is Direction.OUTGOING and "EPARGNE" in classified.clean_label:
+        return SKIP_SAVINGS
+    return None
@@ -0,0 +1,80 @@
+"""
+Codecs of the date and amount columns of the bank exports.
+
+Dates are parsed with a memoized strptime: a statement holds a few dozen distinct dates for thousands of
+rows. Amounts are parsed from their French notation ("-1 234,56") to Decimal or integer cents without
+going through float, so they are exact. This module must not import Django models.
+"""
+
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional
+
+DATE_FORMAT = "%d/%m/%Y"  # Operation dates of the exports: 12/03/2025
+SHORT_DATE_FORMAT = "%d.%m.%y"  # Card operation dates in the labels: 11.03.25
+
+# Thousands separators: space, no-break space, narrow no-break space, apostrophe
+THOUSANDS_SEPARATORS = str.maketrans("", "", " \u00a0\u202f'")
+AMOUNT = re.compile(r"([+-]?)([0-9]+)(?:[.,]([0-9]{1,2}))?")
+CANONICAL_AMOUNT = re.compile(r"-?[0-9]+\.[0-9]{2}")
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value: str, date_format: str = DATE_FORMAT) -> date:
+    """
+    Memoized datetime.strptime(value, date_format).date(). Raises ValueError like strptime.
+    """
+    return datetime.strptime(value, date_format).date()
+
+
+def normalize_amount(value: str) -> Optional[str]:
+    """
+    Canonical notation of a French amount, with a sign only when negative and two decimals:
+    "- 1 234,5" -> "-1234.50". None for an empty value.
+
+    The decimal separator is a comma (or a dot when the amount has no comma, dots being thousands
+    separators otherwise); at most two decimals. Raises ValueError for anything else.
+    """
+    value = value.strip()
+    if not value:
+        return None
+    canonical = value.replace(",", ".")
+    if CANONICAL_AMOUNT.fullmatch(canonical):
+        # Fast path: "-1234,56", the notation of the exports
+        return canonical
+
+    value = value.translate(THOUSANDS_SEPARATORS)
+    if "," in value:
+        value = value.replace(".", "")
+    match = AMOUNT.fullmatch(value)
+    if match is None:
+        raise ValueError(f"Invalid amount: '{value}'.")
+    sign, units, decimals = match.groups()
+    return f"{'-' if sign == '-' else ''}{units}.{(decimals or '').ljust(2, '0')}"
+
+
+def parse_amount_cents(value: str) -> Optional[int]:
+    """
+    Exact amount in cents of a French amount (see normalize_amount), e.g. "-1 234,5" -> -123450.
+    """
+    canonical = normalize_amount(value)
+    return None if canonical is None else int(canonical.replace(".", ""))
+
+
+def parse_amount(value: str) -> Optional[Decimal]:
+    """
+    Exact Decimal amount of a French amount (see normalize_amount), e.g. "-42,1" -> Decimal("-42.10").
+    """
+    canonical = normalize_amount(value)
+    return None if canonical is None else Decimal(canonical)
+
+
+def format_amount_cents(cents: int) -> str:
+    """
+    French notation of an amount in cents, as written by the exports: -123450 -> "-1234,50".
+    """
+    sign = "-" if cents < 0 else ""
+    units, decimals = divmod(abs(cents), 100)
+    return f"{sign}{units},{decimals:02d}"
@@ -25,3 +25,51 @@ REGEX_INSTANT_TRANSFER = r"VIREMENT INSTANTANE DE\s(.*)"
 REGEX_OUTGOING_TRANSFER = r"(VIREMENT\sPOUR)\s(.*)"
 REGEX_CREDIT_CARD_REFUND = r"(CREDIT\sCARTE\sBANCAIRE)\s*(.*)\s(\d{2}\.\d{2}\.\d{2})"
 REGEX_BANK_FEE = r"(COTISATION\s.*)"
+
+# Label normalization (see data_ingestion.labels.normalize_label)
+# Tokens starting the reference part of a label: they and everything after them are dropped
+LABEL_REFERENCE_MARKERS = frozenset({"REF", "REFERENCE", "NUMERO", "FACTURE", "ECH", "ECHEANCE", "MANDAT"})
+# Place names dropped from the end of a label (merchant city or country)
+LABEL_PLACE_SUFFIXES = frozenset(
+    {
+        "FR",
+        "FRA",
+        "FRANCE",
+        "CEDEX",
+        "PARIS",
+        "LYON",
+        "MARSEILLE",
+        "TOULOUSE",
+        "NICE",
+        "NANTES",
+        "STRASBOURG",
+        "MONTPELLIER",
+        "BORDEAUX",
+        "LILLE",
+        "RENNES",
+        "REIMS",
+        "TOULON",
+        "GRENOBLE",
+        "DIJON",
+        "ANGERS",
+        "NIMES",
+        "VILLEURBANNE",
+        "CLERMONT FERRAND",
+        "LE HAVRE",
+        "SAINT ETIENNE",
+        "AIX EN PROVENCE",
+        "LE MANS",
+        "BREST",
+        "TOURS",
+        "AMIENS",
+        "LIMOGES",
+        "PERPIGNAN",
+        "METZ",
+        "BESANCON",
+        "ORLEANS",
+        "ROUEN",
+        "MULHOUSE",
+        "CAEN",
+        "NANCY",
+    }
+)
@@ -0,0 +1,130 @@
+"""
+Streamed exports of a user's statement lines and totals, as CSV or NDJSON.
+
+Rows are read with QuerySet.iterator(chunk_size=...) (a server-side cursor on PostgreSQL) and encoded one
+by one, so an export of any size runs in constant memory and its first bytes are sent right away.
+"""
+
+import csv
+import json
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from django.db.models import QuerySet
+
+from data_ingestion.models import StatementCategoryTotal, StatementLine
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class Export(NamedTuple):
+    columns: tuple[str, ...]
+    rows: Iterator[tuple]
+
+
+class _Echo:
+    """
+    File-like object returning what is written to it, to get the lines of a csv.writer one by one.
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def export_lines(lines: QuerySet) -> Export:
+    """
+    One row per statement line, oldest first.
+    """
+    columns = (
+        "operation_date",
+        "operation_type",
+        "libeller",
+        "amount",
+        "category__name",
+        "sub_category__name",
+        "is_shared",
+        "comment",
+        "account_statement_id",
+    )
+    rows = lines.order_by("operation_date", "id").values_list(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return Export(columns, rows)
+
+
+def _export_totals(totals: QuerySet) -> Export:
+    columns = (
+        "account_statement__start_date",
+        "account_statement__end_date",
+        "account_statement__statement_type",
+        "category__name",
+        "sub_category__name",
+        "is_shared",
+        "total",
+        "line_count",
+    )
+    rows = (
+        totals.order_by("account_statement__start_date", "account_statement_id", "category__name", "sub_category__name")
+        .values_list(*columns)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return Export(columns, rows)
+
+
+def export_totals(user_id: int, account_statement_id: Optional[int] = None) -> Export:
+    """
+    The StatementCategoryTotal rows of the user's statements.
+    """
+    totals = StatementCategoryTotal.objects.filter(account_statement__bank_account__user_id=user_id)
+    if account_statement_id is not None:
+        totals = totals.filter(account_statement_id=account_statement_id)
+    return _export_totals(totals)
+
+
+def export_shared(user_id: int, account_statement_id: Optional[int] = None) -> Export:
+    """
+    Shared expenses by statement, category and subcategory (the report printed by the CLI).
+    """
+    totals = StatementCategoryTotal.objects.filter(
+        account_statement__bank_account__user_id=user_id, is_shared=True, category__isnull=False
+    )
+    if account_statement_id is not None:
+        totals = totals.filter(account_statement_id=account_statement_id)
+    return _export_totals(totals)
+
+
+def user_lines(user_id: int) -> QuerySet:
+    return StatementLine.objects.filter(account_statement__bank_account__user_id=user_id)
+
+
+def _column_name(column: str) -> str:
+    return column.replace("account_statement__", "statement_").replace("__", "_")
+
+
+def encode_csv(export: Export) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow([_column_name(column) for column in export.columns])
+    for row in export.rows:
+        yield writer.writerow(row)
+
+
+def encode_ndjson(export: Export) -> Iterator[str]:
+    names = [_column_name(column) for column in export.columns]
+    for row in export.rows:
+        yield json.dumps(dict(zip(names, row)), default=str) + "\n"
+
+
+ENCODERS = {
+    "csv": encode_csv,
+    "ndjson": encode_ndjson,
+}
+
+
+def encode(export: Export, export_format: str) -> Iterable[str]:
+    try:
+        encoder = ENCODERS[export_format]
+    except KeyError:
+        raise ValueError(f"Unknown export format '{export_format}'.") from None
+    return encoder(export)
@@ -0,0 +1,30 @@
+from django_filters import rest_framework as filters
+
+from data_ingestion.models import AccountStatement, OperationType, StatementLine, StatementType
+
+
+class StatementLineFilter(filters.FilterSet):
+    # Related objects are filtered by id, without loading them: the base queryset is already the user's
+    account_statement = filters.NumberFilter(field_name="account_statement_id")
+    category = filters.NumberFilter(field_name="category_id")
+    sub_category = filters.NumberFilter(field_name="sub_category_id")
+    start_date = filters.DateFilter(field_name="operation_date", lookup_expr="gte")
+    end_date = filters.DateFilter(field_name="operation_date", lookup_expr="lte")
+    operation_type = filters.MultipleChoiceFilter(choices=OperationType.choices)
+    is_shared = filters.BooleanFilter()
+    unclassified = filters.BooleanFilter(field_name="is_shared", lookup_expr="isnull")
+
+    class Meta:
+        model = StatementLine
+        fields = []
+
+
+class AccountStatementFilter(filters.FilterSet):
+    bank_account = filters.NumberFilter(field_name="bank_account_id")
+    start_date = filters.DateFilter(field_name="start_date", lookup_expr="gte")
+    end_date = filters.DateFilter(field_name="end_date", lookup_expr="lte")
+    statement_type = filters.MultipleChoiceFilter(choices=StatementType.choices)
+
+    class Meta:
+        model = AccountStatement
+        fields = []
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from logging import getLogger
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import UploadedFile
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from data_ingestion.models import ImportedFile, ImportJob, ImportJobStatus
+from data_ingestion.parsers import IngestionReport, import_statement_file
+from data_ingestion.utils import FileFingerprint
+
+logger = getLogger("django")
+
+IMPORT_JOB_PROGRESS_TIMEOUT = 60 * 60
+
+
+def spool_upload(uploaded_file: UploadedFile) -> tuple[Path, FileFingerprint]:
+    """
+    Copy an uploaded file chunk by chunk to the import spool directory, without loading it in memory.
+    The SHA-256 of the content is computed on the way.
+    """
+    spool_dir = Path(settings.IMPORT_SPOOL_DIR)
+    spool_dir.mkdir(parents=True, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=spool_dir, suffix=".csv")
+    digest = hashlib.sha256()
+    with os.fdopen(fd, "wb") as spooled_file:
+        for chunk in uploaded_file.chunks():
+            digest.update(chunk)
+            spooled_file.write(chunk)
+    return Path(path), FileFingerprint(digest.hexdigest(), uploaded_file.size)
+
+
+def is_already_uploaded(user_id: int, sha256: str) -> bool:
+    """
+    Whether the user already imported this file content, or uploaded it in a job not processed yet.
+    """
+    active_statuses = [ImportJobStatus.PENDING, ImportJobStatus.RUNNING]
+    return (
+        ImportedFile.objects.filter(user_id=user_id, sha256=sha256).exists()
+        or ImportJob.objects.filter(user_id=user_id, sha256=sha256, status__in=active_statuses).exists()
+    )
+
+
+def job_progress_key(job_id: int) -> str:
+    return f"import_job_progress:{job_id}"
+
+
+def get_job_progress(job_id: int) -> Optional[dict]:
+    return cache.get(job_progress_key(job_id))
+
+
+def requeue_interrupted_jobs() -> int:
+    """
+    Put back in the queue the jobs left running by a stopped worker: those without heartbeat for
+    IMPORT_JOB_STALE_AFTER seconds. The jobs of the live workers are left alone.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.IMPORT_JOB_STALE_AFTER)
+    return (
+        ImportJob.objects.filter(status=ImportJobStatus.RUNNING)
+        .filter(Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at=None))
+        .update(status=ImportJobStatus.PENDING, started_at=None, heartbeat_at=None)
+    )
+
+
+def claim_next_job() -> Optional[ImportJob]:
+    """
+    Mark the oldest pending job as running and return it. Jobs locked by another worker are skipped.
+    """
+    with transaction.atomic():
+        job = (
+            ImportJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ImportJobStatus.PENDING)
+            .order_by("id")
+            .first()
+        )
+        if job:
+            job.status = ImportJobStatus.RUNNING
+            job.started_at = job.heartbeat_at = timezone.now()
+            job.save(update_fields=["status", "started_at", "heartbeat_at"])
+    return job
+
+
+class JobHeartbeat(threading.Thread):
+    """
+    Refresh the heartbeat of a running job every IMPORT_JOB_HEARTBEAT_INTERVAL seconds, until stopped.
+    It runs in its own thread, so its own database connection: the updates are not held back by the
+    transaction of the import.
+    """
+
+    def __init__(self, job_id: int):
+        super().__init__(name=f"import-job-{job_id}-heartbeat", daemon=True)
+        self.job_id = job_id
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        try:
+            while not self.stopped.wait(settings.IMPORT_JOB_HEARTBEAT_INTERVAL):
+                ImportJob.objects.filter(id=self.job_id).update(heartbeat_at=timezone.now())
+        finally:
+            connection.close()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.join()
+
+
+def run_import_job(job: ImportJob) -> None:
+    def report_progress(report: IngestionReport) -> None:
+        # The import runs in a single transaction: progress goes through the cache, not the job row.
+        progress = {"rows_parsed": report.parsed, "rows_inserted": report.inserted, "rows_skipped": report.skipped}
+        cache.set(job_progress_key(job.id), progress, timeout=IMPORT_JOB_PROGRESS_TIMEOUT)
+
+    heartbeat = JobHeartbeat(job.id)
+    heartbeat.start()
+    try:
+        report = import_statement_file(
+            job.file_path,
+            job.start_date,
+            job.end_date,
+            job.statement_type,
+            job.bank_account_id,
+            job.user_id,
+            batched=True,
+            progress=report_progress,
+            original_filename=job.original_filename,
+        )
+    except Exception as e:
+        logger.exception(f"Import job {job.id} failed")
+        job.status = ImportJobStatus.FAILED
+        job.error = f"{type(e).__name__}: {e}"
+    else:
+        job.account_statement = report.account_statement
+        if report.already_imported:
+            job.status = ImportJobStatus.FAILED
+            job.error = "This file or statement period was already imported."
+        else:
+            job.status = ImportJobStatus.DONE
+        job.rows_parsed = report.parsed
+        job.rows_inserted = report.inserted
+        job.rows_skipped = report.skipped
+    finally:
+        heartbeat.stop()
+        Path(job.file_path).unlink(missing_ok=True)
+    job.finished_at = timezone.now()
+    job.save()
+    cache.delete(job_progress_key(job.id))
@@ -0,0 +1,89 @@
+"""
+Normalized transaction labels, used to match labels that only differ by store number, city or reference
+(e.g. "CARREFOUR 1234 LYON" and "CARREFOUR 5678 PARIS").
+
+This module must not import Django models: it is used by the models themselves.
+"""
+
+import re
+import unicodedata
+from typing import Generic, Optional, TypeVar
+
+from data_ingestion.constants import LABEL_PLACE_SUFFIXES, LABEL_REFERENCE_MARKERS
+
+T = TypeVar("T")
+
+NON_ALPHANUMERIC = re.compile(r"[^A-Z0-9]+")
+LONGEST_PLACE_SUFFIX = max(len(place.split()) for place in LABEL_PLACE_SUFFIXES)
+VALUE = ""  # Key of a LabelTrie node value: never a token
+
+
+def clean_string(s: str) -> str:
+    return unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
+
+
+def label_tokens(label: str) -> list[str]:
+    """
+    Tokens of the normalized key of a label: accents, punctuation and tokens containing digits removed,
+    reference part (from "REF", "NUMERO"...) and trailing place names dropped.
+    """
+    tokens = []
+    for token in NON_ALPHANUMERIC.split(clean_string(label).upper()):
+        if token in LABEL_REFERENCE_MARKERS:
+            break
+        if token and not any(c.isdigit() for c in token):
+            tokens.append(token)
+    while tokens:
+        for size in range(min(LONGEST_PLACE_SUFFIX, len(tokens)), 0, -1):
+            if " ".join(tokens[-size:]) in LABEL_PLACE_SUFFIXES:
+                del tokens[-size:]
+                break
+        else:
+            break
+    return tokens
+
+
+def normalize_label(label: str) -> str:
+    """
+    Normalized key of a label, e.g. "CARREFOUR 1234 LYON" -> "CARREFOUR". Empty when nothing is left.
+    """
+    return " ".join(label_tokens(label))
+
+
+class LabelTrie(Generic[T]):
+    """
+    Values (e.g. category mappings) indexed by the tokens of their normalized label.
+
+    lookup() returns the value of the longest normalized key that prefixes the normalized label, token
+    by token: its cost depends on the length of the label, not on the number of keys.
+    """
+
+    def __init__(self) -> None:
+        self.root: dict = {}
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def insert(self, normalized_label: str, value: T) -> None:
+        """
+        Index a value under a normalized label. The first value inserted for a key is kept.
+        """
+        if not normalized_label:
+            return
+        node = self.root
+        for token in normalized_label.split():
+            node = node.setdefault(token, {})
+        if VALUE not in node:
+            node[VALUE] = value
+            self.size += 1
+
+    def lookup(self, label: str) -> Optional[T]:
+        node = self.root
+        best = None
+        for token in label_tokens(label):
+            node = node.get(token)
+            if node is None:
+                break
+            best = node.get(VALUE, best)
+        return best
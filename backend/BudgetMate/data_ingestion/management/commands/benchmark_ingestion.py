@@ -0,0 +1,62 @@
+import json
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from data_ingestion.benchmarks.generator import GENERATORS
+from data_ingestion.benchmarks.ingestion import CASES, find_regressions, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the statement imports on synthetic exports: parse throughput, queries per row, "
+        "peak RSS and end-to-end import time. The database is left unchanged."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--bank", choices=sorted(GENERATORS), default="Banque postale", help="Export format")
+        parser.add_argument(
+            "--rows",
+            type=int,
+            nargs="+",
+            default=[1000],
+            help="Row counts to benchmark, e.g. 1000 100000 1000000",
+        )
+        parser.add_argument(
+            "--cases",
+            nargs="+",
+            choices=list(CASES),
+            default=list(CASES),
+            help="Import paths to benchmark (row_by_row runs several queries per row: avoid it on 1M rows)",
+        )
+        parser.add_argument("--known-ratio", type=float, default=0.8, help="Share of lines with a known label")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Write the JSON report to this file instead of the standard output")
+        parser.add_argument("--compare", help="JSON report of a previous run: fail on regressions")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.2, help="Regression threshold for --compare (0.2 = 20 %%)"
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        report = run_benchmarks(
+            options["bank"],
+            options["rows"],
+            options["cases"],
+            options["known_ratio"],
+            options["seed"],
+            quiet=options["verbosity"] < 2,
+        )
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                json.dump(report, output, indent=2)
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as baseline_file:
+                baseline = json.load(baseline_file)
+            if (baseline["bank"], baseline["known_ratio"]) != (report["bank"], report["known_ratio"]):
+                raise CommandError("The baseline was run with another bank or known label ratio.")
+            regressions = find_regressions(report, baseline, options["tolerance"])
+            if regressions:
+                raise CommandError("Regressions:\n" + "\n".join(regressions))
@@ -0,0 +1,42 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from accounts.models import User
+from data_ingestion.exports import ENCODERS, encode, export_lines, export_shared, export_totals, user_lines
+
+
+class Command(BaseCommand):
+    help = "Stream a user's statement lines, shared expenses or statement totals as CSV or NDJSON."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("username", help="Owner of the statements")
+        parser.add_argument("kind", choices=["lines", "shared", "totals"], help="What to export")
+        parser.add_argument("--format", dest="export_format", choices=sorted(ENCODERS), default="csv")
+        parser.add_argument("--account-statement", type=int, help="Only export this statement")
+        parser.add_argument("--output", help="Write to this file instead of the standard output")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user '{options['username']}'.") from None
+
+        account_statement_id = options["account_statement"]
+        if options["kind"] == "lines":
+            lines = user_lines(user.id)
+            if account_statement_id is not None:
+                lines = lines.filter(account_statement_id=account_statement_id)
+            export = export_lines(lines)
+        elif options["kind"] == "shared":
+            export = export_shared(user.id, account_statement_id)
+        else:
+            export = export_totals(user.id, account_statement_id)
+
+        chunks = encode(export, options["export_format"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
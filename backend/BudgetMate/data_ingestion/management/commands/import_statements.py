@@ -0,0 +1,252 @@
+import cProfile
+import glob
+import pstats
+import sys
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Any, Iterator, NamedTuple
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection, transaction
+
+from data_ingestion.bank_parsers import BANK_PARSERS, get_bank_parser
+from data_ingestion.categorizer import NaiveBayesCategorizer
+from data_ingestion.models import BankAccount, StatementType
+from data_ingestion.parsers import (
+    BulkLineWriter,
+    GetOrCreateLineWriter,
+    StatementFile,
+    import_statement_file,
+    import_statement_files,
+)
+from data_ingestion.resolvers import CategoryIndex, CategoryResolver
+from data_ingestion.utils import ShareRuleIndex
+
+# Functions whose queries belong to a stage of the import. The other queries (user, bank account, statement
+# and imported file lookups) belong to the "setup" stage.
+STAGE_FUNCTIONS = {
+    CategoryIndex.build.__func__.__code__: "categorization",
+    ShareRuleIndex.build.__func__.__code__: "categorization",
+    CategoryResolver.resolve.__code__: "categorization",
+    CategoryResolver.learn.__code__: "categorization",
+    NaiveBayesCategorizer.build.__func__.__code__: "categorization",
+    CategoryResolver.flush.__code__: "persistence",
+    BulkLineWriter.__init__.__code__: "persistence",
+    BulkLineWriter.flush.__code__: "persistence",
+    GetOrCreateLineWriter.add.__code__: "persistence",
+}
+
+
+class LoggedQuery(NamedTuple):
+    seconds: float
+    sql: str
+
+
+def _current_stage() -> str:
+    frame = sys._getframe(2)
+    while frame:
+        stage = STAGE_FUNCTIONS.get(frame.f_code)
+        if stage:
+            return stage
+        frame = frame.f_back
+    return "setup"
+
+
+@contextmanager
+def log_queries() -> Iterator[dict[str, list[LoggedQuery]]]:
+    """
+    Record the duration and SQL of every query, by import stage.
+    """
+    queries: dict[str, list[LoggedQuery]] = defaultdict(list)
+
+    def log_query(execute, sql, params, many, context):
+        stage = _current_stage()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            queries[stage].append(LoggedQuery(time.perf_counter() - start, sql))
+
+    with connection.execute_wrapper(log_query):
+        yield queries
+
+
+class Command(BaseCommand):
+    help = (
+        "Import bank CSV exports into statements of bank accounts. Paths may be globs; with several files, "
+        "give one --statement-type per file, and one --bank-account per file or one for all of them. The "
+        "period of each file is derived from its operations unless --from and --to are given (required for a "
+        "single file). Without --interactive, unknown labels get the category proposed by the export "
+        "(or Uncategorized)."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("paths", nargs="+", help="CSV files or glob patterns")
+        parser.add_argument(
+            "--bank-account",
+            dest="bank_accounts",
+            type=int,
+            action="append",
+            help="Id of the bank account to import into, for all the files or for each file, in order",
+        )
+        parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="Statement start (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Statement end (YYYY-MM-DD)")
+        parser.add_argument(
+            "--statement-type",
+            dest="statement_types",
+            action="append",
+            choices=StatementType.values,
+            help="Statement type of each file, in order (default: BS)",
+        )
+        parser.add_argument("--bank", choices=sorted(BANK_PARSERS), help="Export format, for --parse-only")
+        parser.add_argument("--interactive", action="store_true", help="Ask for the category of unknown labels")
+        parser.add_argument("--workers", type=int, help="Parser processes for several files (default: CPU count)")
+        parser.add_argument("--parse-only", action="store_true", help="Only parse the files, without database")
+        parser.add_argument("--dry-run", action="store_true", help="Import in a transaction that is rolled back")
+        parser.add_argument(
+            "--profile",
+            nargs="?",
+            const="import_statements.prof",
+            help="Profile the import with cProfile and dump the stats to this file (default: %(const)s)",
+        )
+        parser.add_argument("--profile-top", type=int, default=25, help="Functions listed with --profile")
+        parser.add_argument("--log-queries", action="store_true", help="Report the queries of each import stage")
+        parser.add_argument("--slowest", type=int, default=3, help="Slowest queries listed per stage")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        paths = self.expand_paths(options["paths"])
+        with ExitStack() as stack:
+            profiler = None
+            if options["profile"]:
+                profiler = cProfile.Profile()
+                stack.callback(self.write_profile, profiler, options["profile"], options["profile_top"])
+            queries = stack.enter_context(log_queries()) if options["log_queries"] else None
+            if queries is not None:
+                stack.callback(self.write_query_log, queries, options["slowest"])
+
+            start = time.perf_counter()
+            if profiler:
+                profiler.enable()
+            try:
+                if options["parse_only"]:
+                    self.parse(paths, options)
+                else:
+                    self.import_files(paths, options)
+            finally:
+                if profiler:
+                    profiler.disable()
+            self.stdout.write(f"Done in {time.perf_counter() - start:.2f}s.")
+
+    def expand_paths(self, patterns: list[str]) -> list[Path]:
+        paths = []
+        for pattern in patterns:
+            matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+            if not matches:
+                raise CommandError(f"No file matches '{pattern}'.")
+            paths.extend(Path(match) for match in matches)
+        missing = [str(path) for path in paths if not path.is_file()]
+        if missing:
+            raise CommandError(f"File(s) not found: {', '.join(missing)}.")
+        return paths
+
+    def parse(self, paths: list[Path], options: dict) -> None:
+        bank_name = options["bank"]
+        if not bank_name:
+            if not options["bank_accounts"]:
+                raise CommandError("--parse-only needs --bank (or --bank-account).")
+            bank_name = BankAccount.objects.select_related("bank").get(id=options["bank_accounts"][0]).bank.name
+        for path in paths:
+            parser = get_bank_parser(bank_name)
+            start = time.perf_counter()
+            rows = sum(1 for _ in parser.parse_file(path))
+            seconds = time.perf_counter() - start
+            skipped = ", ".join(f"{reason}: {count}" for reason, count in parser.skipped.items()) or "none"
+            self.stdout.write(
+                f"{path.name}: {rows} lines parsed in {seconds:.2f}s ({rows / seconds:,.0f} lines/sec), "
+                f"{parser.unmatched} unmatched, skipped: {skipped}"
+            )
+
+    def import_files(self, paths: list[Path], options: dict) -> None:
+        bank_account_ids = options["bank_accounts"]
+        if not bank_account_ids:
+            raise CommandError("--bank-account is required to import.")
+        if bool(options["date_from"]) != bool(options["date_to"]):
+            raise CommandError("Give both --from and --to, or neither.")
+        if len(paths) == 1 and not options["date_from"]:
+            raise CommandError("--from and --to are required to import a single file.")
+        statement_types = options["statement_types"] or [StatementType.BANK_STATEMENT]
+        if len(paths) > 1 and len(statement_types) != len(paths):
+            raise CommandError(f"{len(paths)} files: give one --statement-type per file, in order.")
+        if len(bank_account_ids) == 1:
+            bank_account_ids = bank_account_ids * len(paths)
+        elif len(bank_account_ids) != len(paths):
+            raise CommandError(f"{len(paths)} files: give one --bank-account for all of them or one per file.")
+        bank_accounts = BankAccount.objects.in_bulk(set(bank_account_ids))
+        unknown = sorted(set(bank_account_ids) - bank_accounts.keys())
+        if unknown:
+            raise CommandError(f"Unknown bank account(s): {', '.join(map(str, unknown))}.")
+        user_ids = {bank_account.user_id for bank_account in bank_accounts.values()}
+        if len(user_ids) > 1:
+            raise CommandError("The bank accounts must belong to the same user.")
+        (user_id,) = user_ids
+
+        prompt = None
+        if options["interactive"]:
+            from data_ingestion.views import prompt_for_category
+
+            prompt = prompt_for_category
+
+        with transaction.atomic():
+            if len(paths) == 1:
+                reports = [
+                    import_statement_file(
+                        paths[0],
+                        options["date_from"],
+                        options["date_to"],
+                        statement_types[0],
+                        bank_account_ids[0],
+                        user_id,
+                        batched=True,
+                        prompt=prompt,
+                    )
+                ]
+            else:
+                reports = import_statement_files(
+                    [
+                        StatementFile(path, statement_type, bank_account_id, options["date_from"], options["date_to"])
+                        for path, statement_type, bank_account_id in zip(paths, statement_types, bank_account_ids)
+                    ],
+                    user_id,
+                    prompt=prompt,
+                    max_workers=options["workers"],
+                )
+            if options["dry_run"]:
+                transaction.set_rollback(True)
+
+        for path, report in zip(paths, reports):
+            if report.error:
+                self.stderr.write(f"{path.name}: not imported: {report.error}")
+            elif report.already_imported:
+                self.stdout.write(f"{path.name}: already imported in {report.account_statement}")
+            else:
+                self.stdout.write(
+                    f"{path.name}: {report.parsed} lines parsed, {report.inserted} inserted, "
+                    f"{report.skipped} duplicates skipped"
+                )
+        if options["dry_run"]:
+            self.stdout.write("Dry run: the import was rolled back.")
+
+    def write_profile(self, profiler: cProfile.Profile, path: str, top: int) -> None:
+        profiler.dump_stats(path)
+        self.stdout.write(f"Profile written to {path} (top {top} functions by cumulative time):")
+        pstats.Stats(profiler, stream=self.stdout).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+
+    def write_query_log(self, queries: dict[str, list[LoggedQuery]], slowest: int) -> None:
+        for stage, stage_queries in queries.items():
+            total = sum(query.seconds for query in stage_queries)
+            self.stdout.write(f"{stage}: {len(stage_queries)} queries, {total:.3f}s")
+            for query in sorted(stage_queries, reverse=True)[:slowest]:
+                self.stdout.write(f"  {query.seconds * 1000:8.2f} ms  {query.sql[:200]}")
@@ -0,0 +1,28 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from data_ingestion.models import StatementCategoryTotal
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-statement category totals from the statement lines, then verify them."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--check",
+            default=False,
+            action="store_true",
+            help="Only verify the stored totals, without rebuilding them",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if not options["check"]:
+            rows = StatementCategoryTotal.objects.rebuild()
+            self.stdout.write(f"Rebuilt {rows} statement total(s).")
+        mismatches = StatementCategoryTotal.objects.verify()
+        for key, (expected, stored) in sorted(mismatches.items(), key=str):
+            self.stderr.write(f"{key}: expected (total, count) {expected}, stored {stored}")
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} statement total(s) out of sync.")
+        self.stdout.write("Statement totals are in sync.")
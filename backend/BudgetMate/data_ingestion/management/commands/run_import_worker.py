@@ -0,0 +1,51 @@
+import time
+from logging import getLogger
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from prometheus_client import start_http_server
+
+from data_ingestion.jobs import claim_next_job, requeue_interrupted_jobs, run_import_job
+
+logger = getLogger("django")
+
+
+class Command(BaseCommand):
+    help = "Process the pending statement import jobs created by the upload endpoint."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--once",
+            default=False,
+            action="store_true",
+            help="Process the pending jobs then exit instead of polling for new ones",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.IMPORT_WORKER_POLL_INTERVAL,
+            help="Seconds to wait between two checks of an empty queue",
+        )
+        parser.add_argument(
+            "--metrics-port",
+            type=int,
+            help="Expose the Prometheus metrics of the worker (rows parsed, stage timings...) on this port",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options["metrics_port"]:
+            start_http_server(options["metrics_port"])
+        while True:
+            # The jobs of a stopped worker (this one before a restart, or another one) are taken back
+            requeued = requeue_interrupted_jobs()
+            if requeued:
+                logger.warning(f"Requeued {requeued} interrupted import job(s)")
+            job = claim_next_job()
+            if job:
+                logger.info(f"Processing import job {job.id}")
+                run_import_job(job)
+                continue
+            if options["once"]:
+                return
+            time.sleep(options["poll_interval"])
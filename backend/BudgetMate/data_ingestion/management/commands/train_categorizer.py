@@ -0,0 +1,24 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from accounts.models import User
+from data_ingestion.models import LabelTokenCount
+
+
+class Command(BaseCommand):
+    help = "Rebuild the label token counts of the categorizer from the categorized statement lines."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("usernames", nargs="*", help="Users to train the categorizer of (default: all)")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        users = User.objects.all()
+        if options["usernames"]:
+            users = users.filter(username__in=options["usernames"])
+            unknown = set(options["usernames"]) - set(users.values_list("username", flat=True))
+            if unknown:
+                raise CommandError(f"Unknown user(s): {', '.join(sorted(unknown))}.")
+        for user in users.order_by("id"):
+            rows = LabelTokenCount.objects.rebuild(user.id)
+            self.stdout.write(f"{user.username}: {rows} token count(s).")
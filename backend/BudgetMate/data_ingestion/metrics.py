@@ -0,0 +1,71 @@
+"""
+Prometheus metrics of the statement imports, exposed on /metrics with the django-prometheus ones
+(the import worker's through PROMETHEUS_MULTIPROC_DIR, see BudgetMate.views.metrics).
+"""
+
+from collections import Counter as SkipCounter
+from typing import Iterator
+
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+from data_ingestion.models import ImportJob, ImportJobStatus
+
+ROWS_PARSED = Counter(
+    "budgetmate_ingestion_rows_parsed_total",
+    "Statement lines parsed from bank exports",
+    ["bank"],
+)
+ROWS_SKIPPED = Counter(
+    "budgetmate_ingestion_rows_skipped_total",
+    "Bank export rows not imported, by reason (salary, savings, invalid_row)",
+    ["bank", "reason"],
+)
+ROWS_UNMATCHED = Counter(
+    "budgetmate_ingestion_rows_unmatched_total",
+    "Imported lines whose label matches no known pattern",
+    ["bank"],
+)
+IMPORT_STAGE_SECONDS = Histogram(
+    "budgetmate_ingestion_stage_seconds",
+    "Time spent by an import in each stage: parsing, categorization and persistence",
+    ["stage"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+
+class PendingImportJobsCollector:
+    """
+    Number of import jobs waiting for the import worker, counted when scraped.
+
+    A collector rather than a Gauge: gauge functions are not collected in multiprocess mode
+    (see BudgetMate.views.metrics), the collector is registered there too.
+    """
+
+    name = "budgetmate_import_jobs_pending"
+    documentation = "Import jobs waiting for the import worker"
+
+    def describe(self) -> Iterator[GaugeMetricFamily]:
+        yield GaugeMetricFamily(self.name, self.documentation)
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        pending = ImportJob.objects.filter(status=ImportJobStatus.PENDING).count()
+        yield GaugeMetricFamily(self.name, self.documentation, value=pending)
+
+
+IMPORT_JOBS_PENDING = PendingImportJobsCollector()
+REGISTRY.register(IMPORT_JOBS_PENDING)
+
+
+def record_parsed_file(bank_name: str, parsed: int, skipped: SkipCounter, unmatched: int) -> None:
+    ROWS_PARSED.labels(bank_name).inc(parsed)
+    for reason, count in skipped.items():
+        ROWS_SKIPPED.labels(bank_name, reason).inc(count)
+    if unmatched:
+        ROWS_UNMATCHED.labels(bank_name).inc(unmatched)
+
+
+def record_import_stages(parsing: float, categorization: float, persistence: float) -> None:
+    IMPORT_STAGE_SECONDS.labels("parsing").observe(parsing)
+    IMPORT_STAGE_SECONDS.labels("categorization").observe(categorization)
+    IMPORT_STAGE_SECONDS.labels("persistence").observe(persistence)
@@ -0,0 +1,24 @@
+# Generated by Django 4.1.13 on 2026-10-18 08:12
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_ingestion', '0010_alter_category_unique_together'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sharerule',
+            index=models.Index(models.F('user'), django.db.models.functions.text.Upper('label'), name='sharerule_user_upper_label_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subcategory',
+            index=models.Index(django.db.models.functions.text.Upper('name'), models.F('category'), name='subcategory_upper_name_idx'),
+        ),
+    ]
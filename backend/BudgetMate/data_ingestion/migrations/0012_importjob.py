@@ -0,0 +1,41 @@
+# Generated by Django 4.1.13 on 2026-10-18 08:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_ingestion', '0011_sharerule_sharerule_user_upper_label_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('statement_type', models.CharField(choices=[('BS', 'Bank Statement'), ('CA', 'Card Receipts'), ('CR', 'Credit'), ('DB', 'Debit'), ('OT', 'Other')], max_length=255)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('file_path', models.CharField(max_length=500)),
+                ('original_filename', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('PE', 'Pending'), ('RU', 'Running'), ('DO', 'Done'), ('FA', 'Failed')], default='PE', max_length=2)),
+                ('rows_parsed', models.PositiveIntegerField(default=0)),
+                ('rows_inserted', models.PositiveIntegerField(default=0)),
+                ('rows_skipped', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('account_statement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='data_ingestion.accountstatement')),
+                ('bank_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='data_ingestion.bankaccount')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='importjob_status_idx')],
+            },
+        ),
+    ]
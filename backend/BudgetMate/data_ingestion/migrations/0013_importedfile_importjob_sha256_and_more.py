@@ -0,0 +1,49 @@
+# Generated by Django 4.1.13 on 2026-10-18 08:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('data_ingestion', '0012_importjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64)),
+                ('original_filename', models.CharField(blank=True, max_length=255)),
+                ('size', models.PositiveBigIntegerField()),
+                ('imported_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='importjob',
+            index=models.Index(fields=['user', 'sha256'], name='importjob_user_sha256_idx'),
+        ),
+        migrations.AddField(
+            model_name='importedfile',
+            name='account_statement',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='imported_file', to='data_ingestion.accountstatement'),
+        ),
+        migrations.AddField(
+            model_name='importedfile',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='importedfile',
+            unique_together={('user', 'sha256')},
+        ),
+    ]
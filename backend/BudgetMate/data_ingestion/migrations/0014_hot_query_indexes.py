@@ -0,0 +1,40 @@
+# Generated by Django 4.1.13 on 2026-10-18 08:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_ingestion', '0013_importedfile_importjob_sha256_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='accountstatement',
+            name='bank_account',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='data_ingestion.bankaccount'),
+        ),
+        migrations.AlterField(
+            model_name='statementline',
+            name='account_statement',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='data_ingestion.accountstatement'),
+        ),
+        migrations.AddIndex(
+            model_name='accountstatement',
+            index=models.Index(fields=['bank_account', 'statement_type', 'start_date'], name='statement_account_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statementline',
+            index=models.Index(fields=['account_statement', 'is_shared'], name='statementline_shared_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statementline',
+            index=models.Index(fields=['account_statement', 'operation_date'], name='statementline_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statementline',
+            index=models.Index(condition=models.Q(('is_shared__isnull', True)), fields=['account_statement'], name='statementline_unclassified_idx'),
+        ),
+    ]
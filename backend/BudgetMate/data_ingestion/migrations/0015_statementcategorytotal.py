@@ -0,0 +1,42 @@
+# Generated by Django 4.1.13 on 2026-10-18 08:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_statement_totals(apps, schema_editor):
+    StatementLine = apps.get_model("data_ingestion", "StatementLine")
+    StatementCategoryTotal = apps.get_model("data_ingestion", "StatementCategoryTotal")
+    rows = (
+        StatementLine.objects.order_by()
+        .values("account_statement_id", "category_id", "sub_category_id", "is_shared")
+        .annotate(total=models.Sum("amount"), line_count=models.Count("id"))
+    )
+    StatementCategoryTotal.objects.bulk_create((StatementCategoryTotal(**row) for row in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_ingestion', '0014_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatementCategoryTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_shared', models.BooleanField(blank=True, null=True)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=100)),
+                ('line_count', models.PositiveIntegerField()),
+                ('account_statement', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='category_totals', to='data_ingestion.accountstatement')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='data_ingestion.category')),
+                ('sub_category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='data_ingestion.subcategory')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='statementcategorytotal',
+            index=models.Index(fields=['account_statement', 'is_shared'], name='statementtotal_shared_idx'),
+        ),
+        migrations.RunPython(populate_statement_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.13 on 2026-10-18 09:01
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_ingestion', '0015_statementcategorytotal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='statementline',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('libeller'), name='text_pattern_ops'), name='statementline_label_prefix_idx'),
+        ),
+    ]
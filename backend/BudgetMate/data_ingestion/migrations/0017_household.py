@@ -0,0 +1,41 @@
+# Generated by Django 4.1.13 on 2026-10-18 09:08
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('data_ingestion', '0016_statementline_label_prefix_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Household',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HouseholdMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('split_ratio', models.DecimalField(decimal_places=4, default=Decimal('1'), max_digits=5)),
+                ('household', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='data_ingestion.household')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('household', 'user')},
+            },
+        ),
+        migrations.AddField(
+            model_name='household',
+            name='members',
+            field=models.ManyToManyField(related_name='households', through='data_ingestion.HouseholdMember', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.1.13 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+from data_ingestion.migrations._frozen_labels import normalize_label
+
+
+def populate_normalized_labels(apps, schema_editor):
+    for model_name in ("LabelCategoryMapping", "ShareRule"):
+        model = apps.get_model("data_ingestion", model_name)
+        objs = list(model.objects.only("label"))
+        for obj in objs:
+            obj.normalized_label = normalize_label(obj.label)
+        model.objects.bulk_update(objs, ["normalized_label"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_ingestion', '0017_household'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labelcategorymapping',
+            name='normalized_label',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='sharerule',
+            name='normalized_label',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.RunPython(populate_normalized_labels, migrations.RunPython.noop),
+    ]
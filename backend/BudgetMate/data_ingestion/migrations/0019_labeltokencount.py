@@ -0,0 +1,54 @@
+# Generated by Django 4.1.13 on 2026-10-18 09:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from data_ingestion.migrations._frozen_labels import label_tokens
+
+
+def populate_label_token_counts(apps, schema_editor):
+    StatementLine = apps.get_model("data_ingestion", "StatementLine")
+    LabelTokenCount = apps.get_model("data_ingestion", "LabelTokenCount")
+    counts = {}
+    lines = (
+        StatementLine.objects.filter(sub_category__isnull=False)
+        .exclude(category__name="Uncategorized")
+        .values_list("account_statement__bank_account__user_id", "sub_category_id", "libeller")
+    )
+    for user_id, sub_category_id, label in lines.iterator():
+        for token in ("", *set(label_tokens(label))):
+            key = (user_id, sub_category_id, token)
+            counts[key] = counts.get(key, 0) + 1
+    LabelTokenCount.objects.bulk_create(
+        (
+            LabelTokenCount(user_id=user_id, sub_category_id=sub_category_id, token=token, count=count)
+            for (user_id, sub_category_id, token), count in counts.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('data_ingestion', '0018_normalized_label'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabelTokenCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(blank=True, max_length=200)),
+                ('count', models.PositiveIntegerField()),
+                ('sub_category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='data_ingestion.subcategory')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'sub_category', 'token')},
+            },
+        ),
+        migrations.RunPython(populate_label_token_counts, migrations.RunPython.noop),
+    ]
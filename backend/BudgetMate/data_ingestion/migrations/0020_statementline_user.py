@@ -0,0 +1,39 @@
+# Generated by Django 4.1.13 on 2026-10-18 11:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('data_ingestion', '0019_labeltokencount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statementline',
+            name='user',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE data_ingestion_statementline AS line
+            SET user_id = account.user_id
+            FROM data_ingestion_accountstatement AS statement, data_ingestion_bankaccount AS account
+            WHERE line.account_statement_id = statement.id AND statement.bank_account_id = account.id
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='statementline',
+            name='user',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='statementline',
+            index=models.Index(fields=['user', 'operation_date', 'id'], name='statementline_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:01
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_ingestion', '0020_statementline_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='text_pattern_ops'), name='category_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='labelcategorymapping',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('label'), name='text_pattern_ops'), name='labelmapping_label_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sharerule',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('label'), name='text_pattern_ops'), name='sharerule_label_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subcategory',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='text_pattern_ops'), name='subcategory_name_prefix_idx'),
+        ),
+    ]
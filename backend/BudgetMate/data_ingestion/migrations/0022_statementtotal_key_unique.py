@@ -0,0 +1,30 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:03
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_ingestion', '0021_admin_search_prefix_indexes'),
+    ]
+
+    operations = [
+        # Concurrent imports may have inserted a key twice: recompute the totals first
+        migrations.RunSQL(
+            [
+                'DELETE FROM data_ingestion_statementcategorytotal',
+                'INSERT INTO data_ingestion_statementcategorytotal '
+                '(account_statement_id, category_id, sub_category_id, is_shared, total, line_count) '
+                'SELECT account_statement_id, category_id, sub_category_id, is_shared, SUM(amount), COUNT(id) '
+                'FROM data_ingestion_statementline '
+                'GROUP BY account_statement_id, category_id, sub_category_id, is_shared',
+            ],
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='statementcategorytotal',
+            constraint=models.UniqueConstraint(models.F('account_statement'), django.db.models.functions.comparison.Coalesce('category', 0), django.db.models.functions.comparison.Coalesce('sub_category', 0), django.db.models.functions.comparison.Coalesce(django.db.models.functions.comparison.Cast('is_shared', models.IntegerField()), -1), name='statementtotal_key_unique'),
+        ),
+    ]
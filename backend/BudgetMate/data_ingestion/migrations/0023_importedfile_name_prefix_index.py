@@ -0,0 +1,19 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:21
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_ingestion', '0022_statementtotal_key_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='importedfile',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('original_filename'), name='text_pattern_ops'), name='importedfile_name_prefix_idx'),
+        ),
+    ]
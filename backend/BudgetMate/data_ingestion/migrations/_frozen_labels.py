@@ -0,0 +1,77 @@
+"""
+Frozen copy of data_ingestion.labels.label_tokens and normalize_label for the data migrations, so that later
+changes of the normalization do not change what these migrations compute. Never edit: a migration needing a
+newer normalization freezes its own copy.
+"""
+
+import re
+import unicodedata
+
+REFERENCE_MARKERS = frozenset({"REF", "REFERENCE", "NUMERO", "FACTURE", "ECH", "ECHEANCE", "MANDAT"})
+PLACE_SUFFIXES = frozenset(
+    {
+        "FR",
+        "FRA",
+        "FRANCE",
+        "CEDEX",
+        "PARIS",
+        "LYON",
+        "MARSEILLE",
+        "TOULOUSE",
+        "NICE",
+        "NANTES",
+        "STRASBOURG",
+        "MONTPELLIER",
+        "BORDEAUX",
+        "LILLE",
+        "RENNES",
+        "REIMS",
+        "TOULON",
+        "GRENOBLE",
+        "DIJON",
+        "ANGERS",
+        "NIMES",
+        "VILLEURBANNE",
+        "CLERMONT FERRAND",
+        "LE HAVRE",
+        "SAINT ETIENNE",
+        "AIX EN PROVENCE",
+        "LE MANS",
+        "BREST",
+        "TOURS",
+        "AMIENS",
+        "LIMOGES",
+        "PERPIGNAN",
+        "METZ",
+        "BESANCON",
+        "ORLEANS",
+        "ROUEN",
+        "MULHOUSE",
+        "CAEN",
+        "NANCY",
+    }
+)
+LONGEST_PLACE_SUFFIX = max(len(place.split()) for place in PLACE_SUFFIXES)
+NON_ALPHANUMERIC = re.compile(r"[^A-Z0-9]+")
+
+
+def label_tokens(label):
+    tokens = []
+    ascii_label = unicodedata.normalize("NFKD", label).encode("ascii", "ignore").decode("ascii")
+    for token in NON_ALPHANUMERIC.split(ascii_label.upper()):
+        if token in REFERENCE_MARKERS:
+            break
+        if token and not any(c.isdigit() for c in token):
+            tokens.append(token)
+    while tokens:
+        for size in range(min(LONGEST_PLACE_SUFFIX, len(tokens)), 0, -1):
+            if " ".join(tokens[-size:]) in PLACE_SUFFIXES:
+                del tokens[-size:]
+                break
+        else:
+            break
+    return tokens
+
+
+def normalize_label(label):
+    return " ".join(label_tokens(label))
@@ -1,6 +1,14 @@
-from django.db import models
+from decimal import Decimal
+from functools import partial
+from typing import Iterable, Optional
+
+from django.contrib.postgres.indexes import OpClass
+from django.db import connections, models, transaction
+from django.db.models.functions import Cast, Coalesce, Upper
 
 from accounts.models import User
+from data_ingestion.cache import bump_user_version
+from data_ingestion.labels import label_tokens, normalize_label
 
 
 class BankBrand(models.Model):
@@ -50,12 +58,18 @@ class AccountStatement(models.Model):
     end_date = models.DateField()  # TODO: Vérifier dans le formulaire que l'end_date est plus vieux que le start_date
     # TODO: Verify in the form that end_date is older than start_date
     # TODO: Add the file type (pdf, csv, xls, etc)
-    # TODO: check if the file is already in the database
     bank_account: BankAccount = models.ForeignKey(
         "BankAccount",
         on_delete=models.CASCADE,
+        db_index=False,  # Leading column of statement_account_type_idx
     )
 
+    class Meta:
+        indexes = [
+            # Statements of an account by type (CLI lookups) and by period (get_or_create on import)
+            models.Index(fields=["bank_account", "statement_type", "start_date"], name="statement_account_type_idx"),
+        ]
+
     def __str__(self):
         return (
             f"{self.statement_type} from {self.start_date} to {self.end_date} "
@@ -63,31 +77,52 @@ class AccountStatement(models.Model):
         )
 
     def total_amount(self):
-        return self.statementline_set.aggregate(total=models.Sum("amount"))["total"] or 0
+        return self.category_totals.aggregate(total=models.Sum("total"))["total"] or 0
 
     def total_shared_amount(self) -> float:
-        return self.statementline_set.filter(is_shared=True).aggregate(total=models.Sum("amount"))["total"] or 0
+        return self.category_totals.filter(is_shared=True).aggregate(total=models.Sum("total"))["total"] or 0
 
     def total_shared_amount_by_category(self) -> dict:
         """
-        Returns a dictionary {(category_name, sub_category_name, libeller): total_amount} for this account statement.
+        Returns a dictionary {(category_name, sub_category_name): total_amount} for this account statement.
         """
-        from django.db.models import Sum
-
         results = (
-            self.statementline_set.filter(is_shared=True)
+            self.category_totals.filter(is_shared=True)
             .values("category__name", "sub_category__name")
-            .annotate(total=Sum("amount"))
+            .annotate(total=models.Sum("total"))
             .order_by("category__name", "sub_category__name")
         )
-        total_shared_amount_by_category = {
-            (r["category__name"], r["sub_category__name"]): r["total"] for r in results if r["category__name"]
-        }
-        for key, value in total_shared_amount_by_category.items():
-            flipped_value = -value  # Flip the sign to display positive values for expenses
-            value_str = str(flipped_value).replace(".", ",")
-            print(f"{key[0]}; {key[1]}; {value_str}")
-        return total_shared_amount_by_category
+        return {(r["category__name"], r["sub_category__name"]): r["total"] for r in results if r["category__name"]}
+
+
+class ImportedFile(models.Model):
+    """
+    Statement file imported by a user, identified by the SHA-256 of its content.
+    A file already imported is rejected before being parsed again.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    sha256 = models.CharField(max_length=64)
+    original_filename = models.CharField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField()
+    account_statement = models.OneToOneField(
+        AccountStatement,
+        on_delete=models.CASCADE,
+        related_name="imported_file",
+    )
+    imported_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("user", "sha256")
+        indexes = [
+            # Admin search by filename prefix
+            models.Index(
+                OpClass(Upper("original_filename"), name="text_pattern_ops"), name="importedfile_name_prefix_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.original_filename} ({self.sha256[:12]}) for {self.user.username}"
 
 
 class OperationType(models.TextChoices):
@@ -106,6 +141,118 @@ class OperationType(models.TextChoices):
     OTHER = "OT", "Other"
 
 
+CENT = Decimal("0.01")
+
+# StatementLine fields aggregated by StatementCategoryTotal
+ROLLUP_FIELDS = {"account_statement", "category", "sub_category", "is_shared", "amount"}
+ROLLUP_ATTNAMES = {"account_statement_id", "category_id", "sub_category_id", "is_shared", "amount"}
+
+# (account_statement_id, category_id, sub_category_id, is_shared)
+RollupKey = tuple[int, Optional[int], Optional[int], Optional[bool]]
+RollupDeltas = dict[RollupKey, list]  # key: [amount, line count]
+
+
+def add_rollup_delta(deltas: RollupDeltas, key: RollupKey, amount: Decimal, line_count: int) -> None:
+    delta = deltas.setdefault(key, [Decimal(0), 0])
+    delta[0] += amount
+    delta[1] += line_count
+
+
+# Cache scope of the data computed from a user's statement lines (see data_ingestion.cache)
+STATEMENT_LINES_CACHE_SCOPE = "statement_lines"
+# Cache scope of the naive Bayes categorizer, built from LabelTokenCount
+CATEGORIZER_CACHE_SCOPE = "categorizer"
+
+# Category given to the labels nobody categorized: never learned by the categorizer
+UNCATEGORIZED = "Uncategorized"
+
+
+def statement_owner_ids(statement_ids: Iterable[int]) -> dict[int, int]:
+    """
+    User id of the owner of each statement, by statement id.
+    """
+    return dict(AccountStatement.objects.filter(id__in=statement_ids).values_list("id", "bank_account__user_id"))
+
+
+def invalidate_statement_lines_cache(statement_ids: Iterable[int]) -> None:
+    """
+    Invalidate the cached data of the owners of these statements, once the current transaction is committed
+    (before, a concurrent request could cache the data about to change under the new version).
+    """
+    user_ids = BankAccount.objects.filter(accountstatement__id__in=statement_ids).values_list("user_id", flat=True)
+    for user_id in set(user_ids):
+        transaction.on_commit(partial(bump_user_version, STATEMENT_LINES_CACHE_SCOPE, user_id))
+
+
+class StatementLineQuerySet(models.QuerySet):
+    """
+    Keeps StatementCategoryTotal in sync on the bulk write paths, which bypass StatementLine.save() and delete(),
+    and invalidates the cached data of the lines' owners.
+    """
+
+    def bulk_create(self, objs, batch_size=None, ignore_conflicts=False, **kwargs):
+        objs = list(objs)
+        ownerless = {line.account_statement_id for line in objs if line.user_id is None}
+        if ownerless:
+            owner_ids = statement_owner_ids(ownerless)
+            for line in objs:
+                if line.user_id is None:
+                    line.user_id = owner_ids[line.account_statement_id]
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, batch_size=batch_size, ignore_conflicts=ignore_conflicts, **kwargs)
+            if ignore_conflicts or kwargs.get("update_conflicts"):
+                # The lines actually inserted are unknown
+                StatementCategoryTotal.objects.rebuild({line.account_statement_id for line in objs})
+            else:
+                deltas: RollupDeltas = {}
+                for line in objs:
+                    add_rollup_delta(deltas, *line.rollup_entry(), 1)
+                StatementCategoryTotal.objects.apply_deltas(deltas)
+            invalidate_statement_lines_cache({line.account_statement_id for line in objs})
+        return objs
+
+    def update(self, **kwargs):
+        with transaction.atomic(using=self.db):
+            statement_ids = set(self.order_by().values_list("account_statement_id", flat=True).distinct())
+            new_statement = kwargs.get("account_statement", kwargs.get("account_statement_id"))
+            if new_statement is not None:
+                new_statement_id = getattr(new_statement, "pk", new_statement)
+                kwargs["user_id"] = statement_owner_ids([new_statement_id])[new_statement_id]
+                statement_ids.add(new_statement_id)
+            rows = super().update(**kwargs)
+            if ROLLUP_FIELDS.intersection(name.removesuffix("_id") for name in kwargs):
+                StatementCategoryTotal.objects.rebuild(statement_ids)
+            invalidate_statement_lines_cache(statement_ids)
+        return rows
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            deltas: RollupDeltas = {}
+            for row in self.rollup():
+                add_rollup_delta(deltas, row_key(row), -row["total"], -row["line_count"])
+            result = super().delete()
+            StatementCategoryTotal.objects.apply_deltas(deltas)
+            invalidate_statement_lines_cache({key[0] for key in deltas})
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def rollup(self) -> models.QuerySet:
+        """
+        Sum and count of the lines by StatementCategoryTotal key.
+        """
+        return (
+            self.order_by()
+            .values("account_statement_id", "category_id", "sub_category_id", "is_shared")
+            .annotate(total=models.Sum("amount"), line_count=models.Count("id"))
+        )
+
+
+def row_key(row: dict) -> RollupKey:
+    return row["account_statement_id"], row["category_id"], row["sub_category_id"], row["is_shared"]
+
+
 class StatementLine(models.Model):
     """
     Account statement line.
@@ -116,7 +263,10 @@ class StatementLine(models.Model):
     account_statement = models.ForeignKey(
         "AccountStatement",
         on_delete=models.CASCADE,
+        db_index=False,  # Leading column of the composite indexes below
     )
+    # Owner of the account statement, denormalized for the user-wide keyset pagination (newest first)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False, editable=False)
     operation_type = models.CharField(max_length=255, choices=OperationType.choices)
     amount = models.DecimalField(max_digits=100, decimal_places=2)
     operation_date = models.DateField()
@@ -126,12 +276,224 @@ class StatementLine(models.Model):
     comment = models.CharField(max_length=250, blank=True, null=True)
     is_shared = models.BooleanField(default=False, null=True, blank=True)  # For cost sharing
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["account_statement", "is_shared"], name="statementline_shared_idx"),
+            models.Index(fields=["account_statement", "operation_date"], name="statementline_date_idx"),
+            # Lines of a user, newest first (StatementLinePagination)
+            models.Index(fields=["user", "operation_date", "id"], name="statementline_user_date_idx"),
+            # Lines waiting for a shared decision (is_shared IS NULL), reviewed after each import
+            models.Index(
+                fields=["account_statement"],
+                condition=models.Q(is_shared__isnull=True),
+                name="statementline_unclassified_idx",
+            ),
+            # Case-insensitive label prefix search (admin search on libeller__istartswith)
+            models.Index(OpClass(Upper("libeller"), name="text_pattern_ops"), name="statementline_label_prefix_idx"),
+        ]
+
+    objects = StatementLineQuerySet.as_manager()
+
     def __str__(self):
         return (
             f"{self.libeller} - {self.operation_type} - {self.amount} - IS SHARED: {self.is_shared} "
             f" on {self.operation_date} for {self.account_statement.bank_account.user.username}"
         )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        line = super().from_db(db, field_names, values)
+        # Stored values, to move the amount between rollup keys on save
+        if not ROLLUP_ATTNAMES.intersection(line.get_deferred_fields()):
+            line._stored_rollup_entry = line.rollup_entry()
+        return line
+
+    def rollup_entry(self) -> tuple[RollupKey, Decimal]:
+        key = (self.account_statement_id, self.category_id, self.sub_category_id, self.is_shared)
+        return key, Decimal(self.amount).quantize(CENT)
+
+    def stored_rollup_entry(self) -> Optional[tuple[RollupKey, Decimal]]:
+        if self._state.adding:
+            return None
+        entry = getattr(self, "_stored_rollup_entry", None)
+        if entry is None:
+            stored = StatementLine.objects.filter(pk=self.pk).only(*ROLLUP_FIELDS).first()
+            entry = stored.rollup_entry() if stored else None
+        return entry
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        updates_rollup = update_fields is None or ROLLUP_FIELDS.intersection(
+            name.removesuffix("_id") for name in update_fields
+        )
+        with transaction.atomic(using=kwargs.get("using")):
+            previous = self.stored_rollup_entry() if updates_rollup else None
+            moved = previous is not None and previous[0][0] != self.account_statement_id
+            if moved or (self._state.adding and self.user_id is None):
+                self.user_id = statement_owner_ids([self.account_statement_id])[self.account_statement_id]
+                if update_fields is not None:
+                    kwargs["update_fields"] = {*update_fields, "user"}
+            super().save(*args, **kwargs)
+            statement_ids = {self.account_statement_id}
+            if updates_rollup:
+                current = self.rollup_entry()
+                if previous != current:
+                    deltas: RollupDeltas = {}
+                    if previous:
+                        previous_key, previous_amount = previous
+                        add_rollup_delta(deltas, previous_key, -previous_amount, -1)
+                        statement_ids.add(previous_key[0])
+                    add_rollup_delta(deltas, *current, 1)
+                    StatementCategoryTotal.objects.apply_deltas(deltas)
+                self._stored_rollup_entry = current
+            invalidate_statement_lines_cache(statement_ids)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using")):
+            key, amount = self.stored_rollup_entry() or self.rollup_entry()
+            result = super().delete(*args, **kwargs)
+            StatementCategoryTotal.objects.apply_deltas({key: [-amount, -1]})
+        return result
+
+
+# Key of a StatementCategoryTotal row in statementtotal_key_unique (NULL is not equal to NULL in a unique index)
+TOTAL_KEY_SQL = (
+    "{0}account_statement_id, COALESCE({0}category_id, 0), COALESCE({0}sub_category_id, 0), "
+    "COALESCE(({0}is_shared)::integer, -1)"
+)
+TOTAL_DELTA_SQL = "(%s::bigint, %s::bigint, %s::bigint, %s::boolean, %s::numeric, %s::integer)"
+
+
+def _delta_sort_key(item: tuple[RollupKey, list]) -> tuple[int, ...]:
+    return tuple(-1 if value is None else int(value) for value in item[0])
+
+
+class StatementCategoryTotalManager(models.Manager):
+    def apply_deltas(self, deltas: RollupDeltas) -> None:
+        """
+        Add the deltas to the totals, with a constant number of queries.
+
+        Additions are upserted (INSERT ... ON CONFLICT on statementtotal_key_unique), so that concurrent writers
+        of a statement neither lose updates nor insert the same key twice. Removals only update existing rows,
+        and rows whose count falls to zero are deleted: a removal never inserts a row.
+        Rows are written in key order, so that concurrent writers lock them in the same order.
+        """
+        items = sorted(((key, delta) for key, delta in deltas.items() if delta[0] or delta[1]), key=_delta_sort_key)
+        additions = [(*key, amount, line_count) for key, (amount, line_count) in items if line_count > 0]
+        # Removals, and amount changes of a line that keeps its key
+        updates = [(*key, amount, line_count) for key, (amount, line_count) in items if line_count <= 0]
+        table = self.model._meta.db_table
+        with transaction.atomic(using=self.db), connections[self.db].cursor() as cursor:
+            if additions:
+                cursor.execute(
+                    f"INSERT INTO {table} AS t "
+                    "(account_statement_id, category_id, sub_category_id, is_shared, total, line_count) "
+                    f"VALUES {', '.join([TOTAL_DELTA_SQL] * len(additions))} "
+                    f"ON CONFLICT ({TOTAL_KEY_SQL.format('')}) DO UPDATE "
+                    "SET total = t.total + EXCLUDED.total, line_count = t.line_count + EXCLUDED.line_count",
+                    [value for row in additions for value in row],
+                )
+            if updates:
+                cursor.execute(
+                    f"UPDATE {table} AS t "
+                    "SET total = t.total + d.total, line_count = t.line_count + d.line_count "
+                    f"FROM (VALUES {', '.join([TOTAL_DELTA_SQL] * len(updates))}) "
+                    "AS d (account_statement_id, category_id, sub_category_id, is_shared, total, line_count) "
+                    f"WHERE ({TOTAL_KEY_SQL.format('t.')}) = ({TOTAL_KEY_SQL.format('d.')})",
+                    [value for row in updates for value in row],
+                )
+                self.filter(account_statement_id__in={row[0] for row in updates}, line_count=0).delete()
+
+    def rebuild(self, statement_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Recompute the totals from the statement lines, for the given statements or for all of them.
+        Returns the number of rows written.
+        """
+        rows = self.all()
+        lines = StatementLine.objects.all()
+        if statement_ids is not None:
+            statement_ids = sorted(set(statement_ids))
+            if not statement_ids:
+                return 0
+            rows = rows.filter(account_statement_id__in=statement_ids)
+            lines = lines.filter(account_statement_id__in=statement_ids)
+        with transaction.atomic(using=self.db):
+            rows.delete()
+            created = self.bulk_create(
+                (
+                    self.model(
+                        account_statement_id=row["account_statement_id"],
+                        category_id=row["category_id"],
+                        sub_category_id=row["sub_category_id"],
+                        is_shared=row["is_shared"],
+                        total=row["total"],
+                        line_count=row["line_count"],
+                    )
+                    for row in lines.rollup().iterator()
+                ),
+                batch_size=1000,
+            )
+        return len(created)
+
+    def verify(self) -> dict[RollupKey, tuple]:
+        """
+        Compare the totals with a fresh aggregate of the statement lines.
+        Returns {key: ((expected total, expected count), (stored total, stored count))} for every difference.
+        """
+        expected = {row_key(row): (row["total"], row["line_count"]) for row in StatementLine.objects.rollup()}
+        stored = {row.key: (row.total, row.line_count) for row in self.all()}
+        return {
+            key: (expected.get(key), stored.get(key))
+            for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        }
+
+
+class StatementCategoryTotal(models.Model):
+    """
+    Sum and count of the statement lines of an AccountStatement by category, subcategory and shared status.
+
+    Maintained incrementally by StatementLine.save()/delete() and StatementLineQuerySet, so that the statement
+    totals are index lookups instead of aggregates over every line.
+    Rebuild it with manage.py rebuild_statement_totals.
+    """
+
+    account_statement = models.ForeignKey(
+        AccountStatement,
+        on_delete=models.CASCADE,
+        related_name="category_totals",
+        db_index=False,  # Leading column of statementtotal_shared_idx
+    )
+    category = models.ForeignKey("Category", on_delete=models.CASCADE, blank=True, null=True)
+    sub_category = models.ForeignKey("SubCategory", on_delete=models.CASCADE, blank=True, null=True)
+    is_shared = models.BooleanField(blank=True, null=True)
+    total = models.DecimalField(max_digits=100, decimal_places=2)
+    line_count = models.PositiveIntegerField()
+
+    objects = StatementCategoryTotalManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["account_statement", "is_shared"], name="statementtotal_shared_idx"),
+        ]
+        constraints = [
+            # One row per key, the nullable columns included (see TOTAL_KEY_SQL)
+            models.UniqueConstraint(
+                "account_statement",
+                Coalesce("category", 0),
+                Coalesce("sub_category", 0),
+                Coalesce(Cast("is_shared", models.IntegerField()), -1),
+                name="statementtotal_key_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.account_statement_id} - {self.category_id} - {self.sub_category_id} - {self.total}"
+
+    @property
+    def key(self) -> RollupKey:
+        return self.account_statement_id, self.category_id, self.sub_category_id, self.is_shared
+
 
 class Category(models.Model):
     """
@@ -148,6 +510,10 @@ class Category(models.Model):
     class Meta:
         verbose_name_plural = "Categories"
         unique_together = ("name", "user")
+        indexes = [
+            # Case-insensitive name prefix search (admin search on name__istartswith)
+            models.Index(OpClass(Upper("name"), name="text_pattern_ops"), name="category_name_prefix_idx"),
+        ]
 
 
 class SubCategory(models.Model):
@@ -168,29 +534,263 @@ class SubCategory(models.Model):
 
     class Meta:
         verbose_name_plural = "Subcategories"
+        indexes = [
+            models.Index(Upper("name"), "category", name="subcategory_upper_name_idx"),
+            # Case-insensitive name prefix search (admin search on name__istartswith)
+            models.Index(OpClass(Upper("name"), name="text_pattern_ops"), name="subcategory_name_prefix_idx"),
+        ]
 
 
-class ShareRule(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+class NormalizedLabelQuerySet(models.QuerySet):
+    """
+    Keeps normalized_label in sync with label in bulk_create and update, which bypass save().
+    """
+
+    def bulk_create(self, objs: Iterable[models.Model], *args, **kwargs) -> list[models.Model]:
+        objs = list(objs)
+        for obj in objs:
+            obj.normalized_label = normalize_label(obj.label)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def update(self, **kwargs) -> int:
+        if isinstance(kwargs.get("label"), str):
+            kwargs["normalized_label"] = normalize_label(kwargs["label"])
+        return super().update(**kwargs)
+
+
+class NormalizedLabelModel(models.Model):
+    """
+    Model matched on a transaction label, with the normalized key of the label (see data_ingestion.labels).
+    """
+
     label = models.CharField(max_length=200)
+    normalized_label = models.CharField(max_length=200, blank=True, editable=False)
+
+    objects = NormalizedLabelQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs) -> None:
+        self.normalized_label = normalize_label(self.label)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "label" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "normalized_label"}
+        super().save(*args, **kwargs)
+
+
+class ShareRule(NormalizedLabelModel):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
     sub_category = models.ForeignKey(SubCategory, on_delete=models.CASCADE)
     always_shared = models.BooleanField(default=True, null=True, blank=True)
 
     class Meta:
         unique_together = ("user", "label", "sub_category")
+        indexes = [
+            # Backs case-insensitive (iexact) lookups of a user's rules by label
+            models.Index("user", Upper("label"), name="sharerule_user_upper_label_idx"),
+            # Case-insensitive label prefix search (admin search on label__istartswith)
+            models.Index(OpClass(Upper("label"), name="text_pattern_ops"), name="sharerule_label_prefix_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.label} - {self.sub_category.name} - {'Always Shared' if self.always_shared else 'Not Always Shared'}"
 
 
-class LabelCategoryMapping(models.Model):
+class LabelCategoryMapping(NormalizedLabelModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    label = models.CharField(max_length=200)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     sub_category = models.ForeignKey(SubCategory, on_delete=models.CASCADE, blank=True, null=True)
 
     class Meta:
         unique_together = ("user", "label")
+        indexes = [
+            # Case-insensitive label prefix search (admin search on label__istartswith)
+            models.Index(OpClass(Upper("label"), name="text_pattern_ops"), name="labelmapping_label_prefix_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.label} - {self.category.name} - {self.sub_category.name if self.sub_category else 'No Subcategory'}"
+
+
+class ImportJobStatus(models.TextChoices):
+    """
+    Processing state of an uploaded statement file.
+    """
+
+    PENDING = "PE", "Pending"
+    RUNNING = "RU", "Running"
+    DONE = "DO", "Done"
+    FAILED = "FA", "Failed"
+
+
+class ImportJob(models.Model):
+    """
+    Uploaded statement file waiting to be parsed by the import worker (manage.py run_import_worker).
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    bank_account = models.ForeignKey(BankAccount, on_delete=models.CASCADE)
+    statement_type = models.CharField(max_length=255, choices=StatementType.choices)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    file_path = models.CharField(max_length=500)  # Spooled copy of the upload, deleted once imported
+    original_filename = models.CharField(max_length=255, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=2, choices=ImportJobStatus.choices, default=ImportJobStatus.PENDING)
+    account_statement = models.ForeignKey(AccountStatement, on_delete=models.SET_NULL, blank=True, null=True)
+    rows_parsed = models.PositiveIntegerField(default=0)
+    rows_inserted = models.PositiveIntegerField(default=0)
+    rows_skipped = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)  # Refreshed by the worker while the job runs
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # The worker claims the oldest pending job
+            models.Index(fields=["status", "id"], name="importjob_status_idx"),
+            models.Index(fields=["user", "sha256"], name="importjob_user_sha256_idx"),
+        ]
+
+    def __str__(self):
+        return f"Import {self.original_filename} ({self.get_status_display()}) for {self.user.username}"
+
+
+class Household(models.Model):
+    """
+    Users sharing their expenses (the lines marked is_shared), split according to each member's ratio.
+    """
+
+    name = models.CharField(max_length=200)
+    members = models.ManyToManyField(User, through="HouseholdMember", related_name="households")
+
+    def __str__(self):
+        return self.name
+
+
+class HouseholdMember(models.Model):
+    household = models.ForeignKey(Household, on_delete=models.CASCADE, related_name="memberships")
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Part of the shared expenses this member pays, relative to the other members' ratios (e.g. 0.6 and 0.4)
+    split_ratio = models.DecimalField(max_digits=5, decimal_places=4, default=Decimal(1))
+
+    class Meta:
+        unique_together = ("household", "user")
+
+    def __str__(self):
+        return f"{self.user.username} in {self.household.name} ({self.split_ratio})"
+
+
+# Token of the LabelTokenCount rows counting the training lines of a subcategory
+DOCUMENT_TOKEN = ""
+
+# (sub_category_id, token)
+TokenCountKey = tuple[int, str]
+
+
+def add_token_counts(counts: dict[TokenCountKey, int], label: str, sub_category_id: int, line_count: int) -> None:
+    """
+    Count a label line_count times (negative to forget it) as a training line of the subcategory.
+    """
+    for token in (DOCUMENT_TOKEN, *set(label_tokens(label))):
+        key = (sub_category_id, token)
+        counts[key] = counts.get(key, 0) + line_count
+
+
+class LabelTokenCountManager(models.Manager):
+    def apply_counts(self, user_id: int, counts: dict[TokenCountKey, int]) -> None:
+        """
+        Add the counts (see add_token_counts) to a user's table, with a constant number of queries.
+
+        The user is locked first so that concurrent imports do not lose updates.
+        Rows whose count falls to zero are deleted: forgetting a label never inserts a row.
+        """
+        counts = {key: count for key, count in counts.items() if count}
+        if not counts:
+            return
+        with transaction.atomic(using=self.db):
+            list(User.objects.select_for_update().filter(id=user_id).values_list("id", flat=True))
+            rows = {
+                row.key: row
+                for row in self.filter(
+                    user_id=user_id,
+                    sub_category_id__in={sub_category_id for sub_category_id, _ in counts},
+                    token__in={token for _, token in counts},
+                )
+            }
+            to_create, to_update, to_delete = [], [], []
+            for key, count in counts.items():
+                row = rows.get(key)
+                if row is None:
+                    if count > 0:
+                        sub_category_id, token = key
+                        to_create.append(
+                            self.model(user_id=user_id, sub_category_id=sub_category_id, token=token, count=count)
+                        )
+                    continue
+                row.count += count
+                if row.count > 0:
+                    to_update.append(row)
+                else:
+                    to_delete.append(row.id)
+            if to_create:
+                self.bulk_create(to_create, batch_size=1000)
+            if to_update:
+                self.bulk_update(to_update, ["count"], batch_size=1000)
+            if to_delete:
+                self.filter(id__in=to_delete).delete()
+        transaction.on_commit(partial(bump_user_version, CATEGORIZER_CACHE_SCOPE, user_id), using=self.db)
+
+    def rebuild(self, user_id: int) -> int:
+        """
+        Recount a user's table from their categorized statement lines. Returns the number of rows written.
+        """
+        counts: dict[TokenCountKey, int] = {}
+        lines = (
+            StatementLine.objects.filter(account_statement__bank_account__user_id=user_id, sub_category__isnull=False)
+            .exclude(category__name=UNCATEGORIZED)
+            .values_list("libeller", "sub_category_id")
+        )
+        for label, sub_category_id in lines.iterator():
+            add_token_counts(counts, label, sub_category_id, 1)
+        with transaction.atomic(using=self.db):
+            self.filter(user_id=user_id).delete()
+            created = self.bulk_create(
+                (
+                    self.model(user_id=user_id, sub_category_id=sub_category_id, token=token, count=count)
+                    for (sub_category_id, token), count in counts.items()
+                ),
+                batch_size=1000,
+            )
+        transaction.on_commit(partial(bump_user_version, CATEGORIZER_CACHE_SCOPE, user_id), using=self.db)
+        return len(created)
+
+
+class LabelTokenCount(models.Model):
+    """
+    Number of training lines of a subcategory whose label holds a token (see data_ingestion.labels.label_tokens),
+    for the naive Bayes categorizer (data_ingestion.categorizer). The DOCUMENT_TOKEN row counts the lines.
+
+    Updated incrementally by the imports and when a line changes subcategory.
+    Rebuild it with manage.py train_categorizer.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    sub_category = models.ForeignKey(SubCategory, on_delete=models.CASCADE)
+    token = models.CharField(max_length=200, blank=True)
+    count = models.PositiveIntegerField()
+
+    objects = LabelTokenCountManager()
+
+    class Meta:
+        unique_together = ("user", "sub_category", "token")
+
+    def __str__(self):
+        return f"{self.user_id} - {self.sub_category_id} - {self.token or '<lines>'}: {self.count}"
+
+    @property
+    def key(self) -> TokenCountKey:
+        return self.sub_category_id, self.token
@@ -0,0 +1,85 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from typing import Any, Optional
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest first pagination on (keyset_field, id), with an opaque cursor holding the last row of the page.
+
+    A page is a single query: WHERE (keyset_field, id) < cursor ORDER BY keyset_field DESC, id DESC LIMIT n,
+    without OFFSET nor COUNT, so its cost does not depend on how deep the page is nor on the table size.
+    """
+
+    keyset_field = ""
+    page_size = 100
+    max_page_size = 500
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, queryset: QuerySet, cursor: str) -> tuple[Any, int]:
+        field = queryset.model._meta.get_field(self.keyset_field)
+        try:
+            value, pk = urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+            return field.to_python(value), int(pk)
+        except (BinasciiError, UnicodeDecodeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message) from None
+
+    def encode_cursor(self, row) -> str:
+        return urlsafe_b64encode(f"{getattr(row, self.keyset_field)}|{row.pk}".encode()).decode()
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None) -> list:
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode_cursor(queryset, cursor)
+            # The redundant keyset_field <= value is the index condition: the scan starts at the cursor
+            queryset = queryset.filter(
+                Q(**{f"{self.keyset_field}__lte": value})
+                & (Q(**{f"{self.keyset_field}__lt": value}) | Q(**{self.keyset_field: value, "pk__lt": pk}))
+            )
+        rows = list(queryset.order_by(f"-{self.keyset_field}", "-pk")[: page_size + 1])
+        self.next_cursor: Optional[str] = self.encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+        return rows[:page_size]
+
+    def get_next_link(self) -> Optional[str]:
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data) -> Response:
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class StatementLinePagination(KeysetPagination):
+    keyset_field = "operation_date"
+
+
+class AccountStatementPagination(KeysetPagination):
+    keyset_field = "start_date"
+    page_size = 50
@@ -1,22 +1,163 @@
-import csv
-import re
-from datetime import datetime
+import calendar
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime
 from decimal import Decimal
+from functools import partial
+from itertools import islice
 from pathlib import Path
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from django.db import transaction
 
 from accounts.models import User
-from data_ingestion.constants import (
-    OPERATION_TYPE_MAP,
-    REGEX_BANK_FEE,
-    REGEX_CREDIT_CARD_REFUND,
-    REGEX_DIRECT_DEBIT,
-    REGEX_INSTANT_TRANSFER,
-    REGEX_OUTGOING_TRANSFER,
-    REGEX_PURCHASE,
-    REGEX_TRANSFER,
+from data_ingestion.bank_parsers import ParsedLine, get_bank_parser, parse_file
+from data_ingestion.metrics import record_import_stages, record_parsed_file
+from data_ingestion.models import AccountStatement, BankAccount, ImportedFile, StatementLine
+from data_ingestion.resolvers import CategoryPrompt, CategoryResolver
+from data_ingestion.utils import FileFingerprint, file_fingerprint, get_share_rule_index
+
+BULK_CREATE_BATCH_SIZE = 500
+
+# Fields identifying a duplicate line inside a statement (same semantics as the get_or_create lookup).
+STATEMENT_LINE_DEDUP_FIELDS = (
+    "libeller",
+    "comment",
+    "operation_type",
+    "category_id",
+    "sub_category_id",
+    "amount",
+    "operation_date",
+    "is_shared",
 )
-from data_ingestion.models import AccountStatement, BankAccount, StatementLine
-from data_ingestion.utils import get_is_shared_for_user
+
+
+@dataclass
+class IngestionReport:
+    """
+    Outcome of a statement import: lines parsed, lines written and lines skipped as duplicates.
+    """
+
+    account_statement: Optional[AccountStatement] = None
+    parsed: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    already_imported: bool = False  # The file or the statement period was imported before: nothing parsed
+    error: Optional[str] = None  # Why the file was not imported (e.g. its statement holds another file)
+
+
+ProgressCallback = Callable[[IngestionReport], None]
+
+
+def _related_key(line: StatementLine, field_name: str) -> Optional[int]:
+    related_id = getattr(line, f"{field_name}_id")
+    related = getattr(line, field_name)
+    if related_id is None and related is not None:
+        return id(related)  # Created by the CategoryResolver and not saved yet
+    return related_id
+
+
+def statement_line_key(line: StatementLine) -> tuple:
+    return (
+        line.libeller,
+        line.comment,
+        line.operation_type,
+        _related_key(line, "category"),
+        _related_key(line, "sub_category"),
+        None if line.amount is None else Decimal(line.amount).quantize(Decimal("0.01")),
+        line.operation_date,
+        line.is_shared,
+    )
+
+
+class GetOrCreateLineWriter:
+    """
+    Writes each line as soon as it is parsed, with one get_or_create per line.
+    """
+
+    def __init__(self, account_statement: AccountStatement, resolver: Optional[CategoryResolver] = None) -> None:
+        self.account_statement = account_statement
+        self.user_id = account_statement.bank_account.user_id
+        self.resolver = resolver
+        self.report = IngestionReport(account_statement=account_statement)
+
+    def add(self, **fields) -> bool:
+        """
+        Write a line unless it is already stored. Returns whether it was inserted.
+        """
+        if self.resolver:
+            self.resolver.flush()
+        _, created = StatementLine.objects.get_or_create(
+            account_statement=self.account_statement, defaults={"user_id": self.user_id}, **fields
+        )
+        if created:
+            self.report.inserted += 1
+        else:
+            self.report.skipped += 1
+        return created
+
+    def flush(self) -> None:
+        if self.resolver:
+            self.resolver.flush()
+
+
+class BulkLineWriter:
+    """
+    Buffers parsed lines and writes them with chunked bulk_create.
+
+    Duplicates (against lines already stored for the statement and inside the file) are
+    detected in memory, so the number of queries only grows with the number of chunks.
+    Categories created by the resolver are saved right before the chunk that uses them.
+    """
+
+    def __init__(
+        self,
+        account_statement: AccountStatement,
+        batch_size: int = BULK_CREATE_BATCH_SIZE,
+        resolver: Optional[CategoryResolver] = None,
+    ) -> None:
+        self.account_statement = account_statement
+        self.user_id = account_statement.bank_account.user_id
+        self.batch_size = batch_size
+        self.resolver = resolver
+        self.report = IngestionReport(account_statement=account_statement)
+        self.pending: list[StatementLine] = []
+        self.seen = {
+            statement_line_key(line)
+            for line in account_statement.statementline_set.only(*STATEMENT_LINE_DEDUP_FIELDS).iterator()
+        }
+
+    def add(self, **fields) -> bool:
+        """
+        Buffer a line unless it is a duplicate. Returns whether it is to be inserted.
+        """
+        line = StatementLine(account_statement=self.account_statement, user_id=self.user_id, **fields)
+        key = statement_line_key(line)
+        if key in self.seen:
+            self.report.skipped += 1
+            return False
+        self.seen.add(key)
+        self.pending.append(line)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self) -> None:
+        if self.resolver:
+            keys_before_save = [statement_line_key(line) for line in self.pending]
+            self.resolver.flush()
+            # Lines pointing to freshly saved categories are now identified by their ids
+            self.seen.difference_update(keys_before_save)
+            self.seen.update(statement_line_key(line) for line in self.pending)
+        if not self.pending:
+            return
+        StatementLine.objects.bulk_create(self.pending, batch_size=self.batch_size)
+        self.report.inserted += len(self.pending)
+        self.pending = []
 
 
 def parse_csv_and_create_statements(
@@ -26,138 +167,315 @@ def parse_csv_and_create_statements(
     statement_type: str,
     bank_account_id: int,
     user_id: int,
+    batched: bool = False,
+    batch_size: int = BULK_CREATE_BATCH_SIZE,
+) -> IngestionReport:
+    """
+    Parse a bank CSV export from the fixtures folder and store its lines in an AccountStatement.
+    The user is prompted for the category of every unknown label.
+
+    With batched=True the lines are written with chunked bulk_create inside a single transaction,
+    instead of one get_or_create (and one autocommit transaction) per row.
+    """
+    from data_ingestion.views import prompt_for_category
+
+    return import_statement_file(
+        Path(__file__).parent / "fixtures" / csv_name,
+        date_from,
+        date_to,
+        statement_type,
+        bank_account_id,
+        user_id,
+        batched=batched,
+        batch_size=batch_size,
+        prompt=prompt_for_category,
+    )
+
+
+def import_statement_file(
+    csv_path: str | Path,
+    date_from: datetime,
+    date_to: datetime,
+    statement_type: str,
+    bank_account_id: int,
+    user_id: int,
+    batched: bool = False,
+    batch_size: int = BULK_CREATE_BATCH_SIZE,
+    prompt: Optional[CategoryPrompt] = None,
+    progress: Optional[ProgressCallback] = None,
+    original_filename: Optional[str] = None,
+) -> IngestionReport:
+    """
+    Parse a bank CSV export and store its lines in an AccountStatement.
+
+    A file whose content (SHA-256) was already imported by the user is rejected before parsing.
+    Without prompt, unknown labels get the category proposed by the export (or Uncategorized).
+    progress is called with the current report every batch_size parsed lines.
+    """
+    args = (csv_path, date_from, date_to, statement_type, bank_account_id, user_id, batched, batch_size, prompt)
+    original_filename = original_filename or Path(csv_path).name
+    if batched:
+        with transaction.atomic():
+            return _import_statement_file(*args, progress, original_filename)
+    return _import_statement_file(*args, progress, original_filename)
+
+
+def find_imported_file(user_id: int, sha256: str) -> Optional[ImportedFile]:
+    return ImportedFile.objects.filter(user_id=user_id, sha256=sha256).select_related("account_statement").first()
+
+
+def _already_imported_report(imported_file: ImportedFile) -> IngestionReport:
+    print(f"{imported_file.original_filename} was already imported in: {imported_file.account_statement}")
+    return IngestionReport(account_statement=imported_file.account_statement, already_imported=True)
+
+
+def _record_imported_file(
+    user: User, account_statement: AccountStatement, fingerprint: FileFingerprint, original_filename: str
 ) -> None:
-    from data_ingestion.views import map_label_to_category_and_subcategory
+    ImportedFile.objects.update_or_create(
+        account_statement=account_statement,
+        defaults={
+            "user": user,
+            "sha256": fingerprint.sha256,
+            "size": fingerprint.size,
+            "original_filename": original_filename,
+        },
+    )
 
-    user = User.objects.get(id=user_id)
+
+def _get_or_create_statement(
+    bank_account: BankAccount, date_from: datetime, date_to: datetime, statement_type: str
+) -> tuple[AccountStatement, bool]:
+    """
+    Return the AccountStatement of the period and whether it already holds imported lines.
+    """
     account_statement, created = AccountStatement.objects.get_or_create(
         start_date=date_from,
         end_date=date_to,
         statement_type=statement_type,
-        bank_account=BankAccount.objects.get(id=bank_account_id, user=user),
+        bank_account=bank_account,
     )
     if not created and account_statement.statementline_set.exists():
         print(f"Account statement for {date_from} to {date_to} already exists.")
-        return
-    csv_path = Path(__file__).parent / "fixtures" / csv_name
-    with open(csv_path, encoding="utf-8", errors="replace") as f:
-        csv_reader = csv.reader(f, delimiter=";")
-        next(csv_reader)
-
-        if account_statement.bank_account.bank.name == "Banque postale":
-            print("Parsing La Banque Postale CSV file...")
-            for row in csv_reader:
-                if not row or len(row) < 3:
+        return account_statement, True
+    return account_statement, False
+
+
+def _import_statement_file(
+    csv_path: str | Path,
+    date_from: datetime,
+    date_to: datetime,
+    statement_type: str,
+    bank_account_id: int,
+    user_id: int,
+    batched: bool,
+    batch_size: int,
+    prompt: Optional[CategoryPrompt],
+    progress: Optional[ProgressCallback],
+    original_filename: str,
+) -> IngestionReport:
+    user = User.objects.get(id=user_id)
+    bank_account = BankAccount.objects.select_related("bank").get(id=bank_account_id, user=user)
+    bank_parser = get_bank_parser(bank_account.bank.name)
+    fingerprint = file_fingerprint(csv_path)
+    imported_file = find_imported_file(user.id, fingerprint.sha256)
+    if imported_file:
+        return _already_imported_report(imported_file)
+    account_statement, already_imported = _get_or_create_statement(bank_account, date_from, date_to, statement_type)
+    if already_imported:
+        return IngestionReport(account_statement=account_statement, already_imported=True)
+
+    resolver = CategoryResolver(user, prompt=prompt)
+    if batched:
+        writer = BulkLineWriter(account_statement, batch_size, resolver)
+    else:
+        writer = GetOrCreateLineWriter(account_statement, resolver)
+    print(f"Parsing {bank_parser.bank_name} CSV file...")
+    report = persist_parsed_lines(
+        user, bank_parser.parse_file(csv_path), resolver, writer, progress=progress, progress_interval=batch_size
+    )
+    record_parsed_file(bank_parser.bank_name, report.parsed, bank_parser.skipped, bank_parser.unmatched)
+    _record_imported_file(user, account_statement, fingerprint, original_filename)
+    return report
+
+
+class StatementFile(NamedTuple):
+    """
+    A file of a multi-file import and the statement it goes to. Without dates, the period of the statement
+    is derived from the file: the months of its first and last operations.
+    """
+
+    path: str | Path
+    statement_type: str
+    bank_account_id: int
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+
+def file_period(lines: list[ParsedLine]) -> tuple[date, date]:
+    """
+    Whole months spanned by the operations of the lines: (first day of the first, last day of the last).
+    """
+    first = min(line.operation_date for line in lines)
+    last = max(line.operation_date for line in lines)
+    return first.replace(day=1), last.replace(day=calendar.monthrange(last.year, last.month)[1])
+
+
+def import_statement_files(
+    statement_files: list[StatementFile],
+    user_id: int,
+    prompt: Optional[CategoryPrompt] = None,
+    max_workers: Optional[int] = None,
+) -> list[IngestionReport]:
+    """
+    Import several files, each in the statement of its own bank account, type and period (see StatementFile):
+    e.g. a year of monthly exports, or the exports of several accounts.
+
+    Files are parsed in parallel in a process pool (one file per worker, no database access), while
+    this process persists each file's lines, in order, with a single CategoryResolver: a label
+    categorized in one file is known in the next ones. Each file is written in its own transaction.
+    Files already imported (same SHA-256) are not parsed. A file whose statement already holds lines (imported
+    before or earlier in the batch) is not imported: its report has an error.
+    Returns one report per file, holding the AccountStatement it was imported in.
+    """
+    user = User.objects.get(id=user_id)
+    bank_accounts = BankAccount.objects.select_related("bank").filter(
+        id__in={statement_file.bank_account_id for statement_file in statement_files}, user=user
+    )
+    bank_accounts = {bank_account.id: bank_account for bank_account in bank_accounts}
+    missing = {statement_file.bank_account_id for statement_file in statement_files} - bank_accounts.keys()
+    if missing:
+        raise BankAccount.DoesNotExist(f"Unknown bank account(s) of user {user_id}: {sorted(missing)}.")
+    bank_names = {
+        bank_account_id: get_bank_parser(bank_account.bank.name).bank_name
+        for bank_account_id, bank_account in bank_accounts.items()
+    }
+    resolver = CategoryResolver(user, prompt=prompt)
+
+    fingerprints = [file_fingerprint(statement_file.path) for statement_file in statement_files]
+    imported_files = {
+        imported_file.sha256: imported_file
+        for imported_file in ImportedFile.objects.filter(
+            user=user, sha256__in=[fingerprint.sha256 for fingerprint in fingerprints]
+        ).select_related("account_statement")
+    }
+    to_parse = {
+        (statement_file.path, bank_names[statement_file.bank_account_id])
+        for statement_file, fingerprint in zip(statement_files, fingerprints)
+        if fingerprint.sha256 not in imported_files
+    }
+    max_workers = min(len(to_parse), max_workers or os.cpu_count() or 1)
+
+    if max_workers > 1:
+        # spawn: the workers do not inherit the database connections of this process
+        executor = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn"))
+        parsed_files = {key: executor.submit(parse_file, key[1], key[0]).result for key in to_parse}
+    else:
+        executor = None
+        parsed_files = {key: partial(parse_file, key[1], key[0]) for key in to_parse}
+
+    reports: list[IngestionReport] = []
+    imported_statements: dict[str, AccountStatement] = {}  # Files imported by this call, by SHA-256
+    try:
+        for statement_file, fingerprint in zip(statement_files, fingerprints):
+            if fingerprint.sha256 in imported_files:
+                reports.append(_already_imported_report(imported_files[fingerprint.sha256]))
+                continue
+            if fingerprint.sha256 in imported_statements:
+                account_statement = imported_statements[fingerprint.sha256]
+                reports.append(IngestionReport(account_statement=account_statement, already_imported=True))
+                continue
+            bank_name = bank_names[statement_file.bank_account_id]
+            parsed_file = parsed_files[statement_file.path, bank_name]()
+            date_from, date_to = statement_file.date_from, statement_file.date_to
+            if date_from is None or date_to is None:
+                if not parsed_file.lines:
+                    reports.append(IngestionReport(error="No operation to derive the statement period from."))
                     continue
-                try:
-                    operation_date = datetime.strptime(row[0], "%d/%m/%Y").date()
-                except ValueError:
-                    continue  # Skip rows with invalid date format (valid lines to parse)
-
-                purchase_match = re.search(REGEX_PURCHASE, row[1])
-                direct_debit_match = re.search(REGEX_DIRECT_DEBIT, row[1])
-                transfer_match = re.search(REGEX_TRANSFER, row[1])
-                instant_transfer_match = re.search(REGEX_INSTANT_TRANSFER, row[1])
-                outgoing_transfer_match = re.search(REGEX_OUTGOING_TRANSFER, row[1])
-                credit_card_refund_match = re.search(REGEX_CREDIT_CARD_REFUND, row[1])
-                bank_fee_match = re.search(REGEX_BANK_FEE, row[1])
-
-                # Extract purchase date if it's a card purchase
-                if purchase_match:
-                    operation_date_raw = " ".join(purchase_match.group(3).split())
-                    operation_date = datetime.strptime(operation_date_raw, "%d.%m.%y").date()
-
-                transaction_match = (
-                    purchase_match
-                    or direct_debit_match
-                    or transfer_match
-                    or instant_transfer_match
-                    or outgoing_transfer_match
-                    or credit_card_refund_match
-                    or bank_fee_match
-                )
-                expense_match = purchase_match or direct_debit_match or bank_fee_match
-                income_match = transfer_match or instant_transfer_match or credit_card_refund_match
-                outgoing_match = outgoing_transfer_match
-
-                # Extract clean label from the matched pattern
-                if expense_match:
-                    if bank_fee_match:
-                        clean_label = " ".join(bank_fee_match.group(1).split())
-                    else:
-                        clean_label = " ".join(expense_match.group(2).split())
-                elif income_match:
-                    if credit_card_refund_match:
-                        clean_label = " ".join(credit_card_refund_match.group(2).split())
-                        # Extract the refund date
-                        operation_date_raw = " ".join(credit_card_refund_match.group(3).split())
-                        operation_date = datetime.strptime(operation_date_raw, "%d.%m.%y").date()
-                    else:
-                        clean_label = " ".join(income_match.group(1 if instant_transfer_match else 2).split())
-                        if "SALAIRE" in clean_label:
-                            continue  # Skip salary entries
-                elif outgoing_match:
-                    clean_label = " ".join(outgoing_match.group(2).split())
-                    if "EPARGNE" in clean_label:
-                        continue  # Skip savings transfers
-                else:
-                    clean_label = row[1].strip('"')
-                    print(f"Warning: Unmatched transaction pattern: {row[1]}")
-
-                amount = Decimal(row[2].replace(",", ".")) if row[2] else None
-                operation_type_raw = " ".join(transaction_match.group(1).split()) if transaction_match else "OT"
-                operation_type = OPERATION_TYPE_MAP.get(operation_type_raw, "OT")
-
-                category, sub_category = map_label_to_category_and_subcategory(user, clean_label)
-
-                is_shared = get_is_shared_for_user(user, clean_label, sub_category) if sub_category else None
-
-                StatementLine.objects.get_or_create(
-                    account_statement=account_statement,
-                    libeller=clean_label,
-                    operation_type=operation_type,
-                    category=category,
-                    sub_category=sub_category,
-                    amount=amount,
-                    operation_date=operation_date,
-                    is_shared=is_shared,
+                date_from, date_to = file_period(parsed_file.lines)
+            with transaction.atomic():
+                account_statement, already_imported = _get_or_create_statement(
+                    bank_accounts[statement_file.bank_account_id], date_from, date_to, statement_file.statement_type
                 )
+                if already_imported or account_statement in imported_statements.values():
+                    error = (
+                        f"The {account_statement.statement_type} statement from {date_from} to {date_to} "
+                        "already holds the lines of another file."
+                    )
+                    reports.append(IngestionReport(account_statement=account_statement, error=error))
+                    continue
+                print(f"Importing {Path(statement_file.path).name}...")
+                writer = BulkLineWriter(account_statement, resolver=resolver)
+                reports.append(persist_parsed_lines(user, parsed_file.lines, resolver, writer))
+                record_parsed_file(bank_name, len(parsed_file.lines), parsed_file.skipped, parsed_file.unmatched)
+                _record_imported_file(user, account_statement, fingerprint, Path(statement_file.path).name)
+                imported_statements[fingerprint.sha256] = account_statement
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+    return reports
 
-        elif account_statement.bank_account.bank.name == "Caisse d'épargne":
-            print("Parsing Caisse d'Épargne CSV file...")
-            for row in csv_reader:
-                label = row[1]
-                comment = row[2]
-                operation_type_raw = row[5]
-                category_name_csv = row[6]
-                sub_category_name_csv = row[7]
-                debit_amount = row[8]
-                credit_amount = row[9]
-                operation_date_str = row[10]
-
-                operation_date = datetime.strptime(operation_date_str, "%d/%m/%Y").date()
-                operation_type = OPERATION_TYPE_MAP.get(operation_type_raw, "OT")
-
-                amount = None
-                if debit_amount:
-                    amount = Decimal(float(debit_amount.replace(",", ".")))
-                elif credit_amount:
-                    amount = Decimal(float(credit_amount.replace(",", ".")))
-
-                category, sub_category = map_label_to_category_and_subcategory(
-                    user, label, category_name_csv, sub_category_name_csv
-                )
 
-                is_shared = get_is_shared_for_user(user, label, sub_category) if sub_category else None
-
-                StatementLine.objects.get_or_create(
-                    account_statement=account_statement,
-                    libeller=label,
-                    comment=comment,
-                    operation_type=operation_type,
-                    category=category,
-                    sub_category=sub_category,
-                    amount=amount,
-                    operation_date=operation_date,
-                    is_shared=is_shared,
-                )
+def persist_parsed_lines(
+    user: User,
+    parsed_lines: Iterable[ParsedLine],
+    resolver: CategoryResolver,
+    writer: GetOrCreateLineWriter | BulkLineWriter,
+    progress: Optional[ProgressCallback] = None,
+    progress_interval: int = BULK_CREATE_BATCH_SIZE,
+) -> IngestionReport:
+    """
+    Persistence stage of an import: categorize each parsed line and hand it to the writer.
+    Lines are read by chunks of progress_interval, whose unknown labels are scored by the categorizer in one batch.
+    The time spent parsing (pulling lines from parsed_lines), categorizing and writing is recorded
+    in the import metrics. The categorizer learns the inserted lines once they are saved.
+    """
+    report = writer.report
+    share_rules = get_share_rule_index(user.id)
+    label_counts: Counter = Counter()
+    parsing = categorization = persistence = 0.0
+    parsed_lines = iter(parsed_lines)
+    while True:
+        started = time.perf_counter()
+        chunk = list(islice(parsed_lines, progress_interval))
+        parsed = time.perf_counter()
+        parsing += parsed - started
+        if not chunk:
+            break
+        resolver.predict(parsed_line.label for parsed_line in chunk)
+        categorization += time.perf_counter() - parsed
+        for parsed_line in chunk:
+            started = time.perf_counter()
+            category, sub_category = resolver.resolve(
+                parsed_line.label, parsed_line.category_name, parsed_line.sub_category_name
+            )
+            is_shared = share_rules.is_shared(parsed_line.label, sub_category) if sub_category else None
+            categorized = time.perf_counter()
+            categorization += categorized - started
+            inserted = writer.add(
+                libeller=parsed_line.label,
+                comment=parsed_line.comment,
+                operation_type=parsed_line.operation_type,
+                category=category,
+                sub_category=sub_category,
+                amount=parsed_line.amount,
+                operation_date=parsed_line.operation_date,
+                is_shared=is_shared,
+            )
+            persistence += time.perf_counter() - categorized
+            if inserted:
+                # Duplicates were learned when first imported
+                label_counts[parsed_line.label] += 1
+            report.parsed += 1
+            if progress and report.parsed % progress_interval == 0:
+                progress(report)
+
+    started = time.perf_counter()
+    writer.flush()
+    persistence += time.perf_counter() - started
+    started = time.perf_counter()
+    resolver.learn(label_counts)
+    categorization += time.perf_counter() - started
+    record_import_stages(parsing, categorization, persistence)
+    print(f"{report.inserted} lines inserted, {report.skipped} duplicates skipped.")
+    return report
@@ -0,0 +1,146 @@
+"""
+CSV reader of the bank exports, shared by the file imports and the upload endpoint.
+
+The delimiter is sniffed from the first KB, and so is the encoding (BOM, UTF-8 or CP1252, the usual
+encoding of the exports without BOM); UTF-8 is confirmed on the whole file. Large files are memory-mapped
+and decoded incrementally; file objects (e.g. uploaded files) are read by chunks, without being copied
+to disk first.
+This module must not import Django models.
+"""
+
+import codecs
+import csv
+import io
+import mmap
+import os
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from functools import partial
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, NamedTuple
+
+SNIFF_SIZE = 1024
+READ_CHUNK_SIZE = 1 << 16
+MMAP_THRESHOLD = 1 << 20  # Files from this size are memory-mapped
+DELIMITERS = (";", ",", "\t")
+BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+FALLBACK_ENCODING = "cp1252"
+
+
+class CsvFormat(NamedTuple):
+    encoding: str
+    delimiter: str
+
+
+def sniff_encoding(head: bytes) -> str:
+    """
+    Encoding of a file from its first bytes: given by the BOM, else UTF-8 when they decode as UTF-8,
+    else CP1252. Raises ValueError for binary content.
+    UTF-8 is only a guess: open_csv checks the rest of the file before decoding it as UTF-8.
+    """
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    if b"\x00" in head:
+        raise ValueError("Not a text file.")
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # The head may end in the middle of a character
+        if e.start < len(head) - 3 or e.reason != "unexpected end of data":
+            return FALLBACK_ENCODING
+    return "utf-8"
+
+
+def sniff_delimiter(text: str, default: str) -> str:
+    """
+    Delimiter found the same number of times in the most lines of text, the most frequent on a tie.
+    Amounts with a decimal comma are fine: the comma is not on the header lines, nor as often as ";".
+    """
+    lines = text.splitlines()[:-1] or text.splitlines()  # The last line may be truncated
+    best, best_key = default, (0, 0, True)
+    for delimiter in DELIMITERS:
+        counts = Counter(line.count(delimiter) for line in lines if line.strip())
+        modal_count, consistent_lines = max(counts.items(), key=lambda item: (item[1], item[0]), default=(0, 0))
+        key = (consistent_lines, modal_count, delimiter == default)
+        if modal_count and key > best_key:
+            best, best_key = delimiter, key
+    return best
+
+
+def sniff_format(head: bytes, default_delimiter: str = ";") -> CsvFormat:
+    encoding = sniff_encoding(head)
+    text = codecs.getincrementaldecoder(encoding)(errors="replace").decode(head)
+    return CsvFormat(encoding, sniff_delimiter(text, default_delimiter))
+
+
+def _mapped_chunks(mapped: mmap.mmap) -> Iterator[bytes]:
+    for offset in range(0, len(mapped), READ_CHUNK_SIZE):
+        yield mapped[offset : offset + READ_CHUNK_SIZE]
+
+
+def _read_chunks(f: BinaryIO) -> Iterator[bytes]:
+    f.seek(0)
+    return iter(partial(f.read, READ_CHUNK_SIZE), b"")
+
+
+def _is_large_file(f: BinaryIO) -> bool:
+    try:
+        return os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD
+    except (AttributeError, OSError, ValueError):
+        return False  # In-memory file objects have no file descriptor
+
+
+def _decodes(chunks: Iterable[bytes], encoding: str) -> bool:
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        for chunk in chunks:
+            decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def decode_lines(chunks: Iterable[bytes], encoding: str) -> Iterator[str]:
+    """
+    Lines of the decoded chunks, with their line endings (as read with newline="", as csv expects).
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    for chunk in chunks:
+        text = pending + decoder.decode(chunk)
+        end = text.rfind("\n") + 1
+        pending = text[end:]
+        yield from io.StringIO(text[:end], newline="")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield from io.StringIO(pending, newline="")
+
+
+@contextmanager
+def open_csv(source: str | Path | BinaryIO, default_delimiter: str = ";") -> Iterator[Iterator[list[str]]]:
+    """
+    Rows of a CSV file, given by path or as a binary file object (read from its start, left open).
+    Without BOM, a file is only decoded as UTF-8 when all of it is valid UTF-8 (checked in a first pass
+    over the bytes), else as CP1252. Raises ValueError for binary content.
+    """
+    with ExitStack() as stack:
+        if isinstance(source, (str, Path)):
+            f = stack.enter_context(open(source, "rb"))
+        else:
+            f = source
+        if _is_large_file(f):
+            mapped = stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            chunks = partial(_mapped_chunks, mapped)
+            head = mapped[:SNIFF_SIZE]
+        else:
+            chunks = partial(_read_chunks, f)
+            f.seek(0)
+            head = f.read(SNIFF_SIZE)
+
+        csv_format = sniff_format(head, default_delimiter)
+        if csv_format.encoding == "utf-8" and len(head) == SNIFF_SIZE and not _decodes(chunks(), "utf-8"):
+            # The first non-ASCII character comes after the head, and is not UTF-8
+            csv_format = csv_format._replace(encoding=FALLBACK_ENCODING)
+        yield csv.reader(decode_lines(chunks(), csv_format.encoding), delimiter=csv_format.delimiter)
@@ -0,0 +1,231 @@
+from collections import Counter
+from functools import partial
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from accounts.models import User
+from data_ingestion.cache import bump_user_version, get_or_set_versioned, user_cache_key
+from data_ingestion.categorizer import Prediction, get_categorizer
+from data_ingestion.labels import LabelTrie, clean_string, normalize_label
+from data_ingestion.models import (
+    UNCATEGORIZED,
+    Category,
+    LabelCategoryMapping,
+    LabelTokenCount,
+    SubCategory,
+    TokenCountKey,
+    add_token_counts,
+)
+
+CategoryPrompt = Callable[[str, str, str], tuple[Optional[str], Optional[str]]]
+
+CATEGORIES_CACHE_SCOPE = "categories"
+CATEGORIES_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def normalize_name(name: str) -> str:
+    """
+    Key used to compare category names: accents removed, whitespace collapsed, case folded.
+    """
+    return " ".join(clean_string(name).split()).casefold()
+
+
+class CategoryIndex(NamedTuple):
+    resolved: dict[str, tuple[Optional[Category], Optional[SubCategory]]]  # By label
+    labels: LabelTrie[tuple[Optional[Category], Optional[SubCategory]]]  # By normalized label
+    categories: dict[str, Category]  # By normalized name
+    sub_categories: dict[tuple[str, str], SubCategory]  # By normalized (category name, subcategory name)
+
+    @classmethod
+    def build(cls, user_id: int) -> "CategoryIndex":
+        resolved = {}
+        labels = LabelTrie()
+        mappings = LabelCategoryMapping.objects.filter(user_id=user_id).select_related("category", "sub_category")
+        for mapping in mappings.order_by("id"):
+            resolved[mapping.label] = (mapping.category, mapping.sub_category)
+            labels.insert(mapping.normalized_label, resolved[mapping.label])
+        categories_by_id = {}
+        categories: dict[str, Category] = {}
+        for category in Category.objects.filter(user_id=user_id):
+            categories_by_id[category.id] = category
+            categories.setdefault(normalize_name(category.name), category)
+        sub_categories: dict[tuple[str, str], SubCategory] = {}
+        for sub_category in SubCategory.objects.filter(user_id=user_id, category__user_id=user_id):
+            category = categories_by_id[sub_category.category_id]
+            sub_category.category = category
+            key = (normalize_name(category.name), normalize_name(sub_category.name))
+            sub_categories.setdefault(key, sub_category)
+        return cls(resolved, labels, categories, sub_categories)
+
+
+def get_category_index(user_id: int) -> CategoryIndex:
+    """
+    Label mappings, categories and subcategories of a user, cached until one of them changes
+    (see data_ingestion.signals and CategoryResolver.flush).
+    """
+    key = user_cache_key(CATEGORIES_CACHE_SCOPE, user_id)
+    return get_or_set_versioned(key, partial(CategoryIndex.build, user_id), CATEGORIES_CACHE_TIMEOUT)
+
+
+class CategoryResolver:
+    """
+    Map transaction labels to (Category, SubCategory) for one user, for the duration of an import.
+
+    The user's label mappings, categories and subcategories are loaded once (from the cache when
+    possible, see get_category_index), so resolving a label does not query the database.
+    A label without mapping gets the mapping of the longest matching normalized label, if any
+    (e.g. "CARREFOUR 5678 PARIS" gets the category of "CARREFOUR 1234 LYON").
+    Other labels are scored by the user's naive Bayes categorizer (see data_ingestion.categorizer):
+    confident predictions are assigned without prompt, the others are proposed to the prompt.
+    Categories, subcategories and mappings created along the way are kept in memory (unsaved)
+    and written with bulk_create by flush().
+
+    Args:
+        user: Owner of the categories and mappings
+        prompt: Asks the user to confirm the proposed category names of an unknown label
+            (see data_ingestion.views.prompt_for_category). Without prompt, proposals are accepted.
+    """
+
+    def __init__(self, user: User, prompt: Optional[CategoryPrompt] = None) -> None:
+        self.user = user
+        self.prompt = prompt
+        # The cache returns a copy: the resolver can add to it
+        self.resolved, self.labels, self.categories, self.sub_categories = get_category_index(user.id)
+        self.sub_categories_by_id = {sub_category.id: sub_category for sub_category in self.sub_categories.values()}
+        self.categorizer = get_categorizer(user.id)
+        self.predictions: dict[str, Optional[Prediction]] = {}
+        self.predicted: set[str] = set()  # Labels categorized by the categorizer, not learned from
+
+        self.new_categories: list[Category] = []
+        self.new_sub_categories: list[SubCategory] = []
+        self.new_mappings: list[LabelCategoryMapping] = []
+
+    def resolve(
+        self,
+        label: str,
+        category_name_csv: Optional[str] = None,
+        sub_category_name_csv: Optional[str] = None,
+    ) -> tuple[Optional[Category], Optional[SubCategory]]:
+        """
+        Return the (Category, SubCategory) of a label, asking for it the first time the label is seen.
+
+        Args:
+            label: Transaction label to categorize
+            category_name_csv: Proposed category name from CSV (optional)
+            sub_category_name_csv: Proposed sub-category name from CSV (optional)
+        """
+        if label in self.resolved:
+            return self.resolved[label]
+        match = self.labels.lookup(label)
+        if match:
+            # No new mapping: the labels of a merchant share the mapping of its normalized label
+            self.resolved[label] = match
+            return match
+
+        if label not in self.predictions:
+            self.predict([label])
+        predicted = self.predicted_sub_category(label)
+        if predicted and self.predictions[label].confidence >= settings.CATEGORIZER_CONFIDENCE_THRESHOLD:
+            # No new mapping either: the prediction is not confirmed
+            self.predicted.add(label)
+            self.resolved[label] = (predicted.category, predicted)
+            return self.resolved[label]
+
+        category_name_proposal = category_name_csv or ""
+        sub_category_name_proposal = sub_category_name_csv or ""
+        if not category_name_proposal and predicted and self.prompt:
+            category_name_proposal = predicted.category.name
+            sub_category_name_proposal = predicted.name
+        if not category_name_proposal:
+            category_name_proposal = UNCATEGORIZED
+            sub_category_name_proposal = UNCATEGORIZED
+
+        if self.prompt:
+            cat_name, subcat_name = self.prompt(label, category_name_proposal, sub_category_name_proposal)
+        else:
+            cat_name, subcat_name = category_name_proposal, sub_category_name_proposal
+
+        category, sub_category = None, None
+        if cat_name:
+            category = self.get_or_add_category(clean_string(cat_name))
+            if subcat_name:
+                sub_category = self.get_or_add_sub_category(category, clean_string(subcat_name))
+
+        if category and sub_category:
+            # Create the mapping for future imports
+            self.new_mappings.append(
+                LabelCategoryMapping(user=self.user, label=label, category=category, sub_category=sub_category)
+            )
+            self.labels.insert(normalize_label(label), (category, sub_category))
+        self.resolved[label] = (category, sub_category)
+        return category, sub_category
+
+    def predict(self, labels: Iterable[str]) -> None:
+        """
+        Score the labels without mapping in one batch, ahead of resolve().
+        """
+        if self.categorizer is None:
+            return
+        labels = [
+            label
+            for label in dict.fromkeys(labels)
+            if label not in self.resolved and label not in self.predictions and self.labels.lookup(label) is None
+        ]
+        if labels:
+            self.predictions.update(zip(labels, self.categorizer.predict(labels)))
+
+    def predicted_sub_category(self, label: str) -> Optional[SubCategory]:
+        prediction = self.predictions.get(label)
+        if prediction is None:
+            return None
+        return self.sub_categories_by_id.get(prediction.sub_category_id)
+
+    def learn(self, label_counts: Counter) -> None:
+        """
+        Train the categorizer with the lines imported with these labels ({label: line count}), once saved.
+        Predicted and uncategorized labels are not learned.
+        """
+        counts: dict[TokenCountKey, int] = {}
+        for label, line_count in label_counts.items():
+            category, sub_category = self.resolved.get(label, (None, None))
+            if sub_category is None or sub_category.id is None or label in self.predicted:
+                continue
+            if normalize_name(category.name) != normalize_name(UNCATEGORIZED):
+                add_token_counts(counts, label, sub_category.id, line_count)
+        LabelTokenCount.objects.apply_counts(self.user.id, counts)
+
+    def get_or_add_category(self, name: str) -> Category:
+        key = normalize_name(name)
+        if key not in self.categories:
+            self.categories[key] = Category(name=name, user=self.user)
+            self.new_categories.append(self.categories[key])
+            print(f"Created new category: {name}")
+        return self.categories[key]
+
+    def get_or_add_sub_category(self, category: Category, name: str) -> SubCategory:
+        key = (normalize_name(category.name), normalize_name(name))
+        if key not in self.sub_categories:
+            self.sub_categories[key] = SubCategory(name=name, category=category, user=self.user)
+            self.new_sub_categories.append(self.sub_categories[key])
+            print(f"Created new subcategory: {name}")
+        return self.sub_categories[key]
+
+    def flush(self) -> None:
+        """
+        Save the categories, subcategories and mappings created since the last flush.
+        """
+        if not (self.new_categories or self.new_sub_categories or self.new_mappings):
+            return
+        if self.new_categories:
+            Category.objects.bulk_create(self.new_categories)
+            self.new_categories = []
+        if self.new_sub_categories:
+            SubCategory.objects.bulk_create(self.new_sub_categories)
+            self.new_sub_categories = []
+        if self.new_mappings:
+            LabelCategoryMapping.objects.bulk_create(self.new_mappings, ignore_conflicts=True)
+            self.new_mappings = []
+        # bulk_create does not send post_save
+        transaction.on_commit(partial(bump_user_version, CATEGORIES_CACHE_SCOPE, self.user.id))
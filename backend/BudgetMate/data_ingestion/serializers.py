@@ -0,0 +1,219 @@
+import csv
+from decimal import Decimal
+
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from data_ingestion.jobs import get_job_progress, is_already_uploaded, spool_upload
+from data_ingestion.models import (
+    CENT,
+    AccountStatement,
+    Category,
+    Household,
+    HouseholdMember,
+    ImportJob,
+    ImportJobStatus,
+    StatementLine,
+    SubCategory,
+)
+from data_ingestion.readers import open_csv
+from data_ingestion.settlements import Settlement
+
+
+class AlreadyImported(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "This file was already imported."
+    default_code = "already_imported"
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    file = serializers.FileField(write_only=True)
+    rows_pending_review = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            "id",
+            "file",
+            "original_filename",
+            "bank_account",
+            "statement_type",
+            "start_date",
+            "end_date",
+            "status",
+            "account_statement",
+            "rows_parsed",
+            "rows_inserted",
+            "rows_skipped",
+            "rows_pending_review",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = [
+            "original_filename",
+            "status",
+            "account_statement",
+            "rows_parsed",
+            "rows_inserted",
+            "rows_skipped",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+
+    def get_rows_pending_review(self, job: ImportJob) -> int:
+        # Annotated by ImportJobViewSet: lines of the imported statement without a shared decision
+        return getattr(job, "rows_pending_review", 0)
+
+    def validate_file(self, uploaded_file):
+        # Read in place with the reader of the import, so that a file it cannot read is not queued
+        try:
+            with open_csv(uploaded_file) as rows:
+                next(rows, None)
+        except (ValueError, csv.Error):
+            raise serializers.ValidationError("The file is not a CSV export.") from None
+        return uploaded_file
+
+    def validate_bank_account(self, bank_account):
+        if bank_account.user_id != self.context["request"].user.id:
+            raise serializers.ValidationError("Unknown bank account.")
+        return bank_account
+
+    def validate(self, attrs: dict) -> dict:
+        if attrs["start_date"] > attrs["end_date"]:
+            raise serializers.ValidationError({"end_date": "The end date must be after the start date."})
+        return attrs
+
+    def create(self, validated_data: dict) -> ImportJob:
+        uploaded_file = validated_data.pop("file")
+        spooled_path, fingerprint = spool_upload(uploaded_file)
+        if is_already_uploaded(validated_data["user"].id, fingerprint.sha256):
+            spooled_path.unlink()
+            raise AlreadyImported()
+        validated_data["file_path"] = str(spooled_path)
+        validated_data["original_filename"] = uploaded_file.name
+        validated_data["sha256"] = fingerprint.sha256
+        return super().create(validated_data)
+
+    def to_representation(self, job: ImportJob) -> dict:
+        data = super().to_representation(job)
+        if job.status == ImportJobStatus.RUNNING:
+            data.update(get_job_progress(job.id) or {})
+        return data
+
+
+class StatementLineSerializer(serializers.ModelSerializer):
+    category_name = serializers.CharField(source="category.name", default=None, read_only=True)
+    sub_category_name = serializers.CharField(source="sub_category.name", default=None, read_only=True)
+
+    class Meta:
+        model = StatementLine
+        fields = [
+            "id",
+            "account_statement",
+            "operation_date",
+            "operation_type",
+            "libeller",
+            "amount",
+            "comment",
+            "is_shared",
+            "category",
+            "category_name",
+            "sub_category",
+            "sub_category_name",
+        ]
+
+
+class AccountStatementSerializer(serializers.ModelSerializer):
+    # Annotated by AccountStatementViewSet from the StatementCategoryTotal rollup
+    total_amount = serializers.DecimalField(max_digits=100, decimal_places=2, source="lines_total", read_only=True)
+    total_shared_amount = serializers.DecimalField(
+        max_digits=100, decimal_places=2, source="shared_lines_total", read_only=True
+    )
+
+    class Meta:
+        model = AccountStatement
+        fields = [
+            "id",
+            "statement_type",
+            "start_date",
+            "end_date",
+            "bank_account",
+            "total_amount",
+            "total_shared_amount",
+        ]
+
+
+class SubCategorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SubCategory
+        fields = ["id", "name"]
+
+
+class CategorySerializer(serializers.ModelSerializer):
+    sub_categories = SubCategorySerializer(source="subcategory_set", many=True, read_only=True)
+
+    class Meta:
+        model = Category
+        fields = ["id", "name", "sub_categories"]
+
+
+class HouseholdMemberSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source="user.username", read_only=True)
+
+    class Meta:
+        model = HouseholdMember
+        fields = ["user", "username", "split_ratio"]
+
+
+class HouseholdSerializer(serializers.ModelSerializer):
+    members = HouseholdMemberSerializer(source="memberships", many=True, read_only=True)
+
+    class Meta:
+        model = Household
+        fields = ["id", "name", "members"]
+
+
+class SettlementPeriodSerializer(serializers.Serializer):
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+
+    def validate(self, attrs: dict) -> dict:
+        if attrs["start_date"] > attrs["end_date"]:
+            raise serializers.ValidationError({"end_date": "The end date must be after the start date."})
+        return attrs
+
+
+def _amounts(cents_by_user: dict[int, int]) -> dict[str, str]:
+    return {str(user_id): str((Decimal(cents) / 100).quantize(CENT)) for user_id, cents in cents_by_user.items()}
+
+
+class SettlementSerializer(serializers.BaseSerializer):
+    def to_representation(self, settlement: Settlement) -> dict:
+        return {
+            "household": settlement.household_id,
+            "start_date": settlement.start_date.isoformat(),
+            "end_date": settlement.end_date.isoformat(),
+            "ratios": {str(user_id): str(ratio) for user_id, ratio in settlement.ratios.items()},
+            "balances": _amounts(settlement.balances),
+            "transfers": [
+                {
+                    "from": transfer.debtor_id,
+                    "to": transfer.creditor_id,
+                    "amount": str((Decimal(transfer.amount_cents) / 100).quantize(CENT)),
+                }
+                for transfer in settlement.transfers
+            ],
+            "periods": [
+                {
+                    "month": period.month.isoformat(),
+                    "paid": _amounts(period.paid),
+                    "balances": _amounts(period.balances),
+                    "running_balances": _amounts(period.running_balances),
+                }
+                for period in settlement.periods
+            ],
+        }
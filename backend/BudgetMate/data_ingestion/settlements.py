@@ -0,0 +1,135 @@
+"""
+Settlement of the shared expenses of a household: who paid what, what each member owed according to
+their split ratio, and the transfers that settle the difference.
+"""
+
+import hashlib
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from functools import partial
+from typing import NamedTuple
+
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+from data_ingestion.cache import get_or_set_versioned, get_user_version
+from data_ingestion.models import STATEMENT_LINES_CACHE_SCOPE, Household, StatementLine
+
+SETTLEMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class Transfer(NamedTuple):
+    debtor_id: int
+    creditor_id: int
+    amount_cents: int
+
+
+@dataclass
+class SettlementPeriod:
+    month: date
+    paid: dict[int, int]  # Shared expenses paid by each member, in cents
+    balances: dict[int, int]  # Paid minus owed for the month: positive when the others owe the member
+    running_balances: dict[int, int]  # Balances accumulated since the start of the settlement
+
+
+@dataclass
+class Settlement:
+    household_id: int
+    start_date: date
+    end_date: date
+    ratios: dict[int, Decimal]
+    periods: list[SettlementPeriod] = field(default_factory=list)
+    transfers: list[Transfer] = field(default_factory=list)  # Settle the final running balances
+
+    @property
+    def balances(self) -> dict[int, int]:
+        return self.periods[-1].running_balances if self.periods else dict.fromkeys(self.ratios, 0)
+
+
+def split_cents(total: int, ratios: dict[int, Decimal]) -> dict[int, int]:
+    """
+    Split an amount in cents according to the ratios; the rounding remainder goes to the largest ratios
+    so that the parts add up to the total.
+    """
+    ratio_sum = sum(ratios.values())
+    if not ratio_sum:
+        ratios, ratio_sum = dict.fromkeys(ratios, Decimal(1)), len(ratios)
+    parts = {user_id: int(total * ratio / ratio_sum) for user_id, ratio in ratios.items()}
+    remainder = total - sum(parts.values())
+    step = 1 if remainder > 0 else -1
+    for user_id in sorted(ratios, key=lambda user_id: (-ratios[user_id], user_id))[: abs(remainder)]:
+        parts[user_id] += step
+    return parts
+
+
+def net_balances(balances: dict[int, int]) -> list[Transfer]:
+    """
+    Transfers settling the balances (which add up to zero): each debtor pays the creditors in turn,
+    largest amounts first, so that there are at most (members - 1) transfers.
+    """
+    creditors = sorted(((amount, user_id) for user_id, amount in balances.items() if amount > 0), reverse=True)
+    debtors = sorted(((-amount, user_id) for user_id, amount in balances.items() if amount < 0), reverse=True)
+    transfers = []
+    creditor_index = debtor_index = 0
+    while creditor_index < len(creditors) and debtor_index < len(debtors):
+        credit, creditor_id = creditors[creditor_index]
+        debt, debtor_id = debtors[debtor_index]
+        amount = min(credit, debt)
+        transfers.append(Transfer(debtor_id, creditor_id, amount))
+        creditors[creditor_index] = (credit - amount, creditor_id)
+        debtors[debtor_index] = (debt - amount, debtor_id)
+        if credit == amount:
+            creditor_index += 1
+        if debt == amount:
+            debtor_index += 1
+    return transfers
+
+
+def compute_settlement(household_id: int, ratios: dict[int, Decimal], start_date: date, end_date: date) -> Settlement:
+    """
+    Monthly balances of the members over the period, from a single query grouped by member and month.
+    """
+    settlement = Settlement(household_id, start_date, end_date, ratios)
+    rows = (
+        StatementLine.objects.filter(
+            is_shared=True,
+            account_statement__bank_account__user_id__in=list(ratios),
+            operation_date__range=(start_date, end_date),
+        )
+        .annotate(month=TruncMonth("operation_date"))
+        .values("month", "account_statement__bank_account__user_id")
+        .annotate(total=Sum("amount"))
+        .order_by("month")
+    )
+    paid_by_month: dict[date, dict[int, int]] = {}
+    for row in rows:
+        # Expenses are negative amounts: what a member paid is the opposite of the sum of their shared lines
+        paid = paid_by_month.setdefault(row["month"], dict.fromkeys(ratios, 0))
+        paid[row["account_statement__bank_account__user_id"]] = -int(row["total"] * 100)
+
+    running_balances = dict.fromkeys(ratios, 0)
+    for month, paid in paid_by_month.items():
+        owed = split_cents(sum(paid.values()), ratios)
+        balances = {user_id: paid[user_id] - owed[user_id] for user_id in ratios}
+        running_balances = {user_id: running_balances[user_id] + balances[user_id] for user_id in ratios}
+        settlement.periods.append(SettlementPeriod(month, paid, balances, running_balances))
+    settlement.transfers = net_balances(running_balances)
+    return settlement
+
+
+def get_household_settlement(household: Household, start_date: date, end_date: date) -> Settlement:
+    """
+    Cached compute_settlement. The key holds the members' ratios and statement lines data versions,
+    so it changes when a member's lines or the split change.
+    """
+    ratios = dict(household.memberships.values_list("user_id", "split_ratio"))
+    versions = ",".join(
+        f"{user_id}:{ratio}:{get_user_version(STATEMENT_LINES_CACHE_SCOPE, user_id)}"
+        for user_id, ratio in sorted(ratios.items())
+    )
+    digest = hashlib.sha256(versions.encode()).hexdigest()
+    key = f"settlement:{household.id}:{start_date}:{end_date}:{digest}"
+    return get_or_set_versioned(
+        key, partial(compute_settlement, household.id, ratios, start_date, end_date), SETTLEMENT_CACHE_TIMEOUT
+    )
@@ -0,0 +1,153 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from data_ingestion.cache import bump_user_version
+from data_ingestion.models import (
+    STATEMENT_LINES_CACHE_SCOPE,
+    UNCATEGORIZED,
+    AccountStatement,
+    BankAccount,
+    Category,
+    LabelCategoryMapping,
+    LabelTokenCount,
+    ShareRule,
+    StatementCategoryTotal,
+    StatementLine,
+    SubCategory,
+    add_token_counts,
+    invalidate_statement_lines_cache,
+)
+from data_ingestion.resolvers import CATEGORIES_CACHE_SCOPE
+from data_ingestion.utils import SHARE_RULES_CACHE_SCOPE
+
+
+@receiver(post_save, sender=ShareRule)
+@receiver(post_delete, sender=ShareRule)
+def invalidate_share_rule_index(sender, instance: ShareRule, **kwargs) -> None:
+    transaction.on_commit(partial(bump_user_version, SHARE_RULES_CACHE_SCOPE, instance.user_id))
+
+
+@receiver(post_save, sender=SubCategory)
+def invalidate_share_rule_index_on_sub_category_change(sender, instance: SubCategory, created: bool, **kwargs) -> None:
+    # Share rules are indexed by subcategory name and category: a renamed subcategory changes their keys
+    if created:
+        return
+    for user_id in ShareRule.objects.filter(sub_category=instance).values_list("user_id", flat=True).distinct():
+        transaction.on_commit(partial(bump_user_version, SHARE_RULES_CACHE_SCOPE, user_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_save, sender=LabelCategoryMapping)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SubCategory)
+@receiver(post_delete, sender=LabelCategoryMapping)
+def invalidate_category_index(sender, instance: Category | SubCategory | LabelCategoryMapping, **kwargs) -> None:
+    if instance.user_id:
+        transaction.on_commit(partial(bump_user_version, CATEGORIES_CACHE_SCOPE, instance.user_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SubCategory)
+def invalidate_statement_lines_cache_on_rename(
+    sender, instance: Category | SubCategory, created: bool, **kwargs
+) -> None:
+    # Cached time series and reports hold the category names
+    if not created and instance.user_id:
+        transaction.on_commit(partial(bump_user_version, STATEMENT_LINES_CACHE_SCOPE, instance.user_id))
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=SubCategory)
+def collect_statement_totals_of_deleted_category(sender, instance: Category | SubCategory, **kwargs) -> None:
+    field_name = "category" if sender is Category else "sub_category"
+    totals = StatementCategoryTotal.objects.filter(**{field_name: instance})
+    instance._statement_ids = set(totals.values_list("account_statement_id", flat=True))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SubCategory)
+def rebuild_statement_totals_of_deleted_category(sender, instance: Category | SubCategory, **kwargs) -> None:
+    # The lines of the deleted (sub)category are now uncategorized (SET_NULL) while its totals were deleted
+    # (CASCADE). Rebuilt once the whole deletion is done, when no cascaded row is left to delete.
+    statement_ids = getattr(instance, "_statement_ids", None)
+    if statement_ids:
+        transaction.on_commit(partial(StatementCategoryTotal.objects.rebuild, statement_ids))
+        invalidate_statement_lines_cache(statement_ids)
+
+
+@receiver(pre_save, sender=StatementLine)
+def collect_previous_sub_category(sender, instance: StatementLine, **kwargs) -> None:
+    previous = instance.stored_rollup_entry()
+    instance._previous_sub_category_id = previous[0][2] if previous else None
+
+
+@receiver(post_save, sender=StatementLine)
+def learn_recategorized_line(sender, instance: StatementLine, created: bool, **kwargs) -> None:
+    # Lines created by the imports are learned by the import (see CategoryResolver.learn). The previous
+    # subcategory is not unlearned: lines categorized by the categorizer itself were never learned.
+    if created or instance.sub_category_id in (None, instance._previous_sub_category_id):
+        return
+    if instance.category is None or instance.category.name == UNCATEGORIZED:
+        return
+    user_id = BankAccount.objects.filter(accountstatement=instance.account_statement_id).values_list(
+        "user_id", flat=True
+    )[0]
+    counts = {}
+    add_token_counts(counts, instance.libeller, instance.sub_category_id, 1)
+    LabelTokenCount.objects.apply_counts(user_id, counts)
+
+
+def reassign_statement_lines(lines: QuerySet, user_id: int) -> None:
+    """
+    Give the lines to the new owner of their statement (StatementLine.user is denormalized from
+    account_statement.bank_account.user), and invalidate the cached data of their previous owners.
+    """
+    moved = lines.exclude(user_id=user_id)
+    previous_user_ids = set(moved.order_by().values_list("user_id", flat=True).distinct())
+    if not previous_user_ids:
+        return
+    moved.update(user_id=user_id)
+    for previous_user_id in previous_user_ids:
+        transaction.on_commit(partial(bump_user_version, STATEMENT_LINES_CACHE_SCOPE, previous_user_id))
+
+
+@receiver(post_save, sender=AccountStatement)
+def reassign_lines_of_moved_statement(sender, instance: AccountStatement, created: bool, **kwargs) -> None:
+    if created or kwargs.get("raw"):
+        return
+    user_id = BankAccount.objects.filter(id=instance.bank_account_id).values_list("user_id", flat=True)[0]
+    reassign_statement_lines(StatementLine.objects.filter(account_statement=instance), user_id)
+
+
+@receiver(post_save, sender=BankAccount)
+def reassign_lines_of_transferred_account(sender, instance: BankAccount, created: bool, **kwargs) -> None:
+    if created or kwargs.get("raw"):
+        return
+    reassign_statement_lines(StatementLine.objects.filter(account_statement__bank_account=instance), instance.user_id)
+
+
+@receiver(post_delete, sender=BankAccount)
+def invalidate_statement_lines_cache_of_deleted_account(sender, instance: BankAccount, **kwargs) -> None:
+    transaction.on_commit(partial(bump_user_version, STATEMENT_LINES_CACHE_SCOPE, instance.user_id))
+
+
+@receiver(post_delete, sender=AccountStatement)
+def invalidate_statement_lines_cache_of_deleted_statement(sender, instance: AccountStatement, **kwargs) -> None:
+    # The lines are deleted by the cascade, without StatementLineQuerySet.delete. The bank account is deleted
+    # after its statements: it is still there when its deletion cascades to them.
+    user_ids = BankAccount.objects.filter(id=instance.bank_account_id).values_list("user_id", flat=True)
+    for user_id in user_ids:
+        transaction.on_commit(partial(bump_user_version, STATEMENT_LINES_CACHE_SCOPE, user_id))
+
+
+@receiver(post_delete, sender=StatementLine)
+def invalidate_statement_lines_cache_of_deleted_line(sender, instance: StatementLine, origin=None, **kwargs) -> None:
+    # Lines deleted by the cascade of their statement are invalidated by its receiver: one query per statement
+    # instead of one per line. Querysets invalidate their lines in StatementLineQuerySet.delete.
+    if origin is instance:
+        invalidate_statement_lines_cache([instance.account_statement_id])
@@ -1 +1,1582 @@
-# Create your tests here.
+import codecs
+import csv
+import io
+import json
+import mmap
+import os
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from typing import Optional
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from data_ingestion.analytics import StatementLineSnapshot, get_statement_line_snapshot
+from data_ingestion.bank_parsers import (
+    SKIP_INVALID_ROW,
+    BankParser,
+    ParsedLine,
+    get_bank_parser,
+)
+from data_ingestion.benchmarks.classifier import SAMPLE_LABELS, legacy_classify
+from data_ingestion.benchmarks.generator import GENERATORS, KNOWN_LABELS
+from data_ingestion.cache import LOCAL_CACHE_ALIAS, get_or_set_versioned, get_user_version, user_cache_key
+from data_ingestion.categorizer import get_categorizer
+from data_ingestion.classifiers import (
+    SKIP_SALARY,
+    SKIP_SAVINGS,
+    ClassifiedLabel,
+    Direction,
+    banque_postale_skip_reason,
+    classify_banque_postale_label,
+)
+from data_ingestion.codecs import SHORT_DATE_FORMAT, format_amount_cents, parse_amount, parse_amount_cents, parse_date
+from data_ingestion.jobs import requeue_interrupted_jobs
+from data_ingestion.labels import LabelTrie, normalize_label
+from data_ingestion.models import (
+    AccountStatement,
+    BankAccount,
+    BankBrand,
+    Category,
+    Household,
+    HouseholdMember,
+    ImportedFile,
+    ImportJob,
+    ImportJobStatus,
+    LabelCategoryMapping,
+    LabelTokenCount,
+    ShareRule,
+    StatementCategoryTotal,
+    StatementLine,
+    SubCategory,
+    add_token_counts,
+)
+from data_ingestion.parsers import StatementFile, import_statement_files, parse_csv_and_create_statements
+from data_ingestion.readers import SNIFF_SIZE, CsvFormat, open_csv, sniff_format
+from data_ingestion.resolvers import CATEGORIES_CACHE_SCOPE, CategoryResolver, get_category_index
+from data_ingestion.settlements import Transfer, get_household_settlement, net_balances, split_cents
+from data_ingestion.utils import get_is_shared_for_user, get_share_rule_index
+
+
+def write_csv(directory: str, name: str, lines: list[str], encoding: str = "utf-8") -> str:
+    path = Path(directory) / name
+    path.write_text("\n".join(lines) + "\n", encoding=encoding)
+    return str(path)
+
+
+def banque_postale_lines(count: int, month: int = 1) -> list[str]:
+    lines = ["Date;Libellé;Montant(EUROS)"]
+    for i in range(count):
+        day = f"{1 + i % 28:02d}"
+        lines.append(f"{day}/{month:02d}/2025;ACHAT CB SHOP {i % 5} {day}.{month:02d}.25;-{i + 1},50")
+    return lines
+
+
+# The tests clear the shared cache: never the one of a running app, whatever runs the tests
+TEST_CACHES = {
+    **settings.CACHES,
+    "default": {**settings.CACHES["default"], "LOCATION": Path(tempfile.gettempdir()) / "budgetmate-test-cache"},
+}
+
+
+# The tests create the categories they need
+@override_settings(BOOTSTRAP_DEFAULT_CATEGORIES=False, CACHES=TEST_CACHES)
+class IngestionTestCase(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        # The shared cache outlives the test database
+        for alias in ("default", LOCAL_CACHE_ALIAS):
+            caches[alias].clear()
+            self.addCleanup(caches[alias].clear)
+        self.user = User.objects.create_user(username="ingestion", password="5tr0ngP@ssw0rd!!")
+        self.bank = BankBrand.objects.create(name="Banque postale")
+        self.bank_account = BankAccount.objects.create(account_number="123", bank=self.bank, user=self.user)
+        self.category = Category.objects.create(name="Shopping", user=self.user)
+        self.sub_category = SubCategory.objects.create(name="Divers", category=self.category, user=self.user)
+        for i in range(5):
+            LabelCategoryMapping.objects.create(
+                user=self.user, label=f"SHOP {i}", category=self.category, sub_category=self.sub_category
+            )
+
+    def import_csv(self, path: str, **kwargs):
+        return parse_csv_and_create_statements(
+            path,
+            date(2025, 1, 1),
+            date(2025, 1, 31),
+            "BS",
+            self.bank_account.id,
+            self.user.id,
+            **kwargs,
+        )
+
+
+class TestBatchedIngestion(IngestionTestCase):
+    def test_batched_import_matches_row_by_row_import(self):
+        path = write_csv(self.tmp_dir.name, "statement.csv", banque_postale_lines(30))
+        report = self.import_csv(path, batched=True, batch_size=7)
+        self.assertEqual((report.inserted, report.skipped), (30, 0))
+        lines = StatementLine.objects.order_by("amount")
+        self.assertEqual(lines.count(), 30)
+        self.assertEqual(lines.last().libeller, "SHOP 0")
+        self.assertEqual(lines.last().operation_date, date(2025, 1, 1))
+
+    def test_batched_import_skips_duplicate_rows(self):
+        rows = banque_postale_lines(3)
+        path = write_csv(self.tmp_dir.name, "statement.csv", rows + rows[1:])
+        report = self.import_csv(path, batched=True)
+        self.assertEqual((report.inserted, report.skipped), (3, 3))
+        self.assertEqual(StatementLine.objects.count(), 3)
+
+    def test_batched_import_query_count_does_not_grow_with_file_size(self):
+        # A first import creates the categories of the labels
+        self.import_csv(write_csv(self.tmp_dir.name, "first.csv", banque_postale_lines(5)), batched=True)
+        for rows in (10, 200):
+            StatementLine.objects.all().delete()
+            AccountStatement.objects.all().delete()
+            path = write_csv(self.tmp_dir.name, f"statement_{rows}.csv", banque_postale_lines(rows))
+            with self.subTest(rows=rows), self.assertNumQueries(28):
+                self.import_csv(path, batched=True, batch_size=1000)
+
+
+class TestBanquePostaleClassifier(SimpleTestCase):
+    def test_classify_card_purchase(self):
+        self.assertEqual(
+            classify_banque_postale_label("ACHAT CB CARREFOUR  MARKET 12.03.25 CARTE NUMERO 123"),
+            ClassifiedLabel("CB", "CARREFOUR MARKET", date(2025, 3, 12), Direction.EXPENSE),
+        )
+
+    def test_classify_transfers(self):
+        self.assertEqual(
+            classify_banque_postale_label("VIREMENT INSTANTANE DE M MARTIN"),
+            ClassifiedLabel("TR", "M MARTIN", None, Direction.INCOME),
+        )
+        self.assertEqual(
+            classify_banque_postale_label("VIREMENT POUR M DURAND"),
+            ClassifiedLabel("TR", "M DURAND", None, Direction.OUTGOING),
+        )
+
+    def test_classify_unmatched_label(self):
+        self.assertEqual(
+            classify_banque_postale_label('"RETRAIT DAB 10.03.25"'),
+            ClassifiedLabel("OT", "RETRAIT DAB 10.03.25", None, Direction.UNKNOWN),
+        )
+
+    def test_label_without_known_prefix_falls_back_to_search(self):
+        classified = classify_banque_postale_label("  ACHAT CB BOULANGERIE 01.02.25")
+        self.assertEqual(classified.clean_label, "BOULANGERIE")
+        self.assertEqual(classified.effective_date, date(2025, 2, 1))
+
+    def test_same_labels_and_dates_as_legacy_parser(self):
+        for label in SAMPLE_LABELS:
+            with self.subTest(label=label):
+                classified = classify_banque_postale_label(label)
+                _, clean_label, effective_date = legacy_classify(label)
+                self.assertEqual((classified.clean_label, classified.effective_date), (clean_label, effective_date))
+
+    def test_skip_reason(self):
+        self.assertEqual(
+            banque_postale_skip_reason(classify_banque_postale_label("VIREMENT DE ACME SALAIRE REFERENCE : 03")),
+            SKIP_SALARY,
+        )
+        self.assertEqual(
+            banque_postale_skip_reason(classify_banque_postale_label("VIREMENT POUR LIVRET EPARGNE")), SKIP_SAVINGS
+        )
+        self.assertIsNone(
+            banque_postale_skip_reason(classify_banque_postale_label("CREDIT CARTE BANCAIRE SALAIRE 01.01.25"))
+        )
+
+
+class TestSyntheticExports(SimpleTestCase):
+    def test_generated_exports_are_parsed(self):
+        for bank_name, generate in GENERATORS.items():
+            parser = get_bank_parser(bank_name)
+            lines = list(parser.parse(generate(1000, known_ratio=0.5)))
+            known = sum(line.label in KNOWN_LABELS for line in lines)
+            self.assertEqual(len(lines) + sum(parser.skipped.values()), 1000, bank_name)
+            self.assertEqual(parser.unmatched, 0)
+            self.assertAlmostEqual(known / len(lines), 0.5, delta=0.05)
+            self.assertEqual(list(generate(10, seed=1)), list(generate(10, seed=1)))
+
+
+class TestLabelNormalization(SimpleTestCase):
+    def test_store_numbers_references_and_places_are_stripped(self):
+        self.assertEqual(normalize_label("CARREFOUR 1234 LYON"), "CARREFOUR")
+        self.assertEqual(normalize_label("Carrefour-Market 5678 Saint Étienne"), "CARREFOUR MARKET")
+        self.assertEqual(normalize_label("EDF CLIENTS PARTICULIERS REF 0123 LYON"), "EDF CLIENTS PARTICULIERS")
+        self.assertEqual(normalize_label("PARIS BAGUETTE PARIS FR"), "PARIS BAGUETTE")
+        self.assertEqual(normalize_label("1234"), "")
+
+    def test_trie_returns_the_longest_matching_key(self):
+        labels = LabelTrie()
+        labels.insert("CARREFOUR", "supermarket")
+        labels.insert("CARREFOUR VOYAGES", "travel")
+        labels.insert("CARREFOUR", "ignored")
+        labels.insert("", "ignored")
+        self.assertEqual(len(labels), 2)
+        self.assertEqual(labels.lookup("CARREFOUR 5678 PARIS"), "supermarket")
+        self.assertEqual(labels.lookup("CARREFOUR CITY 12"), "supermarket")
+        self.assertEqual(labels.lookup("CARREFOUR VOYAGES 0042"), "travel")
+        self.assertIsNone(labels.lookup("CAR WASH"))
+
+
+class TestColumnCodecs(SimpleTestCase):
+    def test_amounts_round_trip_exactly(self):
+        for cents in range(-1_000_000, 1_000_000, 997):
+            text = format_amount_cents(cents)
+            self.assertEqual(parse_amount_cents(text), cents)
+            self.assertEqual(parse_amount(text).as_tuple().exponent, -2)
+            self.assertEqual(str(parse_amount(text)), f"{cents / 100:.2f}")
+
+    def test_french_amount_notations(self):
+        for text, cents in (
+            ("-42,10", -4210),
+            ("42,1", 4210),
+            ("+3", 300),
+            (" -1 234,56 ", -123456),
+            ("1\u00a0234,56", 123456),
+            ("1.234.567,89", 123456789),
+            ("12.5", 1250),
+            ("-0,05", -5),
+            ("0,10", 10),
+        ):
+            with self.subTest(text=text):
+                self.assertEqual(parse_amount_cents(text), cents)
+        self.assertIsNone(parse_amount(""))
+        for text in ("abc", "1,234", "--1", "1,2,3"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_amount(text)
+
+    def test_dates_are_memoized(self):
+        parse_date.cache_clear()
+        for _ in range(3):
+            self.assertEqual(parse_date("12/03/2025"), date(2025, 3, 12))
+            self.assertEqual(parse_date("11.03.25", SHORT_DATE_FORMAT), date(2025, 3, 11))
+        self.assertEqual((parse_date.cache_info().hits, parse_date.cache_info().misses), (4, 2))
+        with self.assertRaises(ValueError):
+            parse_date("Numéro Compte")
+
+
+class TestCsvReader(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.lines = [
+            "Date;Libellé;Montant(EUROS)",
+            "12/03/2025;ACHAT CB CAFÉ DE L'ÉGLISE 11.03.25;-4,20",
+            '13/03/2025;"VIREMENT DE MME DUPONT; LOYER";450,00',
+        ] * 50
+        self.rows = list(csv.reader(self.lines, delimiter=";"))
+
+    def read(self, source) -> list[list[str]]:
+        with open_csv(source) as rows:
+            return list(rows)
+
+    def test_encoding_and_bom_are_sniffed(self):
+        for encoding, bom in (("utf-8", b""), ("cp1252", b""), ("utf-8", codecs.BOM_UTF8), ("utf-16", b"")):
+            with self.subTest(encoding=encoding, bom=bom):
+                content = bom + "\r\n".join(self.lines).encode(encoding)
+                self.assertEqual(self.read(io.BytesIO(content)), self.rows)
+
+    def test_cp1252_character_after_the_sniffed_head(self):
+        lines = ["Date;Libellé;Montant(EUROS)"] + ["12/03/2025;ACHAT CB SHOP 11.03.25;-4,20"] * 60
+        content = "\n".join(lines + ["13/03/2025;ACHAT CB CAFÉ DU PORT 12.03.25;-2,10"]).encode("cp1252")
+        self.assertGreater(content.index(b"\xc9"), SNIFF_SIZE)
+        self.assertEqual(self.read(io.BytesIO(content))[-1][1], "ACHAT CB CAFÉ DU PORT 12.03.25")
+        path = Path(self.tmp_dir.name) / "statement.csv"
+        path.write_bytes(content)
+        with mock.patch("data_ingestion.readers.MMAP_THRESHOLD", 1):
+            self.assertEqual(self.read(path)[-1][1], "ACHAT CB CAFÉ DU PORT 12.03.25")
+
+    def test_delimiter_is_sniffed(self):
+        self.assertEqual(sniff_format(b"Date,Label,Amount\n12/03/2025,SHOP,-4.20\n"), CsvFormat("utf-8", ","))
+        # Decimal commas do not make the comma the delimiter
+        head = "\n".join(["Numéro Compte;123"] + self.lines[:3]).encode("cp1252")
+        self.assertEqual(sniff_format(head), CsvFormat("cp1252", ";"))
+        with self.assertRaises(ValueError):
+            sniff_format(b"%PDF-1.4\x00\x01")
+
+    def test_large_files_are_memory_mapped(self):
+        path = Path(self.tmp_dir.name) / "statement.csv"
+        path.write_text("\n".join(self.lines), encoding="utf-8")
+        with (
+            mock.patch("data_ingestion.readers.MMAP_THRESHOLD", 1),
+            mock.patch("data_ingestion.readers.READ_CHUNK_SIZE", 7),
+            mock.patch("data_ingestion.readers.mmap.mmap", wraps=mmap.mmap) as mapped,
+        ):
+            self.assertEqual(self.read(path), self.rows)
+        mapped.assert_called_once()
+
+    def test_uploaded_file_is_parsed_in_place(self):
+        uploaded_file = SimpleUploadedFile("statement.csv", "\n".join(self.lines[:3]).encode("cp1252"))
+        parsed_lines = list(get_bank_parser("Banque postale").parse_file(uploaded_file))
+        self.assertEqual([line.label for line in parsed_lines], ["CAFÉ DE L'ÉGLISE", "VIREMENT DE MME DUPONT; LOYER"])
+
+
+class TestBankParsers(SimpleTestCase):
+    def test_unknown_bank_has_no_parser(self):
+        with self.assertRaises(ValueError):
+            get_bank_parser("Unknown bank")
+
+    def test_banque_postale_parser_yields_records_and_counts_skipped_rows(self):
+        rows = [
+            ["Date", "Libellé", "Montant(EUROS)"],
+            ["Numéro Compte", "123"],
+            ["12/03/2025", "ACHAT CB CARREFOUR 11.03.25", "-42,10"],
+            ["13/03/2025", "VIREMENT DE ACME SALAIRE REFERENCE : 03", "2000,00"],
+            ["14/03/2025", "VIREMENT POUR LIVRET EPARGNE", "-100,00"],
+        ]
+        parser = get_bank_parser("Banque postale")
+        parsed_lines = parser.parse(rows)
+        self.assertEqual(
+            next(parsed_lines),
+            ParsedLine(date(2025, 3, 11), "CB", "CARREFOUR", Decimal("-42.10")),
+        )
+        self.assertEqual(list(parsed_lines), [])
+        self.assertEqual(parser.skipped, {SKIP_INVALID_ROW: 1, SKIP_SALARY: 1, SKIP_SAVINGS: 1})
+
+    def test_caisse_epargne_parser_keeps_proposed_categories(self):
+        rows = [
+            ["header"],
+            [
+                "",
+                "CARREFOUR",
+                "Courses",
+                "",
+                "",
+                "Carte bancaire",
+                "Alimentation",
+                "Supermarche",
+                "-42,10",
+                "",
+                "12/03/2025",
+            ],
+        ]
+        (parsed_line,) = get_bank_parser("Caisse d'épargne").parse(rows)
+        self.assertEqual(parsed_line.amount.as_tuple(), Decimal("-42.10").as_tuple())
+        self.assertEqual(parsed_line.operation_type, "CB")
+        self.assertEqual((parsed_line.category_name, parsed_line.sub_category_name), ("Alimentation", "Supermarche"))
+        self.assertEqual(parsed_line.comment, "Courses")
+
+    def test_parsed_lines_are_compact_records(self):
+        self.assertFalse(hasattr(ParsedLine(date(2025, 1, 1), "OT", "label", None), "__dict__"))
+        self.assertTrue(issubclass(get_bank_parser("Banque postale").__class__, BankParser))
+
+
+class TestCategoryResolver(IngestionTestCase):
+    def test_known_labels_are_resolved_without_queries(self):
+        resolver = CategoryResolver(self.user)
+        with self.assertNumQueries(0):
+            for _ in range(50):
+                self.assertEqual(resolver.resolve("SHOP 1"), (self.category, self.sub_category))
+
+    def test_unknown_labels_are_prompted_once_and_created_in_batch(self):
+        prompt = mock.Mock(return_value=("Santé", "Pharmacie"))
+        resolver = CategoryResolver(self.user, prompt=prompt)
+        with self.assertNumQueries(0):
+            category, sub_category = resolver.resolve("PHARMACIE DU CENTRE")
+            self.assertEqual(resolver.resolve("PHARMACIE DU CENTRE"), (category, sub_category))
+            self.assertEqual(resolver.resolve("PHARMACIE DE LA GARE")[1], sub_category)
+        self.assertEqual(prompt.call_count, 2)
+        self.assertIsNone(category.pk)
+
+        with self.assertNumQueries(3):
+            resolver.flush()
+        self.assertEqual(category.name, "Sante")
+        self.assertEqual(sub_category.category_id, category.pk)
+        self.assertEqual(LabelCategoryMapping.objects.filter(user=self.user, sub_category=sub_category).count(), 2)
+
+    def test_preload_is_cached_until_a_category_or_mapping_changes(self):
+        CategoryResolver(self.user)
+        with self.assertNumQueries(0):
+            resolver = CategoryResolver(self.user)
+        self.assertNotIn("SHOP 9", resolver.resolved)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            LabelCategoryMapping.objects.create(
+                user=self.user, label="SHOP 9", category=self.category, sub_category=self.sub_category
+            )
+        self.assertEqual(CategoryResolver(self.user).resolve("SHOP 9"), (self.category, self.sub_category))
+
+        resolver = CategoryResolver(self.user)
+        resolver.resolve("NEW SHOP", "Loisirs", "Cinema")
+        with self.captureOnCommitCallbacks(execute=True):
+            resolver.flush()
+        self.assertEqual(CategoryResolver(self.user).resolve("NEW SHOP")[0].name, "Loisirs")
+
+    def test_category_index_is_invalidated_once_the_change_is_committed(self):
+        version = get_user_version(CATEGORIES_CACHE_SCOPE, self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            resolver = CategoryResolver(self.user)
+            resolver.resolve("NEW SHOP", "Loisirs", "Cinema")
+            resolver.flush()
+            # A concurrent import must not cache the index it sees under a new version before the commit
+            self.assertEqual(get_user_version(CATEGORIES_CACHE_SCOPE, self.user.id), version)
+        self.assertGreater(get_user_version(CATEGORIES_CACHE_SCOPE, self.user.id), version)
+
+    def test_unknown_label_gets_the_mapping_of_its_normalized_label(self):
+        mapping = LabelCategoryMapping.objects.create(
+            user=self.user, label="CARREFOUR 1234 LYON", category=self.category, sub_category=self.sub_category
+        )
+        self.assertEqual(mapping.normalized_label, "CARREFOUR")
+        prompt = mock.Mock(return_value=("Loisirs", "Cinema"))
+        resolver = CategoryResolver(self.user, prompt=prompt)
+        self.assertEqual(resolver.resolve("CARREFOUR 5678 PARIS"), (self.category, self.sub_category))
+        category, _ = resolver.resolve("CINEMA PATHE 12")
+        self.assertEqual(resolver.resolve("CINEMA PATHE 34 NANTES")[0], category)
+        prompt.assert_called_once()
+
+        resolver.flush()
+        self.assertEqual(
+            list(LabelCategoryMapping.objects.filter(category=category).values_list("label", "normalized_label")),
+            [("CINEMA PATHE 12", "CINEMA PATHE")],
+        )
+
+    def test_existing_category_is_matched_by_normalized_name(self):
+        resolver = CategoryResolver(self.user, prompt=mock.Mock(return_value=(" shopping ", "DIVERS")))
+        self.assertEqual(resolver.resolve("NEW SHOP"), (self.category, self.sub_category))
+
+    def test_batched_import_with_known_labels_runs_a_constant_number_of_queries(self):
+        def count_queries(rows: int) -> int:
+            StatementLine.objects.all().delete()
+            AccountStatement.objects.all().delete()
+            path = write_csv(self.tmp_dir.name, f"statement_{rows}.csv", banque_postale_lines(rows))
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                self.import_csv(path, batched=True, batch_size=1000)
+            return len(queries)
+
+        get_share_rule_index(self.user.id)
+        get_category_index(self.user.id)
+        self.assertEqual(count_queries(10), count_queries(200))
+
+    def test_batched_import_creates_prompted_categories(self):
+        lines = ["Date;Libellé;Montant(EUROS)", "01/01/2025;ACHAT CB NEW SHOP 01.01.25;-1,00"] * 2
+        path = write_csv(self.tmp_dir.name, "statement.csv", lines)
+        with mock.patch("data_ingestion.views.prompt_for_category", return_value=("Loisirs", "Cinema")) as prompt:
+            report = self.import_csv(path, batched=True)
+        prompt.assert_called_once()
+        self.assertEqual((report.inserted, report.skipped), (1, 1))
+        line = StatementLine.objects.get()
+        self.assertEqual((line.category.name, line.sub_category.name), ("Loisirs", "Cinema"))
+
+
+class TestCategorizer(IngestionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.groceries = Category.objects.create(name="Alimentation", user=self.user)
+        self.supermarket = SubCategory.objects.create(name="Supermarche", category=self.groceries, user=self.user)
+
+    def train(self, lines: int) -> None:
+        counts = {}
+        add_token_counts(counts, "CARREFOUR MARKET", self.supermarket.id, lines)
+        add_token_counts(counts, "FNAC LIVRES", self.sub_category.id, lines)
+        with self.captureOnCommitCallbacks(execute=True):
+            LabelTokenCount.objects.apply_counts(self.user.id, counts)
+
+    def token_counts(self) -> set[tuple[int, str, int]]:
+        return set(LabelTokenCount.objects.values_list("sub_category_id", "token", "count"))
+
+    def test_unknown_labels_are_predicted_in_batch(self):
+        self.train(15)
+        predictions = get_categorizer(self.user.id).predict(["CARREFOUR CITY 12 LYON", "FNAC", "GARAGE DUPONT"])
+        self.assertEqual(predictions[0][:2], (self.groceries.id, self.supermarket.id))
+        self.assertGreater(predictions[0].confidence, 0.9)
+        self.assertEqual(predictions[1].sub_category_id, self.sub_category.id)
+        self.assertIsNone(predictions[2])
+
+    def test_no_categorizer_without_enough_training_lines(self):
+        self.train(5)
+        self.assertIsNone(get_categorizer(self.user.id))
+        self.train(5)
+        self.assertIsNotNone(get_categorizer(self.user.id))
+
+    def test_resolver_assigns_confident_predictions_without_prompt(self):
+        self.train(15)
+        prompt = mock.Mock(return_value=("Loisirs", "Cinema"))
+        resolver = CategoryResolver(self.user, prompt=prompt)
+        self.assertEqual(resolver.resolve("CARREFOUR EXPRESS"), (self.groceries, self.supermarket))
+        prompt.assert_not_called()
+        self.assertEqual(resolver.new_mappings, [])
+
+        # Ambiguous label: the prediction is only proposed
+        resolver.resolve("CARREFOUR FNAC")
+        prompt.assert_called_once()
+        self.assertIn(prompt.call_args.args[1], ("Alimentation", "Shopping"))
+
+    @override_settings(CATEGORIZER_CONFIDENCE_THRESHOLD=1.1)
+    def test_low_confidence_prediction_is_proposed_to_the_prompt(self):
+        self.train(15)
+        prompt = mock.Mock(return_value=("Alimentation", "Supermarche"))
+        CategoryResolver(self.user, prompt=prompt).resolve("CARREFOUR EXPRESS")
+        prompt.assert_called_once_with("CARREFOUR EXPRESS", "Alimentation", "Supermarche")
+
+    def test_import_learns_categorized_lines(self):
+        path = write_csv(self.tmp_dir.name, "statement.csv", banque_postale_lines(25))
+        self.import_csv(path, batched=True)
+        self.assertEqual(self.token_counts(), {(self.sub_category.id, "", 25), (self.sub_category.id, "SHOP", 25)})
+
+        # Rebuilding from the lines gives the same counts
+        out = StringIO()
+        call_command("train_categorizer", "ingestion", stdout=out)
+        self.assertIn("ingestion: 2 token count(s).", out.getvalue())
+        self.assertEqual(self.token_counts(), {(self.sub_category.id, "", 25), (self.sub_category.id, "SHOP", 25)})
+
+    def test_duplicate_lines_are_learned_once(self):
+        header, *lines = banque_postale_lines(25)
+        for batched, statement_type, rows in ((True, "BS", lines + lines), (False, "CA", lines[::-1] + lines)):
+            with self.subTest(batched=batched):
+                path = write_csv(self.tmp_dir.name, f"statement_{statement_type}.csv", [header, *rows])
+                report = parse_csv_and_create_statements(
+                    path,
+                    date(2025, 1, 1),
+                    date(2025, 1, 31),
+                    statement_type,
+                    self.bank_account.id,
+                    self.user.id,
+                    batched=batched,
+                )
+                self.assertEqual((report.inserted, report.skipped), (25, 25))
+        counts = {(self.sub_category.id, "", 50), (self.sub_category.id, "SHOP", 50)}
+        self.assertEqual(self.token_counts(), counts)
+
+        self.assertTrue(self.import_csv(path).already_imported)
+        self.assertEqual(self.token_counts(), counts)
+
+    def test_uncategorized_and_predicted_labels_are_not_learned(self):
+        self.train(15)
+        before = self.token_counts()
+        resolver = CategoryResolver(self.user)
+        resolver.resolve("GARAGE DUPONT")
+        resolver.resolve("CARREFOUR EXPRESS")
+        resolver.flush()
+        resolver.learn(Counter({"GARAGE DUPONT": 3, "CARREFOUR EXPRESS": 2}))
+        self.assertEqual(resolver.resolved["GARAGE DUPONT"][0].name, "Uncategorized")
+        self.assertEqual(self.token_counts(), before)
+
+    def test_recategorized_line_is_learned(self):
+        path = write_csv(self.tmp_dir.name, "statement.csv", banque_postale_lines(1))
+        self.import_csv(path, batched=True)
+        line = StatementLine.objects.get()
+        line.category, line.sub_category = self.groceries, self.supermarket
+        line.save()
+        self.assertEqual(
+            set(LabelTokenCount.objects.filter(sub_category=self.supermarket).values_list("token", "count")),
+            {("", 1), ("SHOP", 1)},
+        )
+        line.comment = "checked"
+        with mock.patch.object(LabelTokenCount.objects, "apply_counts") as apply_counts:
+            line.save()
+        apply_counts.assert_not_called()
+
+
+class TestSharedCache(IngestionTestCase):
+    def test_value_is_computed_once_for_all_workers(self):
+        key = user_cache_key(CATEGORIES_CACHE_SCOPE, self.user.id)
+        compute = mock.Mock(return_value={"total": 1})
+        self.assertEqual(get_or_set_versioned(key, compute, 60), {"total": 1})
+        # Another worker: empty in-process cache, same shared cache
+        caches[LOCAL_CACHE_ALIAS].clear()
+        self.assertEqual(get_or_set_versioned(key, compute, 60), {"total": 1})
+        compute.assert_called_once()
+
+    def test_local_hit_does_not_read_the_shared_cache(self):
+        key = user_cache_key(CATEGORIES_CACHE_SCOPE, self.user.id)
+        get_or_set_versioned(key, mock.Mock(return_value=[1, 2]), 60)
+        with mock.patch.object(cache, "get") as shared_get:
+            self.assertEqual(get_or_set_versioned(key, mock.Mock(), 60), [1, 2])
+        shared_get.assert_not_called()
+
+
+class TestShareRuleIndex(IngestionTestCase):
+    def test_rules_match_case_insensitively(self):
+        ShareRule.objects.create(user=self.user, label="Shop 1", sub_category=self.sub_category, always_shared=True)
+        ShareRule.objects.create(user=self.user, label="SHOP 2", sub_category=self.sub_category, always_shared=False)
+        self.assertTrue(get_is_shared_for_user(self.user, " shop 1 ", self.sub_category))
+        self.assertFalse(get_is_shared_for_user(self.user, "SHOP 2", self.sub_category))
+        self.assertIsNone(get_is_shared_for_user(self.user, "SHOP 3", self.sub_category))
+
+        other_category = Category.objects.create(name="Other", user=self.user)
+        homonym = SubCategory.objects.create(name="Divers", category=other_category, user=self.user)
+        self.assertIsNone(get_is_shared_for_user(self.user, "SHOP 1", homonym))
+
+    def test_rules_apply_to_labels_with_the_same_normalized_label(self):
+        ShareRule.objects.create(user=self.user, label="CARREFOUR 1234 LYON", sub_category=self.sub_category)
+        ShareRule.objects.create(user=self.user, label="FNAC 1", sub_category=self.sub_category, always_shared=True)
+        ShareRule.objects.create(user=self.user, label="FNAC 2", sub_category=self.sub_category, always_shared=False)
+        self.assertTrue(get_is_shared_for_user(self.user, "CARREFOUR 5678 PARIS", self.sub_category))
+        self.assertIsNone(get_is_shared_for_user(self.user, "FNAC 3", self.sub_category))
+
+    def test_index_is_cached_until_a_rule_changes(self):
+        rule = ShareRule.objects.create(user=self.user, label="SHOP 1", sub_category=self.sub_category)
+        get_share_rule_index(self.user.id)
+        with self.assertNumQueries(0):
+            self.assertTrue(get_is_shared_for_user(self.user, "SHOP 1", self.sub_category))
+
+        rule.always_shared = False
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+            # Invalidated once committed: a concurrent read would cache the previous rules under a new version
+            self.assertTrue(get_is_shared_for_user(self.user, "SHOP 1", self.sub_category))
+        self.assertFalse(get_is_shared_for_user(self.user, "SHOP 1", self.sub_category))
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.delete()
+        self.assertIsNone(get_is_shared_for_user(self.user, "SHOP 1", self.sub_category))
+
+    def test_renamed_sub_category_invalidates_index(self):
+        ShareRule.objects.create(user=self.user, label="SHOP 1", sub_category=self.sub_category)
+        self.assertTrue(get_is_shared_for_user(self.user, "SHOP 1", self.sub_category))
+        self.sub_category.name = "Vetements"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sub_category.save()
+        self.assertTrue(get_is_shared_for_user(self.user, "SHOP 1", self.sub_category))
+        self.assertEqual(len(get_share_rule_index(self.user.id).rules), 1)
+
+
+class TestStatementUpload(IngestionTestCase):
+    def setUp(self):
+        super().setUp()
+        settings_override = override_settings(IMPORT_SPOOL_DIR=Path(self.tmp_dir.name) / "spool")
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content: str, **data):
+        payload = {
+            "file": SimpleUploadedFile("statement.csv", content.encode()),
+            "bank_account": self.bank_account.id,
+            "statement_type": "BS",
+            "start_date": "2025-01-01",
+            "end_date": "2025-01-31",
+            **data,
+        }
+        return self.client.post("/api/v1/upload/", payload, format="multipart")
+
+    def test_upload_is_queued_and_processed_by_the_worker(self):
+        lines = banque_postale_lines(3) + ["04/01/2025;ACHAT CB UNKNOWN SHOP 04.01.25;-9,99"]
+        response = self.upload("\n".join(lines))
+        self.assertEqual(response.status_code, 202)
+        job = ImportJob.objects.get(id=response.data["id"])
+        self.assertEqual(job.status, ImportJobStatus.PENDING)
+        self.assertTrue(Path(job.file_path).is_file())
+        self.assertFalse(StatementLine.objects.exists())
+
+        call_command("run_import_worker", "--once")
+
+        response = self.client.get(f"/api/v1/import-jobs/{job.id}/")
+        self.assertEqual(response.data["status"], ImportJobStatus.DONE)
+        self.assertEqual((response.data["rows_parsed"], response.data["rows_inserted"]), (4, 4))
+        self.assertEqual(response.data["rows_pending_review"], 4)
+        self.assertFalse(Path(job.file_path).exists())
+        self.assertEqual(StatementLine.objects.get(libeller="UNKNOWN SHOP").category.name, "Uncategorized")
+
+    def test_failed_import_is_reported(self):
+        self.bank.name = "Unknown bank"
+        self.bank.save()
+        job_id = self.upload("\n".join(banque_postale_lines(1))).data["id"]
+        call_command("run_import_worker", "--once")
+        response = self.client.get(f"/api/v1/import-jobs/{job_id}/")
+        self.assertEqual(response.data["status"], ImportJobStatus.FAILED)
+        self.assertIn("No parser registered", response.data["error"])
+        self.assertFalse(Path(ImportJob.objects.get(id=job_id).file_path).exists())
+
+    @override_settings(IMPORT_JOB_STALE_AFTER=60)
+    def test_only_jobs_of_stopped_workers_are_requeued(self):
+        now = timezone.now()
+        jobs = {}
+        for rows, (name, heartbeat_at) in enumerate(
+            (("live", now - timedelta(seconds=10)), ("stopped", now - timedelta(seconds=90))), start=1
+        ):
+            response = self.upload("\n".join(banque_postale_lines(rows)))
+            jobs[name] = ImportJob.objects.get(id=response.data["id"])
+            jobs[name].status = ImportJobStatus.RUNNING
+            jobs[name].started_at = jobs[name].heartbeat_at = heartbeat_at
+            jobs[name].save()
+
+        self.assertEqual(requeue_interrupted_jobs(), 1)
+        for job in jobs.values():
+            job.refresh_from_db()
+        self.assertEqual(jobs["live"].status, ImportJobStatus.RUNNING)
+        self.assertEqual(jobs["stopped"].status, ImportJobStatus.PENDING)
+        self.assertIsNone(jobs["stopped"].heartbeat_at)
+
+    def test_upload_to_another_user_bank_account_is_rejected(self):
+        other_user = User.objects.create_user(username="other", password="5tr0ngP@ssw0rd!!")
+        other_account = BankAccount.objects.create(account_number="456", bank=self.bank, user=other_user)
+        response = self.upload("\n".join(banque_postale_lines(1)), bank_account=other_account.id)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("bank_account", response.data)
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_cp1252_upload_keeps_accented_labels(self):
+        lines = banque_postale_lines(1) + ["02/01/2025;ACHAT CB CAFÉ DE LA GARE 02.01.25;-3,20"]
+        response = self.upload("", file=SimpleUploadedFile("statement.csv", "\r\n".join(lines).encode("cp1252")))
+        self.assertEqual(response.status_code, 202)
+        call_command("run_import_worker", "--once")
+        self.assertTrue(StatementLine.objects.filter(libeller="CAFÉ DE LA GARE").exists())
+
+    def test_binary_upload_is_rejected(self):
+        response = self.upload("", file=SimpleUploadedFile("statement.pdf", b"%PDF-1.4\x00\x01\x02"))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("file", response.data)
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_same_file_cannot_be_uploaded_twice(self):
+        content = "\n".join(banque_postale_lines(2))
+        self.assertEqual(self.upload(content).status_code, 202)
+        response = self.upload(content)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(ImportJob.objects.count(), 1)
+        self.assertEqual(len(list((Path(self.tmp_dir.name) / "spool").iterdir())), 1)
+
+
+@override_settings(METRICS_TOKEN="secret")
+class TestMetrics(IngestionTestCase):
+    def sample(self, name: str, **labels) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def scrape(self) -> str:
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_import_records_parsed_and_skipped_rows(self):
+        bank = {"bank": "Banque postale"}
+        parsed = self.sample("budgetmate_ingestion_rows_parsed_total", **bank)
+        salary = self.sample("budgetmate_ingestion_rows_skipped_total", reason=SKIP_SALARY, **bank)
+        persistence = self.sample("budgetmate_ingestion_stage_seconds_count", stage="persistence")
+        lines = banque_postale_lines(3) + ["04/01/2025;VIREMENT DE ACME SALAIRE REFERENCE : 03;2000,00"]
+        self.import_csv(write_csv(self.tmp_dir.name, "statement.csv", lines), batched=True)
+
+        self.assertEqual(self.sample("budgetmate_ingestion_rows_parsed_total", **bank), parsed + 3)
+        self.assertEqual(self.sample("budgetmate_ingestion_rows_skipped_total", reason=SKIP_SALARY, **bank), salary + 1)
+        self.assertEqual(self.sample("budgetmate_ingestion_stage_seconds_count", stage="persistence"), persistence + 1)
+
+    def test_metrics_endpoint_exposes_queue_depth_and_query_counts(self):
+        ImportJob.objects.create(
+            user=self.user,
+            bank_account=self.bank_account,
+            statement_type="BS",
+            start_date=date(2025, 1, 1),
+            end_date=date(2025, 1, 31),
+            file_path="statement.csv",
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.get("/api/v1/categories/")
+
+        metrics = self.scrape()
+        self.assertIn("budgetmate_import_jobs_pending 1.0", metrics)
+        self.assertIn('budgetmate_http_request_db_queries_count{view="category-list"}', metrics)
+        self.assertIn(
+            'django_http_requests_latency_seconds_by_view_method_count{method="GET",view="category-list"}', metrics
+        )
+
+    def test_metrics_of_the_other_processes_are_aggregated(self):
+        # The import worker (or a gunicorn worker) counting rows in the shared metrics directory
+        worker = (
+            "from prometheus_client import Counter\n"
+            "Counter('budgetmate_ingestion_rows_parsed_total', '', ['bank']).labels('Banque postale').inc(3)"
+        )
+        env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": self.tmp_dir.name}
+        subprocess.run([sys.executable, "-c", worker], env=env, check=True)
+        with mock.patch.dict("os.environ", {"PROMETHEUS_MULTIPROC_DIR": self.tmp_dir.name}):
+            metrics = self.scrape()
+        self.assertIn('budgetmate_ingestion_rows_parsed_total{bank="Banque postale"} 3.0', metrics)
+        self.assertIn("budgetmate_import_jobs_pending 0.0", metrics)
+
+    def test_metrics_endpoint_requires_the_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer other").status_code, 403)
+        self.scrape()
+
+    @override_settings(METRICS_TOKEN="")
+    def test_metrics_endpoint_is_disabled_without_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+
+class TestIngestionBenchmark(TestCase):
+    def test_report_is_stored_as_json_and_compared(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = Path(tmp_dir) / "report.json"
+            call_command("benchmark_ingestion", "--rows", "50", "--cases", "parse", "batched", "--output", output)
+            report = json.loads(output.read_text())
+            self.assertEqual(
+                [(result["case"], result["rows"]) for result in report["results"]],
+                [
+                    ("parse", 50),
+                    ("batched", 50),
+                ],
+            )
+            self.assertEqual(report["results"][0]["queries"], 0)
+            self.assertGreater(report["results"][1]["queries"], 0)
+            self.assertFalse(User.objects.exists())
+
+            report["results"][1]["queries_per_row"] /= 10
+            output.write_text(json.dumps(report))
+            with self.assertRaisesRegex(CommandError, "batched \\(50 rows\\): .* queries/row"):
+                call_command(
+                    "benchmark_ingestion", "--rows", "50", "--cases", "batched", "--compare", output, stdout=StringIO()
+                )
+
+
+class TestImportStatementsCommand(IngestionTestCase):
+    def call(self, *args) -> str:
+        stdout = StringIO()
+        call_command("import_statements", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def import_args(self, *paths) -> list:
+        return [*paths, "--bank-account", self.bank_account.id, "--from", "2025-01-01", "--to", "2025-01-31"]
+
+    def test_parse_only_expands_globs_without_queries(self):
+        write_csv(self.tmp_dir.name, "january.csv", banque_postale_lines(4))
+        write_csv(self.tmp_dir.name, "february.csv", banque_postale_lines(2, month=2))
+        with self.assertNumQueries(0):
+            output = self.call(f"{self.tmp_dir.name}/*.csv", "--parse-only", "--bank", "Banque postale")
+        self.assertIn("february.csv: 2 lines parsed", output)
+        self.assertIn("january.csv: 4 lines parsed", output)
+
+    def test_dry_run_is_rolled_back(self):
+        path = write_csv(self.tmp_dir.name, "statement.csv", banque_postale_lines(4))
+        output = self.call(*self.import_args(path), "--dry-run")
+        self.assertIn("statement.csv: 4 lines parsed, 4 inserted", output)
+        self.assertFalse(StatementLine.objects.exists())
+        self.assertFalse(AccountStatement.objects.exists())
+
+    def test_queries_are_logged_by_stage_and_profile_is_dumped(self):
+        path = write_csv(self.tmp_dir.name, "statement.csv", banque_postale_lines(4))
+        profile = Path(self.tmp_dir.name) / "import.prof"
+        output = self.call(*self.import_args(path), "--log-queries", "--profile", profile, "--profile-top", "5")
+        self.assertRegex(output, r"setup: \d+ queries")
+        self.assertRegex(output, r"categorization: \d+ queries")
+        self.assertRegex(output, r"persistence: \d+ queries")
+        self.assertIn('INSERT INTO "data_ingestion_statementline"', output)
+        self.assertTrue(profile.is_file())
+        self.assertEqual(StatementLine.objects.count(), 4)
+
+    def test_several_files_need_one_statement_type_each(self):
+        paths = [
+            write_csv(self.tmp_dir.name, "a.csv", banque_postale_lines(2)),
+            write_csv(self.tmp_dir.name, "b.csv", banque_postale_lines(3)),
+        ]
+        with self.assertRaisesRegex(CommandError, "one --statement-type per file"):
+            self.call(*self.import_args(*paths))
+        output = self.call(
+            *self.import_args(*paths), "--statement-type", "BS", "--statement-type", "CA", "--workers", 1
+        )
+        self.assertIn("b.csv: 3 lines parsed", output)
+
+    def test_several_files_derive_their_period_and_report_collisions(self):
+        paths = [
+            write_csv(self.tmp_dir.name, "january.csv", banque_postale_lines(2, 1)),
+            write_csv(self.tmp_dir.name, "february.csv", banque_postale_lines(3, 2)),
+            write_csv(self.tmp_dir.name, "february-bis.csv", banque_postale_lines(4, 2)),
+        ]
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            "import_statements",
+            *paths,
+            "--bank-account",
+            self.bank_account.id,
+            *["--statement-type", "BS"] * 3,
+            "--workers",
+            1,
+            stdout=stdout,
+            stderr=stderr,
+        )
+        self.assertIn("february.csv: 3 lines parsed", stdout.getvalue())
+        self.assertIn("february-bis.csv: not imported", stderr.getvalue())
+        self.assertEqual(
+            sorted(AccountStatement.objects.values_list("start_date", flat=True)), [date(2025, 1, 1), date(2025, 2, 1)]
+        )
+
+
+class TestMultiFileImport(IngestionTestCase):
+    def test_files_are_parsed_in_parallel_and_imported_in_their_own_statement(self):
+        statement_files = [
+            StatementFile(
+                write_csv(self.tmp_dir.name, "statement.csv", banque_postale_lines(20)),
+                "BS",
+                self.bank_account.id,
+                date(2025, 1, 1),
+                date(2025, 1, 31),
+            ),
+            StatementFile(
+                write_csv(self.tmp_dir.name, "receipts.csv", banque_postale_lines(5)),
+                "CA",
+                self.bank_account.id,
+                date(2025, 1, 1),
+                date(2025, 1, 31),
+            ),
+        ]
+        reports = import_statement_files(statement_files, self.user.id, max_workers=2)
+        self.assertEqual([report.inserted for report in reports], [20, 5])
+        self.assertEqual([report.account_statement.statement_type for report in reports], ["BS", "CA"])
+        for report in reports:
+            self.assertEqual(report.account_statement.statementline_set.count(), report.inserted)
+
+    def test_already_imported_statement_is_returned_without_new_lines(self):
+        path = write_csv(self.tmp_dir.name, "statement.csv", banque_postale_lines(3))
+        first = self.import_csv(path, batched=True)
+        (report,) = import_statement_files(
+            [StatementFile(path, "BS", self.bank_account.id, date(2025, 1, 1), date(2025, 1, 31))], self.user.id
+        )
+        self.assertEqual(report.account_statement, first.account_statement)
+        self.assertEqual(report.inserted, 0)
+        self.assertEqual(StatementLine.objects.count(), 3)
+
+    def test_period_of_each_file_is_derived_from_its_operations(self):
+        statement_files = [
+            StatementFile(
+                write_csv(self.tmp_dir.name, f"2025-{month:02}.csv", banque_postale_lines(3, month)),
+                "BS",
+                self.bank_account.id,
+            )
+            for month in (1, 2, 3)
+        ]
+        reports = import_statement_files(statement_files, self.user.id, max_workers=2)
+        self.assertEqual([report.error for report in reports], [None, None, None])
+        self.assertEqual(
+            [(report.account_statement.start_date, report.account_statement.end_date) for report in reports],
+            [
+                (date(2025, 1, 1), date(2025, 1, 31)),
+                (date(2025, 2, 1), date(2025, 2, 28)),
+                (date(2025, 3, 1), date(2025, 3, 31)),
+            ],
+        )
+        self.assertEqual(StatementLine.objects.count(), 9)
+
+    def test_files_are_imported_into_their_own_bank_account(self):
+        savings = BankAccount.objects.create(user=self.user, bank=self.bank, account_number="456")
+        statement_files = [
+            StatementFile(
+                write_csv(self.tmp_dir.name, "current.csv", banque_postale_lines(2)), "BS", self.bank_account.id
+            ),
+            StatementFile(write_csv(self.tmp_dir.name, "savings.csv", banque_postale_lines(4)), "BS", savings.id),
+        ]
+        reports = import_statement_files(statement_files, self.user.id)
+        self.assertEqual([report.account_statement.bank_account for report in reports], [self.bank_account, savings])
+        self.assertEqual([report.inserted for report in reports], [2, 4])
+
+    def test_file_colliding_with_another_statement_is_reported_as_an_error(self):
+        statement_files = [
+            StatementFile(
+                write_csv(self.tmp_dir.name, "first.csv", banque_postale_lines(2)), "BS", self.bank_account.id
+            ),
+            StatementFile(
+                write_csv(self.tmp_dir.name, "second.csv", banque_postale_lines(3)), "BS", self.bank_account.id
+            ),
+        ]
+        first, second = import_statement_files(statement_files, self.user.id, max_workers=1)
+        self.assertIsNone(first.error)
+        self.assertFalse(second.already_imported)
+        self.assertIn("already holds the lines of another file", second.error)
+        self.assertEqual(second.inserted, 0)
+        self.assertEqual(second.account_statement, first.account_statement)
+        self.assertEqual(StatementLine.objects.count(), 2)
+        self.assertEqual(ImportedFile.objects.count(), 1)
+
+    def test_unknown_bank_account_is_rejected(self):
+        path = write_csv(self.tmp_dir.name, "statement.csv", banque_postale_lines(2))
+        with self.assertRaises(BankAccount.DoesNotExist):
+            import_statement_files([StatementFile(path, "BS", self.bank_account.id + 100)], self.user.id)
+
+
+class TestImportedFileDeduplication(IngestionTestCase):
+    def test_reimported_file_is_rejected_before_parsing(self):
+        path = write_csv(self.tmp_dir.name, "statement.csv", banque_postale_lines(3))
+        first = self.import_csv(path, batched=True)
+        imported_file = first.account_statement.imported_file
+        self.assertEqual(imported_file.original_filename, "statement.csv")
+        self.assertEqual(imported_file.size, Path(path).stat().st_size)
+
+        with mock.patch("data_ingestion.bank_parsers.BankParser.parse_file") as parse_file:
+            report = parse_csv_and_create_statements(
+                path, date(2025, 2, 1), date(2025, 2, 28), "BS", self.bank_account.id, self.user.id, batched=True
+            )
+        parse_file.assert_not_called()
+        self.assertTrue(report.already_imported)
+        self.assertEqual(report.account_statement, first.account_statement)
+        self.assertEqual(AccountStatement.objects.count(), 1)
+
+    def test_multi_file_import_skips_known_and_repeated_files(self):
+        known = write_csv(self.tmp_dir.name, "known.csv", banque_postale_lines(2))
+        self.import_csv(known, batched=True)
+        new = write_csv(self.tmp_dir.name, "new.csv", banque_postale_lines(4))
+        reports = import_statement_files(
+            [
+                StatementFile(known, "CA", self.bank_account.id),
+                StatementFile(new, "CR", self.bank_account.id),
+                StatementFile(new, "DB", self.bank_account.id),
+            ],
+            self.user.id,
+            max_workers=1,
+        )
+        self.assertEqual([report.already_imported for report in reports], [True, False, True])
+        self.assertEqual(reports[2].account_statement, reports[1].account_statement)
+        self.assertEqual(ImportedFile.objects.count(), 2)
+
+
+class TestStatementReadApi(IngestionTestCase):
+    def setUp(self):
+        super().setUp()
+        path = write_csv(self.tmp_dir.name, "statement.csv", banque_postale_lines(30))
+        self.statement = self.import_csv(path, batched=True).account_statement
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_lines_are_paginated_newest_first_without_gaps(self):
+        ids, url = [], "/api/v1/statement-lines/?page_size=7"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [line["id"] for line in response.data["results"]]
+            url = response.data["next"]
+        expected = self.statement.statementline_set.order_by("-operation_date", "-id").values_list("id", flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_page_query_count_is_fixed(self):
+        for url in ("/api/v1/statement-lines/?page_size=2", "/api/v1/statement-lines/?page_size=30"):
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.data["results"][0]["category_name"], "Shopping")
+
+    def test_lines_filters(self):
+        line = self.statement.statementline_set.order_by("id").first()
+        line.is_shared = True
+        line.save()
+        response = self.client.get("/api/v1/statement-lines/", {"is_shared": "true"})
+        self.assertEqual([result["id"] for result in response.data["results"]], [line.id])
+        response = self.client.get("/api/v1/statement-lines/", {"unclassified": "true"})
+        self.assertEqual(len(response.data["results"]), 29)
+        response = self.client.get(
+            "/api/v1/statement-lines/",
+            {
+                "start_date": "2025-01-05",
+                "end_date": "2025-01-06",
+                "operation_type": "CB",
+                "category": self.category.id,
+            },
+        )
+        self.assertEqual(
+            {result["operation_date"] for result in response.data["results"]}, {"2025-01-05", "2025-01-06"}
+        )
+
+    def test_lines_of_other_users_are_hidden(self):
+        self.client.force_authenticate(User.objects.create_user(username="other", password="5tr0ngP@ssw0rd!!"))
+        self.assertEqual(self.client.get("/api/v1/statement-lines/").data["results"], [])
+
+    def test_lines_follow_their_account_and_statement_to_a_new_owner(self):
+        other_user = User.objects.create_user(username="other", password="5tr0ngP@ssw0rd!!")
+        self.bank_account.user = other_user
+        self.bank_account.save()
+        self.assertEqual(self.client.get("/api/v1/statement-lines/").data["results"], [])
+        other_client = APIClient()
+        other_client.force_authenticate(other_user)
+        self.assertEqual(len(other_client.get("/api/v1/statement-lines/?page_size=50").data["results"]), 30)
+
+        self.statement.bank_account = BankAccount.objects.create(
+            account_number="2", bank=self.bank_account.bank, user=self.user
+        )
+        self.statement.save()
+        self.assertEqual(other_client.get("/api/v1/statement-lines/").data["results"], [])
+        self.assertEqual(len(self.client.get("/api/v1/statement-lines/?page_size=50").data["results"]), 30)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get("/api/v1/statement-lines/?cursor=nope").status_code, 404)
+
+    def test_statements_with_totals_and_categories(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/v1/account-statements/")
+        self.assertEqual(response.data["results"][0]["total_amount"], "-480.00")
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/v1/categories/")
+        self.assertEqual(response.data[0]["sub_categories"], [{"id": self.sub_category.id, "name": "Divers"}])
+
+
+class TestExports(IngestionTestCase):
+    def setUp(self):
+        super().setUp()
+        path = write_csv(self.tmp_dir.name, "statement.csv", banque_postale_lines(5))
+        self.statement = self.import_csv(path, batched=True).account_statement
+        self.statement.statementline_set.filter(amount__gt=-3).update(is_shared=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_export(self, url: str) -> str:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_lines_csv(self):
+        rows = list(csv.reader(self.get_export("/api/v1/exports/lines.csv?end_date=2025-01-02").splitlines()))
+        self.assertEqual(rows[0][:4], ["operation_date", "operation_type", "libeller", "amount"])
+        self.assertEqual(rows[1][:6], ["2025-01-01", "CB", "SHOP 0", "-1.50", "Shopping", "Divers"])
+        self.assertEqual(len(rows), 3)
+
+    def test_shared_ndjson(self):
+        rows = [json.loads(line) for line in self.get_export("/api/v1/exports/shared.ndjson").splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]["category_name"], rows[0]["total"], rows[0]["line_count"]), ("Shopping", "-4.00", 2))
+
+    def test_unknown_export(self):
+        self.assertEqual(self.client.get("/api/v1/exports/lines.xml").status_code, 404)
+        self.assertEqual(self.client.get("/api/v1/exports/users.csv").status_code, 404)
+
+    def test_command_streams_totals(self):
+        output = StringIO()
+        call_command("export_statements", self.user.username, "totals", "--format", "ndjson", stdout=output)
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(sum(row["line_count"] for row in rows), 5)
+
+
+class TestSpendingTimeSeries(IngestionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def import_month(self, month: int, rows: int) -> AccountStatement:
+        path = write_csv(self.tmp_dir.name, f"statement_{month}.csv", banque_postale_lines(rows, month))
+        with self.captureOnCommitCallbacks(execute=True):
+            report = parse_csv_and_create_statements(
+                path,
+                date(2025, month, 1),
+                date(2025, month, 28),
+                "BS",
+                self.bank_account.id,
+                self.user.id,
+                batched=True,
+            )
+        return report.account_statement
+
+    def test_monthly_totals_in_one_query_then_cached(self):
+        self.import_month(1, 3)
+        self.import_month(2, 2)
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/v1/spending/")
+        self.assertEqual(
+            [(row["period"], row["category"], row["total"], row["line_count"]) for row in response.data["results"]],
+            [("2025-01-01", "Shopping", "-7.50", 3), ("2025-02-01", "Shopping", "-4.00", 2)],
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/v1/spending/").data, response.data)
+
+    def test_cache_is_invalidated_by_imports_and_line_changes(self):
+        statement = self.import_month(1, 3)
+        self.client.get("/api/v1/spending/")
+        self.import_month(2, 1)
+        self.assertEqual(len(self.client.get("/api/v1/spending/").data["results"]), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            statement.statementline_set.update(is_shared=True)
+        results = self.client.get("/api/v1/spending/").data["results"]
+        self.assertEqual([row["is_shared"] for row in results], [True, None])
+
+    def test_cache_is_invalidated_by_cascading_deletes(self):
+        statement = self.import_month(1, 3)
+        self.import_month(2, 1)
+        self.assertEqual(len(self.client.get("/api/v1/spending/").data["results"]), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            statement.delete()
+        self.assertEqual(len(self.client.get("/api/v1/spending/").data["results"]), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bank_account.delete()
+        self.assertEqual(self.client.get("/api/v1/spending/").data["results"], [])
+
+    def test_deleted_line_invalidates_the_cache(self):
+        statement = self.import_month(1, 3)
+        self.client.get("/api/v1/spending/")
+        with self.captureOnCommitCallbacks(execute=True):
+            statement.statementline_set.order_by("id").first().delete()
+        self.assertEqual(self.client.get("/api/v1/spending/").data["results"][0]["line_count"], 2)
+
+    def test_weekly_period(self):
+        self.import_month(1, 10)
+        results = self.client.get("/api/v1/spending/", {"period": "week"}).data["results"]
+        self.assertEqual([row["period"] for row in results], ["2024-12-30", "2025-01-06"])
+        self.assertEqual(self.client.get("/api/v1/spending/", {"period": "day"}).status_code, 400)
+
+
+class TestStatementLineSnapshot(IngestionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+        path = write_csv(self.tmp_dir.name, "statement.csv", banque_postale_lines(10))
+        statement = self.import_csv(path, batched=True).account_statement
+        statement.statementline_set.filter(libeller="SHOP 0").update(is_shared=True)
+        other = Category.objects.create(name="Maison", user=self.user)
+        statement.statementline_set.filter(libeller="SHOP 1").update(category=other)
+        self.snapshot = StatementLineSnapshot.build(self.user.id)
+
+    def test_snapshot_matches_orm_aggregates(self):
+        self.assertEqual(len(self.snapshot), 10)
+        self.assertEqual(self.snapshot.totals_by_category(), {"Shopping": -5000, "Maison": -1000})
+        self.assertEqual(self.snapshot.totals_by_sub_category(), {"Divers": -6000})
+        self.assertEqual(self.snapshot.totals_by_operation_type(), {"CB": -6000})
+        self.assertEqual(self.snapshot.monthly_totals(), {date(2025, 1, 1): -6000})
+        self.assertEqual(self.snapshot.shared_total(), -800)
+        self.assertAlmostEqual(self.snapshot.category_shares()["Maison"], 10 / 60)
+
+    def test_rolling_totals(self):
+        rolling = self.snapshot.rolling_totals(window_days=3)
+        self.assertEqual(rolling[date(2025, 1, 1)], -150)
+        self.assertEqual(rolling[date(2025, 1, 3)], -150 - 250 - 350)
+        self.assertEqual(rolling[date(2025, 1, 10)], -850 - 950 - 1050)
+
+    def test_scenario_shared_total(self):
+        self.assertEqual(self.snapshot.scenario_shared_total({("SHOP 1", "Divers"): 0.5}), -800 - 500)
+        self.assertEqual(self.snapshot.scenario_shared_total({("SHOP 0", None): 0}), 0)
+        self.assertEqual(self.snapshot.scenario_shared_total({("UNKNOWN", None): 1}), -800)
+
+    def test_snapshot_is_cached_until_lines_change(self):
+        get_statement_line_snapshot(self.user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(get_statement_line_snapshot(self.user.id)), 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            StatementLine.objects.filter(libeller="SHOP 4").delete()
+        self.assertEqual(len(get_statement_line_snapshot(self.user.id)), 8)
+
+
+class TestSettlementNetting(SimpleTestCase):
+    def test_split_cents_adds_up(self):
+        self.assertEqual(split_cents(1001, {1: Decimal("0.5"), 2: Decimal("0.5")}), {1: 501, 2: 500})
+        self.assertEqual(split_cents(-100, {1: Decimal(1), 2: Decimal(1), 3: Decimal(1)}), {1: -34, 2: -33, 3: -33})
+        self.assertEqual(split_cents(90, {1: Decimal(0), 2: Decimal(0)}), {1: 45, 2: 45})
+
+    def test_net_balances(self):
+        transfers = net_balances({1: 700, 2: -500, 3: -300, 4: 100})
+        self.assertEqual(transfers, [Transfer(2, 1, 500), Transfer(3, 1, 200), Transfer(3, 4, 100)])
+        self.assertEqual(net_balances({1: 0, 2: 0}), [])
+
+
+class TestHouseholdSettlement(IngestionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+        self.partner = User.objects.create_user(username="partner", password="5tr0ngP@ssw0rd!!")
+        partner_account = BankAccount.objects.create(account_number="456", bank=self.bank, user=self.partner)
+        self.household = Household.objects.create(name="Home")
+        HouseholdMember.objects.create(household=self.household, user=self.user, split_ratio=Decimal("0.6"))
+        HouseholdMember.objects.create(household=self.household, user=self.partner, split_ratio=Decimal("0.4"))
+        for user, bank_account, month, rows in (
+            (self.user, self.bank_account, 1, 4),
+            (self.partner, partner_account, 2, 2),
+        ):
+            path = write_csv(self.tmp_dir.name, f"{user.username}.csv", banque_postale_lines(rows, month))
+            import_statement_files(
+                [StatementFile(path, "BS", bank_account.id, date(2025, month, 1), date(2025, month, 28))], user.id
+            )
+        # Shared: 1.50 + 2.50 + 3.50 + 4.50 = 12.00 paid by user in January, 1.50 + 2.50 = 4.00 by partner in February
+        StatementLine.objects.update(is_shared=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_settlement_balances_and_transfers(self):
+        settlement = get_household_settlement(self.household, date(2025, 1, 1), date(2025, 12, 31))
+        self.assertEqual([period.month for period in settlement.periods], [date(2025, 1, 1), date(2025, 2, 1)])
+        self.assertEqual(settlement.periods[0].balances, {self.user.id: 480, self.partner.id: -480})
+        self.assertEqual(settlement.periods[1].balances, {self.user.id: -240, self.partner.id: 240})
+        self.assertEqual(settlement.balances, {self.user.id: 240, self.partner.id: -240})
+        self.assertEqual(settlement.transfers, [Transfer(self.partner.id, self.user.id, 240)])
+
+    def test_settlement_is_cached_until_lines_or_ratios_change(self):
+        get_household_settlement(self.household, date(2025, 1, 1), date(2025, 1, 31))
+        with self.assertNumQueries(1):  # Members and ratios
+            get_household_settlement(self.household, date(2025, 1, 1), date(2025, 1, 31))
+        HouseholdMember.objects.filter(user=self.partner).update(split_ratio=Decimal("0.6"))
+        settlement = get_household_settlement(self.household, date(2025, 1, 1), date(2025, 1, 31))
+        self.assertEqual(settlement.balances, {self.user.id: 600, self.partner.id: -600})
+        with self.captureOnCommitCallbacks(execute=True):
+            StatementLine.objects.filter(amount=Decimal("-4.50")).update(is_shared=False)
+        settlement = get_household_settlement(self.household, date(2025, 1, 1), date(2025, 1, 31))
+        self.assertEqual(settlement.balances, {self.user.id: 375, self.partner.id: -375})
+
+    def test_settlement_endpoint(self):
+        response = self.client.get(
+            f"/api/v1/households/{self.household.id}/settlement/",
+            {"start_date": "2025-01-01", "end_date": "2025-02-28"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["transfers"], [{"from": self.partner.id, "to": self.user.id, "amount": "2.40"}])
+        self.client.force_authenticate(User.objects.create_user(username="other", password="5tr0ngP@ssw0rd!!"))
+        response = self.client.get(
+            f"/api/v1/households/{self.household.id}/settlement/",
+            {"start_date": "2025-01-01", "end_date": "2025-02-28"},
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class TestStatementCategoryTotals(IngestionTestCase):
+    def setUp(self):
+        super().setUp()
+        path = write_csv(self.tmp_dir.name, "statement.csv", banque_postale_lines(10))
+        self.statement = self.import_csv(path, batched=True).account_statement
+        self.other_category = Category.objects.create(name="Maison", user=self.user)
+
+    def assertTotalsInSync(self):
+        self.assertEqual(StatementCategoryTotal.objects.verify(), {})
+
+    def test_bulk_import_fills_totals(self):
+        self.assertTotalsInSync()
+        self.assertEqual(self.statement.total_amount(), Decimal("-60.00"))
+        self.assertEqual(self.statement.total_shared_amount(), 0)
+
+    def test_save_moves_amount_between_keys(self):
+        line = self.statement.statementline_set.get(amount=Decimal("-1.50"))
+        line.is_shared = True
+        line.save()
+        line.category = self.other_category
+        line.save()
+        self.assertTotalsInSync()
+        self.assertEqual(self.statement.total_shared_amount(), Decimal("-1.50"))
+        self.assertEqual(self.statement.total_shared_amount_by_category(), {("Maison", "Divers"): Decimal("-1.50")})
+
+    def test_queryset_update_and_delete(self):
+        lines = self.statement.statementline_set.all()
+        lines.filter(amount__gt=-5).update(is_shared=True)
+        self.assertTotalsInSync()
+        self.assertEqual(self.statement.total_shared_amount(), Decimal("-12.00"))
+        lines.filter(is_shared=True).delete()
+        lines.first().delete()
+        self.assertTotalsInSync()
+        self.assertFalse(StatementCategoryTotal.objects.filter(is_shared=True).exists())
+
+    def test_deltas_are_upserted_once_per_key(self):
+        key = (self.statement.id, None, None, None)
+        StatementCategoryTotal.objects.apply_deltas({key: [Decimal("-2.00"), 1]})
+        StatementCategoryTotal.objects.apply_deltas({key: [Decimal("-3.00"), 2]})
+        row = StatementCategoryTotal.objects.get(category=None, sub_category=None, is_shared=None)
+        self.assertEqual((row.total, row.line_count), (Decimal("-5.00"), 3))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            StatementCategoryTotal.objects.create(account_statement=self.statement, total=0, line_count=1)
+
+        StatementCategoryTotal.objects.apply_deltas({key: [Decimal("5.00"), -3]})
+        self.assertFalse(StatementCategoryTotal.objects.filter(category=None).exists())
+
+    def test_deleted_category_totals_are_rebuilt(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        self.assertTotalsInSync()
+        self.assertEqual(self.statement.total_amount(), Decimal("-60.00"))
+
+    def test_totals_do_not_aggregate_lines(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.statement.total_shared_amount_by_category()
+        self.assertNotIn("data_ingestion_statementline", queries[0]["sql"])
+
+    def test_rebuild_command_repairs_totals(self):
+        StatementCategoryTotal.objects.update(total=0)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_statement_totals", "--check", stdout=StringIO(), stderr=StringIO())
+        call_command("rebuild_statement_totals", stdout=StringIO())
+        self.assertTotalsInSync()
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class TestAdminQueryBudget(IngestionTestCase):
+    CHANGELISTS = (
+        "accountstatement",
+        "statementline",
+        "bankaccount",
+        "category",
+        "subcategory",
+        "labelcategorymapping",
+        "sharerule",
+        "importedfile",
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+
+    def import_rows(self, rows: int, month: int) -> None:
+        path = write_csv(self.tmp_dir.name, f"statement_{month}.csv", banque_postale_lines(rows, month))
+        (report,) = import_statement_files(
+            [StatementFile(path, "BS", self.bank_account.id, date(2025, month, 1), date(2025, month, 28))],
+            self.user.id,
+        )
+        report.account_statement.statementline_set.filter(amount__gt=-3).update(is_shared=True)
+        ShareRule.objects.create(user=self.user, label=f"SHOP {month}", sub_category=self.sub_category)
+
+    def changelist_queries(self, model_name: str, query: str = "") -> int:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/admin/data_ingestion/{model_name}/{query}")
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.import_rows(2, month=1)
+        small = {name: self.changelist_queries(name) for name in self.CHANGELISTS}
+        for month in range(2, 5):
+            self.import_rows(40, month=month)
+        for name in self.CHANGELISTS:
+            with self.subTest(name):
+                self.assertEqual(self.changelist_queries(name), small[name])
+                self.assertLessEqual(small[name], 10)
+
+    def test_statement_line_search_and_date_drilldown(self):
+        self.import_rows(20, month=1)
+        self.assertLessEqual(
+            self.changelist_queries("statementline", "?q=shop&operation_date__month=1&operation_date__year=2025"), 10
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "Query plans are checked on PostgreSQL")
+class TestQueryPlans(TestCase):
+    """
+    The hot data_ingestion queries must use an index on a large dataset, not a sequential scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        bank = BankBrand.objects.create(name="Banque postale")
+        users = User.objects.bulk_create(User(username=f"plan{i}") for i in range(20))
+        bank_accounts = BankAccount.objects.bulk_create(
+            BankAccount(account_number=str(i), bank=bank, user=user) for i, user in enumerate(users)
+        )
+        statements = AccountStatement.objects.bulk_create(
+            AccountStatement(
+                statement_type=("BS", "CA")[i % 2],
+                start_date=date(2000 + i // 12, 1 + i % 12, 1),
+                end_date=date(2000 + i // 12, 1 + i % 12, 28),
+                bank_account=bank_account,
+            )
+            for bank_account in bank_accounts
+            for i in range(100)
+        )
+        StatementLine.objects.bulk_create(
+            (
+                StatementLine(
+                    account_statement=statement,
+                    operation_type="CB",
+                    amount=Decimal("-10.00"),
+                    operation_date=statement.start_date.replace(day=1 + i),
+                    libeller=f"SHOP {i}",
+                    is_shared=None if i == 0 else bool(i % 2),
+                )
+                for statement in statements
+                for i in range(20)
+            ),
+            batch_size=5000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE data_ingestion_accountstatement, data_ingestion_statementline")
+        cls.user = users[7]
+        cls.statement = statements[789]
+
+    def assertIndexScan(self, queryset, table: str, index: Optional[str] = None):
+        plan = queryset.explain()
+        self.assertNotIn(f"Seq Scan on {table}", plan, plan)
+        if index:
+            self.assertIn(index, plan, plan)
+
+    def test_unclassified_lines_of_a_statement(self):
+        queryset = StatementLine.objects.filter(is_shared__isnull=True, account_statement=self.statement)
+        self.assertIndexScan(queryset, "data_ingestion_statementline", "statementline_unclassified_idx")
+
+    def test_shared_lines_of_a_statement(self):
+        queryset = self.statement.statementline_set.filter(is_shared=True).values("category__name")
+        self.assertIndexScan(queryset, "data_ingestion_statementline", "statementline_shared_idx")
+
+    def test_lines_of_a_statement_by_date(self):
+        queryset = self.statement.statementline_set.filter(
+            operation_date__gte=self.statement.start_date.replace(day=10)
+        )
+        self.assertIndexScan(
+            queryset.order_by("operation_date"), "data_ingestion_statementline", "statementline_date_idx"
+        )
+
+    def test_statement_of_a_period(self):
+        queryset = AccountStatement.objects.filter(
+            start_date=self.statement.start_date,
+            end_date=self.statement.end_date,
+            statement_type=self.statement.statement_type,
+            bank_account=self.statement.bank_account,
+        )
+        self.assertIndexScan(queryset, "data_ingestion_accountstatement", "statement_account_type_idx")
+
+    def test_label_prefix_search(self):
+        queryset = StatementLine.objects.filter(libeller__istartswith="shop 19")
+        self.assertIndexScan(queryset, "data_ingestion_statementline", "statementline_label_prefix_idx")
+
+    def test_admin_searches_can_use_the_prefix_indexes(self):
+        # These tables are small here, where a sequential scan wins: only check that the indexes apply
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+        self.addCleanup(self.reset_enable_seqscan)
+        for queryset, table, index in (
+            (Category.objects.filter(name__istartswith="ali"), "data_ingestion_category", "category_name_prefix_idx"),
+            (
+                SubCategory.objects.filter(name__istartswith="super"),
+                "data_ingestion_subcategory",
+                "subcategory_name_prefix_idx",
+            ),
+            (
+                LabelCategoryMapping.objects.filter(label__istartswith="shop"),
+                "data_ingestion_labelcategorymapping",
+                "labelmapping_label_prefix_idx",
+            ),
+            (
+                ShareRule.objects.filter(label__istartswith="shop"),
+                "data_ingestion_sharerule",
+                "sharerule_label_prefix_idx",
+            ),
+            (
+                ImportedFile.objects.filter(original_filename__istartswith="statement"),
+                "data_ingestion_importedfile",
+                "importedfile_name_prefix_idx",
+            ),
+        ):
+            with self.subTest(index=index):
+                self.assertIndexScan(queryset, table, index)
+
+    def reset_enable_seqscan(self):
+        with connection.cursor() as cursor:
+            cursor.execute("RESET enable_seqscan")
+
+    def test_lines_of_a_user_newest_first_at_any_depth(self):
+        newest_first = StatementLine.objects.filter(user=self.user).order_by("-operation_date", "-pk")
+        cursor = newest_first[1500]
+        for queryset in (
+            newest_first,
+            newest_first.filter(
+                Q(operation_date__lte=cursor.operation_date)
+                & (
+                    Q(operation_date__lt=cursor.operation_date)
+                    | Q(operation_date=cursor.operation_date, pk__lt=cursor.pk)
+                )
+            ),
+        ):
+            plan = queryset[:100].explain()
+            self.assertIn("statementline_user_date_idx", plan, plan)
+            self.assertNotIn("Sort", plan, plan)
+        self.assertIn("Index Cond: ((user_id = ", plan)
+        self.assertIn("operation_date <= ", plan)
+
+    def test_last_statement_of_a_user_by_type(self):
+        queryset = AccountStatement.objects.filter(bank_account__user__id=self.user.id, statement_type="CA")
+        self.assertIndexScan(queryset.order_by("-id")[:1], "data_ingestion_accountstatement")
@@ -0,0 +1,48 @@
+from functools import partial
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from data_ingestion.cache import get_or_set_versioned, user_cache_key
+from data_ingestion.models import STATEMENT_LINES_CACHE_SCOPE, StatementLine
+
+TIME_SERIES_CACHE_TIMEOUT = 60 * 60 * 24
+TIME_SERIES_PERIODS = {
+    "month": TruncMonth,
+    "week": TruncWeek,
+}
+
+
+def compute_spending_time_series(user_id: int, period: str = "month") -> list[dict]:
+    """
+    Totals of the user's statement lines (all bank accounts) by period, category, subcategory,
+    shared status and operation type, in a single grouped query.
+    """
+    rows = (
+        StatementLine.objects.filter(account_statement__bank_account__user_id=user_id)
+        .annotate(period=TIME_SERIES_PERIODS[period]("operation_date"))
+        .values("period", "category__name", "sub_category__name", "is_shared", "operation_type")
+        .annotate(total=Sum("amount"), line_count=Count("id"))
+        .order_by("period", "category__name", "sub_category__name", "is_shared", "operation_type")
+    )
+    return [
+        {
+            "period": row["period"].isoformat(),
+            "category": row["category__name"],
+            "sub_category": row["sub_category__name"],
+            "is_shared": row["is_shared"],
+            "operation_type": row["operation_type"],
+            "total": str(row["total"]),
+            "line_count": row["line_count"],
+        }
+        for row in rows
+    ]
+
+
+def get_spending_time_series(user_id: int, period: str = "month") -> list[dict]:
+    """
+    Cached compute_spending_time_series. The cache is invalidated when the user's lines or categories change
+    (see invalidate_statement_lines_cache).
+    """
+    key = f"{user_cache_key(STATEMENT_LINES_CACHE_SCOPE, user_id)}:time_series:{period}"
+    return get_or_set_versioned(key, partial(compute_spending_time_series, user_id, period), TIME_SERIES_CACHE_TIMEOUT)
@@ -1,26 +1,91 @@
-import unicodedata
-from typing import Optional
+import hashlib
+from functools import partial
+from pathlib import Path
+from typing import NamedTuple, Optional
 
 from accounts.models import User
+from data_ingestion.cache import get_or_set_versioned, user_cache_key
+from data_ingestion.labels import normalize_label
 from data_ingestion.models import ShareRule, SubCategory
 
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+SHARE_RULES_CACHE_SCOPE = "share_rules"
+SHARE_RULES_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def share_rule_key(label: str, sub_category_name: str, category_id: Optional[int]) -> tuple:
+    return label.strip().casefold(), sub_category_name.strip().casefold(), category_id
+
+
+class ShareRuleIndex:
+    """
+    All the share rules of a user, keyed by (label, subcategory name, category id).
+
+    Labels and subcategory names are compared case-insensitively, like the iexact lookups it replaces.
+    A label without rule falls back to the rules of its normalized label (see data_ingestion.labels),
+    unless they disagree.
+    """
+
+    def __init__(
+        self, rules: dict[tuple, bool], normalized_rules: Optional[dict[tuple, Optional[bool]]] = None
+    ) -> None:
+        self.rules = rules
+        self.normalized_rules = normalized_rules or {}
+
+    @classmethod
+    def build(cls, user_id: int) -> "ShareRuleIndex":
+        rules: dict[tuple, bool] = {}
+        normalized_rules: dict[tuple, Optional[bool]] = {}
+        queryset = ShareRule.objects.filter(user_id=user_id).order_by("id")
+        for label, normalized_label, sub_category_name, category_id, always_shared in queryset.values_list(
+            "label", "normalized_label", "sub_category__name", "sub_category__category_id", "always_shared"
+        ):
+            rules.setdefault(share_rule_key(label, sub_category_name, category_id), bool(always_shared))
+            if normalized_label:
+                key = share_rule_key(normalized_label, sub_category_name, category_id)
+                if normalized_rules.setdefault(key, bool(always_shared)) != bool(always_shared):
+                    normalized_rules[key] = None  # Conflicting rules: the normalized label decides nothing
+        return cls(rules, normalized_rules)
+
+    def is_shared(self, label: str, sub_category: SubCategory) -> Optional[bool]:
+        shared = self.rules.get(share_rule_key(label, sub_category.name, sub_category.category_id))
+        if shared is None and self.normalized_rules:
+            key = share_rule_key(normalize_label(label), sub_category.name, sub_category.category_id)
+            shared = self.normalized_rules.get(key)
+        return shared
+
+
+def get_share_rule_index(user_id: int) -> ShareRuleIndex:
+    """
+    Cached ShareRuleIndex of a user. The cache is invalidated by the ShareRule signals.
+    """
+    key = user_cache_key(SHARE_RULES_CACHE_SCOPE, user_id)
+    return get_or_set_versioned(key, partial(ShareRuleIndex.build, user_id), SHARE_RULES_CACHE_TIMEOUT)
+
 
 def get_is_shared_for_user(user: User, label: str, sub_category: SubCategory) -> Optional[bool]:
     """
     Check if a share rule exists for the user, label, and sub_category.
-    Returns True if a rule exists, otherwise False.
+    Returns the always_shared value of the rule if one exists, otherwise None.
     This is used to determine if a statement line should be marked as shared.
+    When checking many lines, fetch the index once with get_share_rule_index.
     """
-    rule = ShareRule.objects.filter(
-        user=user,
-        label__iexact=label.strip(),
-        sub_category__name__iexact=sub_category.name.strip(),
-        sub_category__category=sub_category.category,
-    ).first()
-    if rule:
-        return bool(rule.always_shared)
-    return None
+    return get_share_rule_index(user.id).is_shared(label, sub_category)
 
 
-def clean_string(s: str) -> str:
-    return unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
+class FileFingerprint(NamedTuple):
+    sha256: str
+    size: int
+
+
+def file_fingerprint(path: str | Path) -> FileFingerprint:
+    """
+    SHA-256 and size of a file, read by chunks.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(FINGERPRINT_CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+    return FileFingerprint(digest.hexdigest(), size)
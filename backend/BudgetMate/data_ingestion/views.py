@@ -1,94 +1,189 @@
 from datetime import datetime
+from pathlib import Path
 
-from rest_framework import generics
+from django.db.models import Count, Prefetch, Q, QuerySet, Sum
+from django.http import StreamingHttpResponse
+from rest_framework import generics, status, views, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
 
 from accounts.models import User
+from data_ingestion.exports import EXPORT_CONTENT_TYPES, encode, export_lines, export_shared, export_totals, user_lines
+from data_ingestion.filters import AccountStatementFilter, StatementLineFilter
+from data_ingestion.labels import clean_string
 from data_ingestion.models import (
     AccountStatement,
     Category,
-    LabelCategoryMapping,
+    Household,
+    HouseholdMember,
+    ImportJob,
     ShareRule,
     StatementLine,
     SubCategory,
 )
-from data_ingestion.parsers import parse_csv_and_create_statements
-from data_ingestion.utils import clean_string
+from data_ingestion.pagination import AccountStatementPagination, StatementLinePagination
+from data_ingestion.parsers import StatementFile, import_statement_files
+from data_ingestion.serializers import (
+    AccountStatementSerializer,
+    CategorySerializer,
+    HouseholdSerializer,
+    ImportJobSerializer,
+    SettlementPeriodSerializer,
+    SettlementSerializer,
+    StatementLineSerializer,
+)
+from data_ingestion.settlements import get_household_settlement
+from data_ingestion.timeseries import TIME_SERIES_PERIODS, get_spending_time_series
 
 
 class UploadFileView(generics.CreateAPIView):
-    def post(self, request, *args, **kwargs):
-        # Show content of csv file
-        print(request.data["file"].read().decode("utf-8"))
-        return Response({"message": "POST: Received a file!"})
-
-
-def map_label_to_category_and_subcategory(
-    user: User,
-    label: str,
-    category_name_csv: str | None = None,
-    sub_category_name_csv: str | None = None,
-) -> tuple[Category | None, SubCategory | None]:
     """
-    Map a label to existing categories or create new ones based on user input.
+    Spool an uploaded statement file and queue it for the import worker.
+    Answers 202 with the import job, whose progress is available on import-jobs/<id>/.
+    """
+
+    serializer_class = ImportJobSerializer
+
+    def perform_create(self, serializer: ImportJobSerializer) -> None:
+        serializer.save(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
 
-    Args:
-        user: User object
-        label: Transaction label to categorize
-        category_name_csv: Proposed category name from CSV (optional)
-        sub_category_name_csv: Proposed sub-category name from CSV (optional)
+class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = ImportJobSerializer
 
-    Returns:
-        Tuple of (Category, SubCategory) objects
+    def get_queryset(self) -> QuerySet:
+        return (
+            ImportJob.objects.filter(user=self.request.user)
+            .annotate(
+                rows_pending_review=Count(
+                    "account_statement__statementline",
+                    filter=Q(account_statement__statementline__is_shared__isnull=True),
+                )
+            )
+            .order_by("-id")
+        )
+
+
+class StatementLineViewSet(viewsets.ReadOnlyModelViewSet):
     """
-    mapping = LabelCategoryMapping.objects.filter(user=user, label=label).first()
-    if mapping:
-        return mapping.category, mapping.sub_category
-
-    category_name_proposal = category_name_csv or ""
-    sub_category_name_proposal = sub_category_name_csv or ""
-
-    if not category_name_proposal:
-        category_name_proposal = "Uncategorized"
-        sub_category_name_proposal = "Uncategorized"
-
-    cat_name, subcat_name = prompt_for_category(label, category_name_proposal, sub_category_name_proposal)
-
-    if not cat_name:
-        return None, None
-    cat_name = clean_string(cat_name)
-
-    if subcat_name:
-        subcat_name = clean_string(subcat_name)
-
-    # Look for existing category first, create if not found
-    try:
-        category = Category.objects.get(name=cat_name, user=user)
-        print(f"Found existing category: {cat_name}")
-    except Category.DoesNotExist:
-        category = Category.objects.create(name=cat_name, user=user)
-        print(f"Created new category: {cat_name}")
-
-    sub_category = None
-    if subcat_name and category:
-        # Look for existing subcategory first, create if not found
-        try:
-            sub_category = SubCategory.objects.get(name=subcat_name, category=category, user=user)
-            print(f"Found existing subcategory: {subcat_name}")
-        except SubCategory.DoesNotExist:
-            sub_category = SubCategory.objects.create(name=subcat_name, category=category, user=user)
-            print(f"Created new subcategory: {subcat_name}")
-
-    # Create the mapping for future use
-    if category and sub_category:
-        LabelCategoryMapping.objects.create(
-            user=user,
-            label=label,
-            category=category,
-            sub_category=sub_category,
+    Statement lines of the user, newest first, with keyset pagination (see KeysetPagination).
+    """
+
+    serializer_class = StatementLineSerializer
+    filterset_class = StatementLineFilter
+    pagination_class = StatementLinePagination
+
+    def get_queryset(self) -> QuerySet:
+        return (
+            StatementLine.objects.filter(user=self.request.user)
+            .select_related("category", "sub_category")
+            .only(
+                "id",
+                "account_statement_id",
+                "operation_date",
+                "operation_type",
+                "libeller",
+                "amount",
+                "comment",
+                "is_shared",
+                "category__id",
+                "category__name",
+                "sub_category__id",
+                "sub_category__name",
+            )
+        )
+
+
+class AccountStatementViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = AccountStatementSerializer
+    filterset_class = AccountStatementFilter
+    pagination_class = AccountStatementPagination
+
+    def get_queryset(self) -> QuerySet:
+        return AccountStatement.objects.filter(bank_account__user=self.request.user).annotate(
+            lines_total=Sum("category_totals__total"),
+            shared_lines_total=Sum("category_totals__total", filter=Q(category_totals__is_shared=True)),
         )
 
-    return category, sub_category
+
+class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = CategorySerializer
+
+    def get_queryset(self) -> QuerySet:
+        return (
+            Category.objects.filter(user=self.request.user)
+            .prefetch_related(Prefetch("subcategory_set", SubCategory.objects.order_by("name")))
+            .order_by("name")
+        )
+
+
+class StatementExportView(views.APIView):
+    """
+    Stream the user's statement lines (lines), shared expenses (shared) or statement totals (totals)
+    as CSV or NDJSON, e.g. exports/lines.csv?start_date=2025-01-01.
+    Lines accept the statement-lines filters, totals an account_statement id.
+    """
+
+    def get(self, request, kind: str, export_format: str) -> StreamingHttpResponse:
+        if export_format not in EXPORT_CONTENT_TYPES:
+            raise NotFound(f"Unknown export format '{export_format}'.")
+        if kind == "lines":
+            filterset = StatementLineFilter(request.query_params, queryset=user_lines(request.user.id), request=request)
+            if not filterset.is_valid():
+                raise ValidationError(filterset.errors)
+            export = export_lines(filterset.qs)
+        elif kind in ("shared", "totals"):
+            account_statement_id = request.query_params.get("account_statement")
+            if account_statement_id is not None and not account_statement_id.isdigit():
+                raise ValidationError({"account_statement": "A statement id is required."})
+            export_function = export_shared if kind == "shared" else export_totals
+            export = export_function(request.user.id, account_statement_id and int(account_statement_id))
+        else:
+            raise NotFound(f"Unknown export '{kind}'.")
+        response = StreamingHttpResponse(
+            encode(export, export_format), content_type=EXPORT_CONTENT_TYPES[export_format]
+        )
+        response["Content-Disposition"] = f'attachment; filename="{kind}.{export_format}"'
+        return response
+
+
+class HouseholdViewSet(viewsets.ReadOnlyModelViewSet):
+    serializer_class = HouseholdSerializer
+
+    def get_queryset(self) -> QuerySet:
+        return (
+            Household.objects.filter(members=self.request.user)
+            .prefetch_related(Prefetch("memberships", HouseholdMember.objects.select_related("user").order_by("id")))
+            .order_by("id")
+        )
+
+    @action(detail=True)
+    def settlement(self, request, pk=None) -> Response:
+        """
+        Balances and transfers settling the household's shared expenses between start_date and end_date.
+        """
+        period = SettlementPeriodSerializer(data=request.query_params)
+        period.is_valid(raise_exception=True)
+        settlement = get_household_settlement(self.get_object(), **period.validated_data)
+        return Response(SettlementSerializer(settlement).data)
+
+
+class SpendingTimeSeriesView(views.APIView):
+    """
+    Totals of the user's lines by month (or ?period=week), category, subcategory, shared status and operation type.
+    """
+
+    def get(self, request) -> Response:
+        period = request.query_params.get("period", "month")
+        if period not in TIME_SERIES_PERIODS:
+            raise ValidationError({"period": f"Expected one of {', '.join(TIME_SERIES_PERIODS)}."})
+        return Response({"period": period, "results": get_spending_time_series(request.user.id, period)})
 
 
 def prompt_for_category(label: str, category_name: str, sub_category_name: str) -> tuple[str | None, str | None]:
@@ -226,43 +321,62 @@ def cli_set_shared_for_unclassified(user_id: int, statement_type: str) -> None:
     for line in lines:
         ask_shared_decision(line, user)
     print("Done! All unclassified lines have been processed.")
-    account_statement.total_shared_amount_by_category()
+    print_shared_amount_by_category(account_statement)
     print(account_statement.total_shared_amount())
 
 
+def print_shared_amount_by_category(account_statement: AccountStatement) -> None:
+    """
+    Print the shared amounts of a statement as "category; subcategory; amount" lines.
+    """
+    for (category_name, sub_category_name), total in account_statement.total_shared_amount_by_category().items():
+        flipped_value = -total  # Flip the sign to display positive values for expenses
+        value_str = str(flipped_value).replace(".", ",")
+        print(f"{category_name}; {sub_category_name}; {value_str}")
+
+
 def import_and_set_shared_for_files(
     csv_files: list[tuple[str, str]],
     date_from: datetime,
     date_to: datetime,
     bank_account_id: int,
     user_id: int,
-) -> None:
+    max_workers: int | None = None,
+) -> list[AccountStatement]:
     """
     Parse multiple CSV files and prompt the user to set sharing rules for unclassified lines.
     Prints total shared amounts for each account statement and by category.
-    csv_file :  [("file1.csv", "type1"), ("file2.csv", "type2")]
+    csv_file :  [("file1.csv", "type1"), ("file2.csv", "type2")], relative to the fixtures folder.
+    The files are parsed in parallel (see import_statement_files).
+    Returns the account statements the files were imported in.
     """
-    imported_statements = []
-    for csv_name, statement_type in csv_files:
-        print(f"\n--- Importing {csv_name} ---")
-        parse_csv_and_create_statements(csv_name, date_from, date_to, statement_type, bank_account_id, user_id)
-        account_statement = AccountStatement.objects.filter(
-            bank_account__user__id=user_id, statement_type=statement_type
-        ).last()
-        imported_statements.append(account_statement)
-        print(f"Parsing done for {csv_name}.")
+    fixtures_dir = Path(__file__).parent / "fixtures"
+    reports = import_statement_files(
+        [
+            StatementFile(fixtures_dir / csv_name, statement_type, bank_account_id, date_from, date_to)
+            for csv_name, statement_type in csv_files
+        ],
+        user_id,
+        prompt=prompt_for_category,
+        max_workers=max_workers,
+    )
+    for (csv_name, _), report in zip(csv_files, reports):
+        if report.error:
+            print(f"{csv_name} was not imported: {report.error}")
+    imported_statements = [report.account_statement for report in reports if not report.error]
 
     print("\n--- Setting shared status for all imported statements ---")
+    user = User.objects.get(id=user_id)
     for account_statement in imported_statements:
         lines = StatementLine.objects.filter(is_shared__isnull=True, account_statement=account_statement)
-        user = account_statement.bank_account.user
         for line in lines:
             ask_shared_decision(line, user)
         print(f"\nTotals for statement from {account_statement.start_date} to {account_statement.end_date}:")
         print("Total shared amount by category:")
-        print(account_statement.total_shared_amount_by_category())
+        print_shared_amount_by_category(account_statement)
         print("Total shared amount:")
         print(account_statement.total_shared_amount())
         print("-----")
         print("All lines have been processed.")
         print("-----")
+    return imported_statements